@@ -0,0 +1,160 @@
+"""
+Product analytics from the sales history: sales velocity, ABC revenue
+classes, days of stock cover and suggested reorder quantities.
+Whole months of the window come from the product_sales_monthly summary
+and only the partial first month from sale_items, so SQLite hands back
+at most two grouped rows per product. The per-product figures are then
+computed over compact column arrays (array module), one pass per column.
+
+    python analytics.py [--db pos_system.db] [--days 90] [--lead-time 7] [--all]
+"""
+
+import argparse
+import datetime
+import math
+from array import array
+from typing import List, Optional, Tuple
+
+from database import POSDatabase
+
+# Days of sales history the velocity is measured over
+WINDOW_DAYS = 90
+# Days between ordering stock and having it on the shelf
+LEAD_TIME_DAYS = 7
+# Days of sales an order should cover once it arrives
+COVER_DAYS = 14
+# Extra days of stock held against demand spikes and late deliveries
+SAFETY_DAYS = 3
+# Cumulative revenue shares that close the A and B classes
+CLASS_A_SHARE = 0.80
+CLASS_B_SHARE = 0.95
+
+class ProductAnalytics:
+    """Per-product figures as parallel columns, in product ID order.
+
+    ``days_of_cover`` is ``math.inf`` for products that did not sell in
+    the window; ``abc`` holds "A", "B" or "C".
+    """
+
+    __slots__ = ("window_days", "lead_time_days", "product_ids", "barcodes", "names", "stock",
+                 "units", "revenue", "velocity", "days_of_cover", "abc", "reorder")
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def reorder_rows(self, include_all: bool = False) -> List[Tuple]:
+        """(product_id, barcode, name, class, stock, units/day, days of cover, reorder quantity) rows.
+
+        Only products that need ordering unless ``include_all``; A products
+        first, then the ones that run out soonest.
+        """
+        rows = [(self.product_ids[i], self.barcodes[i], self.names[i], self.abc[i], self.stock[i],
+                 self.velocity[i], self.days_of_cover[i], self.reorder[i])
+                for i in range(len(self.product_ids)) if include_all or self.reorder[i]]
+        rows.sort(key=lambda row: (row[3], row[6], -row[5]))
+        return rows
+
+def load_sales_columns(db: POSDatabase, since: datetime.date) -> Tuple[array, array, array]:
+    """(product IDs, units, revenue) sold from ``since`` on, one entry per product"""
+    month_start = since.replace(day=1)
+    if month_start < since:
+        month_start = (month_start + datetime.timedelta(days=31)).replace(day=1)
+    conn = db.get_connection()
+    cursors = [conn.execute("""
+        SELECT product_id, SUM(quantity), SUM(revenue)
+        FROM product_sales_monthly WHERE month >= ?
+        GROUP BY product_id
+    """, (month_start.isoformat()[:7],))]
+    if since < month_start:
+        # The days before the first whole month, from the raw line items
+        cursors.append(conn.execute("""
+            SELECT si.product_id, SUM(si.quantity), SUM(si.subtotal)
+            FROM sales s CROSS JOIN sale_items si ON si.sale_id = s.id
+            WHERE s.timestamp >= ? AND s.timestamp < ?
+            GROUP BY si.product_id
+        """, (since.isoformat(), month_start.isoformat())))
+
+    totals = {}
+    for cursor in cursors:
+        for product_id, quantity, subtotal in cursor:
+            sold = totals.get(product_id)
+            totals[product_id] = (quantity, subtotal) if sold is None else (sold[0] + quantity, sold[1] + subtotal)
+    return (array('q', totals), array('q', (sold[0] for sold in totals.values())),
+            array('q', (sold[1] for sold in totals.values())))
+
+def classify_abc(revenue: array) -> List[str]:
+    """ABC class per entry: the best sellers making up CLASS_A_SHARE of revenue are A, the next to CLASS_B_SHARE B"""
+    total = sum(revenue)
+    classes = ["C"] * len(revenue)
+    if total <= 0:
+        return classes
+    running = 0
+    for i in sorted(range(len(revenue)), key=revenue.__getitem__, reverse=True):
+        if revenue[i] <= 0:
+            break
+        # Classed by the share reached before this product, so the top seller is always A
+        classes[i] = "A" if running < CLASS_A_SHARE * total else "B" if running < CLASS_B_SHARE * total else "C"
+        running += revenue[i]
+    return classes
+
+def analyse(db: POSDatabase, window_days: int = WINDOW_DAYS, lead_time_days: int = LEAD_TIME_DAYS,
+            cover_days: int = COVER_DAYS, safety_days: int = SAFETY_DAYS,
+            today: Optional[datetime.date] = None) -> ProductAnalytics:
+    """Velocity, ABC class, days of cover and reorder quantity for every product"""
+    today = today or datetime.date.today()
+    since = today - datetime.timedelta(days=window_days - 1)
+
+    result = ProductAnalytics()
+    result.window_days = window_days
+    result.lead_time_days = lead_time_days
+    result.product_ids, result.stock = array('q'), array('q')
+    result.barcodes, result.names = [], []
+    for product_id, barcode, name, stock in db.get_connection().execute(
+            "SELECT id, barcode, name, stock FROM products ORDER BY id"):
+        result.product_ids.append(product_id)
+        result.barcodes.append(barcode)
+        result.names.append(name)
+        result.stock.append(stock)
+    count = len(result.product_ids)
+    position = {product_id: i for i, product_id in enumerate(result.product_ids)}
+
+    # Scatter the grouped sales into columns aligned with the products
+    result.units, result.revenue = array('q', bytes(8 * count)), array('q', bytes(8 * count))
+    for product_id, units, revenue in zip(*load_sales_columns(db, since)):
+        i = position.get(product_id)
+        if i is not None:    # lines of deleted products
+            result.units[i] = units
+            result.revenue[i] = revenue
+
+    result.velocity = array('d', (units / window_days for units in result.units))
+    result.days_of_cover = array('d', (max(stock, 0) / velocity if velocity else math.inf
+                                       for stock, velocity in zip(result.stock, result.velocity)))
+    result.abc = classify_abc(result.revenue)
+
+    # Order up to lead time + cover + safety once stock no longer lasts lead time + safety
+    reorder_point, order_up_to = lead_time_days + safety_days, lead_time_days + cover_days + safety_days
+    result.reorder = array('q', (max(math.ceil(velocity * order_up_to) - stock, 0) if cover < reorder_point else 0
+                                 for velocity, cover, stock in zip(result.velocity, result.days_of_cover,
+                                                                   result.stock)))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Reorder suggestions from the sales history")
+    parser.add_argument("--db", default="pos_system.db")
+    parser.add_argument("--days", type=int, default=WINDOW_DAYS, help="days of sales history to use")
+    parser.add_argument("--lead-time", type=int, default=LEAD_TIME_DAYS, help="days from order to delivery")
+    parser.add_argument("--all", action="store_true", help="list every product, not only those to reorder")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    try:
+        result = analyse(db, args.days, args.lead_time)
+        print(f"{'Barcode':<14} {'Name':<30} ABC {'Stock':>7} {'Per day':>8} {'Cover':>7} {'Order':>7}")
+        for _, barcode, name, abc, stock, velocity, cover, reorder in result.reorder_rows(args.all):
+            cover_text = "-" if cover == math.inf else f"{cover:.1f}"
+            print(f"{barcode:<14} {name[:30]:<30}  {abc}  {stock:>7} {velocity:>8.2f} {cover_text:>7} {reorder:>7}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
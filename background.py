@@ -0,0 +1,102 @@
+import queue
+import threading
+import tkinter as tk
+
+class BackgroundWorker:
+    """Run jobs on a daemon thread and hand results back to the Tk thread.
+
+    Only the most recently submitted job matters: submitting a new one marks
+    older ones stale, so they are skipped if they have not started and their
+    results are dropped if they finish late. Results travel through a queue
+    polled with ``widget.after`` because Tk may only be used from the main
+    thread.
+    """
+
+    def __init__(self, widget, poll_ms: int = 20, on_exit=None):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        # Called on the worker thread as it ends (e.g. POSDatabase.release_connection)
+        self.on_exit = on_exit
+        self.generation = 0
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._poll_id = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, callback, on_error=None) -> int:
+        """Run ``func()`` in the background, then ``callback(result)`` on the Tk thread"""
+        self.generation += 1
+        self._jobs.put((self.generation, func, callback, on_error))
+        self._schedule_poll()
+        return self.generation
+
+    def is_stale(self, generation: int) -> bool:
+        """True once a newer job has been submitted (or cancel() called)"""
+        return generation != self.generation
+
+    def cancel(self):
+        """Drop the current job's result"""
+        self.generation += 1
+
+    def stop(self):
+        """Cancel outstanding work and end the worker thread"""
+        self.cancel()
+        self._jobs.put(None)
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+
+    def _run(self):
+        try:
+            self._work()
+        finally:
+            if self.on_exit is not None:
+                self.on_exit()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            generation, func, callback, on_error = job
+            if not self.is_stale(generation):
+                try:
+                    result, error = func(), None
+                except Exception as e:
+                    result, error = None, e
+                self._results.put((generation, result, error, callback, on_error))
+            self._jobs.task_done()
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            try:
+                self._poll_id = self.widget.after(self.poll_ms, self._poll)
+            except tk.TclError:
+                pass    # widget destroyed
+
+    def _poll(self):
+        self._poll_id = None
+        # Read before draining so a result queued mid-drain is not stranded
+        pending = self._jobs.unfinished_tasks
+        unhandled = None
+        while True:
+            try:
+                generation, result, error, callback, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self.is_stale(generation):
+                continue
+            if error is None:
+                callback(result)
+            elif on_error is not None:
+                on_error(error)
+            else:
+                unhandled = error
+        if pending:
+            self._schedule_poll()
+        if unhandled is not None:
+            raise unhandled    # reported through Tk's callback exception handler
@@ -0,0 +1,226 @@
+"""
+Online database backups with SQLite's backup API.
+Snapshots are copied a few pages at a time on a background thread, verified,
+and rotated so only the newest BACKUP_KEEP files remain.
+Run: python backup.py [pos_system.db] [--dir backups]
+"""
+
+import argparse
+import datetime
+import glob
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+from database import POSDatabase
+
+BACKUP_DIR = "backups"
+BACKUP_PREFIX = "pos_backup_"
+# Time between scheduled snapshots
+BACKUP_INTERVAL = 6 * 3600
+# Snapshots kept after rotation
+BACKUP_KEEP = 14
+# Pages copied per backup step, and the pause between steps so checkouts
+# keep the disk and the GIL
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.002
+# Restarts (another connection wrote mid-copy) tolerated before a snapshot
+# is copied from one pinned read transaction instead
+MAX_RESTARTS = 3
+
+class BackupError(Exception):
+    """Raised when a snapshot fails verification"""
+
+class _Restarted(Exception):
+    """The unpinned copy kept restarting because the source was being written"""
+
+class BackupManager:
+    """Scheduled online snapshots of a POSDatabase.
+
+    The source is copied ``pages_per_step`` pages at a time with no read
+    transaction held between steps, so checkouts keep writing and WAL
+    checkpoints can run while it is copied. A write from another connection
+    restarts the copy; after MAX_RESTARTS of those the snapshot is copied
+    inside one read transaction instead, which always finishes but holds
+    checkpoints back until it does.
+    Each snapshot is written under a temporary name, checked with
+    ``PRAGMA quick_check`` and only then renamed into place.
+    """
+
+    def __init__(self, db: POSDatabase, backup_dir: str = BACKUP_DIR,
+                 interval: float = BACKUP_INTERVAL, keep: int = BACKUP_KEEP,
+                 pages_per_step: int = PAGES_PER_STEP, step_pause: float = STEP_PAUSE,
+                 on_complete: Optional[Callable[[Optional[str], Optional[Exception]], None]] = None):
+        self.db = db
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.on_complete = on_complete
+        self.last_backup = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def list_backups(self) -> List[str]:
+        """Snapshot paths, oldest first"""
+        return sorted(glob.glob(os.path.join(self.backup_dir, BACKUP_PREFIX + "*.db")))
+
+    def start(self):
+        """Start the scheduler thread; a snapshot is taken at once if one is due"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop the scheduler; a snapshot in progress is abandoned"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request_backup(self):
+        """Ask the scheduler thread for a snapshot now"""
+        self._wake.set()
+
+    def seconds_until_due(self) -> float:
+        """Time left before the next scheduled snapshot"""
+        backups = self.list_backups()
+        if not backups:
+            return 0.0
+        age = time.time() - os.path.getmtime(backups[-1])
+        return max(0.0, self.interval - age)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.seconds_until_due())
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                path, error = self.backup_now(), None
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                path, error = None, e
+                # Retry after a short pause rather than a whole interval
+                self._stop.wait(min(self.interval, 300))
+            if self.on_complete is not None:
+                self.on_complete(path, error)
+        self.db.release_connection()
+
+    def backup_now(self) -> str:
+        """Take, verify and rotate one snapshot; returns its path"""
+        with self._lock:
+            try:
+                path = self._snapshot()
+                self.prune()
+            except Exception as e:
+                self.last_error = e
+                raise
+            self.last_backup = path
+            self.last_error = None
+            return path
+
+    def _snapshot(self) -> str:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{timestamp}.db")
+        temp_path = path + ".part"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        source = self.db.get_connection()
+        target = sqlite3.connect(temp_path)
+        try:
+            try:
+                self._copy(source, target, pinned=False)
+            except _Restarted:
+                self._copy(source, target, pinned=True)
+            # A standalone file is easier to restore than one that needs a -wal
+            target.execute("PRAGMA journal_mode = DELETE")
+            verify_backup(target)
+        except BaseException:
+            target.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        target.close()
+        os.replace(temp_path, path)
+        return path
+
+    def _copy(self, source: sqlite3.Connection, target: sqlite3.Connection, pinned: bool):
+        """Copy ``source`` into ``target`` in steps, pausing ``step_pause`` between them.
+
+        Unpinned, raises _Restarted once the copy has started over more than
+        MAX_RESTARTS times. Pinned, one read snapshot is held throughout so
+        concurrent writes cannot restart it.
+        """
+        restarts = 0
+        last_remaining = None
+
+        def step(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if self._stop.is_set():
+                raise BackupError("backup cancelled")
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if not pinned and restarts > MAX_RESTARTS:
+                    raise _Restarted()
+            last_remaining = remaining
+            if self.step_pause:
+                time.sleep(self.step_pause)
+
+        if pinned:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        try:
+            source.backup(target, pages=self.pages_per_step, progress=step, sleep=self.step_pause)
+        finally:
+            if pinned:
+                source.rollback()
+
+    def prune(self) -> List[str]:
+        """Delete all but the newest ``keep`` snapshots; returns the deleted paths"""
+        backups = self.list_backups()
+        expired = backups[:-self.keep] if self.keep > 0 else []
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return expired
+
+def verify_backup(conn: sqlite3.Connection):
+    """Raise BackupError unless ``conn`` passes quick_check and holds the POS tables"""
+    result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    if result != "ok":
+        raise BackupError(f"integrity check failed: {result}")
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    missing = {"products", "sales", "sale_items"} - tables
+    if missing:
+        raise BackupError("missing tables: " + ", ".join(sorted(missing)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Take one online backup of the POS database")
+    parser.add_argument("db_path", nargs="?", default="pos_system.db")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="backup directory (default: backups)")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="snapshots to keep")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db_path)
+    try:
+        manager = BackupManager(db, args.dir, keep=args.keep, step_pause=0)
+        print(f"Backup written to {manager.backup_now()}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
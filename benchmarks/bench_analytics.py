@@ -0,0 +1,39 @@
+"""
+Product analytics over a large sales history: the grouped load of the
+line items and the full velocity / ABC / cover / reorder computation.
+Run: python -m benchmarks.bench_analytics [products] [sales] [days]
+"""
+
+import datetime
+import sys
+
+from analytics import analyse, load_sales_columns
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, populate_sales, timed
+
+
+def run(products: int = 20000, sales: int = 1000000, days: int = 90):
+    path = temp_db_path("analytics")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        populate_sales(db, products, sales, days)
+        lines = db.get_connection().execute("SELECT COUNT(*) FROM sale_items").fetchone()[0]
+        print(f"{sales} sales, {lines} line items over {days} days, {products} products")
+
+        db.rebuild_sales_summaries()
+        since = datetime.date.today() - datetime.timedelta(days=days - 1)
+        _, elapsed = timed(load_sales_columns, db, since)
+        print(f"grouped load:      {elapsed:6.2f} s  ({lines / elapsed:,.0f} line items/s)")
+        result, elapsed = timed(analyse, db, days)
+        print(f"full analysis:     {elapsed:6.2f} s")
+        counts = {abc: result.abc.count(abc) for abc in "ABC"}
+        print(f"classes A/B/C:     {counts['A']}/{counts['B']}/{counts['C']}   "
+              f"to reorder: {len(result.reorder_rows())}")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,67 @@
+"""
+Checkout latency while an online backup runs, compared with no backup.
+Run: python -m benchmarks.bench_backup [products] [checkouts]
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from database import POSDatabase
+from backup import BackupManager
+from benchmarks.common import temp_db_path, remove_db, populate_products, percentile
+
+
+def checkout_latencies(db: POSDatabase, products: int, checkouts: int, rng: random.Random):
+    """Milliseconds per record_sale call for ``checkouts`` three-line sales"""
+    samples = []
+    for _ in range(checkouts):
+        cart = [(rng.randrange(1, products + 1), 1, 100) for _ in range(3)]
+        start = time.perf_counter()
+        try:
+            db.record_sale(cart, 300)
+        except Exception:
+            pass    # out of stock lines still cost a transaction
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(products: int = 200000, checkouts: int = 2000):
+    path = temp_db_path("backup")
+    backup_dir = tempfile.mkdtemp(prefix="pos_bench_backups_")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        rng = random.Random(3)
+        idle = checkout_latencies(db, products, checkouts, rng)
+
+        manager = BackupManager(db, backup_dir, keep=100)
+        snapshots = []
+        stop = threading.Event()
+
+        def keep_backing_up():
+            while not stop.is_set():
+                snapshots.append(manager.backup_now())
+
+        thread = threading.Thread(target=keep_backing_up, daemon=True)
+        thread.start()
+        busy = checkout_latencies(db, products, checkouts, rng)
+        stop.set()
+        thread.join()
+
+        print(f"{products} products, {checkouts} checkouts per run")
+        for label, samples in (("no backup", idle), ("backup running", busy)):
+            print(f"{label:<15} p50 {percentile(samples, 50):6.2f} ms   "
+                  f"p95 {percentile(samples, 95):6.2f} ms   p99 {percentile(samples, 99):6.2f} ms")
+        print(f"snapshots taken during the run: {len(snapshots)}")
+    finally:
+        db.close()
+        remove_db(path)
+        shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,41 @@
+"""
+Scan latency against the in-memory ProductCatalog.
+Run: python -m benchmarks.bench_catalog [products] [scans]
+"""
+
+import random
+import sys
+import time
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, make_barcode, rate, timed
+
+
+def run(products: int = 200000, scans: int = 100000):
+    path = temp_db_path("catalog")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        _, load_time = timed(db.load_catalog)
+
+        rng = random.Random(7)
+        barcodes = [make_barcode(rng.randrange(products)) for _ in range(scans)]
+        worst = 0.0
+        start = time.perf_counter()
+        for barcode in barcodes:
+            t0 = time.perf_counter()
+            db.get_product_by_barcode(barcode)
+            worst = max(worst, time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+
+        print(f"catalog: {products} products loaded in {load_time * 1000:.0f} ms")
+        print(f"scans:   {rate(scans, elapsed):>12.0f} scans/s")
+        print(f"mean:    {elapsed / scans * 1e6:>12.2f} us")
+        print(f"worst:   {worst * 1e6:>12.2f} us")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,45 @@
+"""
+Barcode scan throughput: connect-per-call versus the persistent connection.
+Run: python -m benchmarks.bench_connection [products] [scans]
+"""
+
+import random
+import sqlite3
+import sys
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, make_barcode, rate, timed
+
+
+def legacy_lookup(db_path: str, barcode: str):
+    """The old get_product_by_barcode: open, query, close"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM products WHERE barcode = ?", (barcode,))
+    product = cursor.fetchone()
+    conn.close()
+    return product
+
+
+def run(products: int = 20000, scans: int = 20000):
+    path = temp_db_path("connection")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        rng = random.Random(7)
+        barcodes = [make_barcode(rng.randrange(products)) for _ in range(scans)]
+
+        _, legacy_time = timed(lambda: [legacy_lookup(path, b) for b in barcodes])
+        _, pooled_time = timed(lambda: [db.get_product_by_barcode(b) for b in barcodes])
+
+        print(f"catalog: {products} products, {scans} scans")
+        print(f"connect-per-call:      {rate(scans, legacy_time):>10.0f} scans/s")
+        print(f"persistent connection: {rate(scans, pooled_time):>10.0f} scans/s")
+        print(f"speedup:               {legacy_time / pooled_time:>10.1f}x")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,67 @@
+"""
+Sales history browsing: the first page, scrolling deep into the history
+with keyset pages, each filter on its own, and drilling into one sale.
+Run: python -m benchmarks.bench_history [products] [sales] [days]
+"""
+
+import datetime
+import random
+import sys
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, populate_sales, timed
+
+PAGE = 200
+CUSTOMERS = ["Guest"] * 20 + [f"Customer {i}" for i in range(500)]
+
+
+def scroll(db: POSDatabase, pages: int, **filters):
+    """Fetch ``pages`` consecutive pages; returns rows seen"""
+    before, seen = None, 0
+    for _ in range(pages):
+        rows = db.get_sales_page(before=before, limit=PAGE, **filters)
+        seen += len(rows)
+        if len(rows) < PAGE:
+            break
+        before = (rows[-1][1], rows[-1][0])
+    return seen
+
+
+def run(products: int = 20000, sales: int = 1000000, days: int = 365):
+    path = temp_db_path("history")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        populate_sales(db, products, sales, days)
+        rng = random.Random(3)
+        with db.transaction() as cursor:
+            cursor.executemany("UPDATE sales SET customer_name = ? WHERE id = ?",
+                               [(rng.choice(CUSTOMERS), sale_id) for sale_id in range(1, sales + 1)])
+        print(f"{sales} sales over {days} days, {products} products")
+
+        today = datetime.date.today()
+        month_ago = (today - datetime.timedelta(days=30)).isoformat()
+        cases = [
+            ("first page", 1, {}),
+            ("50 pages deep", 50, {}),
+            ("one month", 1, {"start_day": month_ago, "end_day": today.isoformat()}),
+            ("one customer", 1, {"customer": "customer 42"}),
+            ("customer, 10 pages", 10, {"customer": "Guest"}),
+            ("total >= 120.00", 1, {"min_total": 12000}),
+            ("total 5.00-6.00", 5, {"min_total": 500, "max_total": 600}),
+        ]
+        for label, pages, filters in cases:
+            seen, elapsed = timed(lambda: scroll(db, pages, **filters))
+            print(f"{label:<20} {seen:>7} rows in {elapsed * 1000:8.2f} ms  "
+                  f"({elapsed * 1000 / pages:.2f} ms a page)")
+
+        ids = [rng.randrange(1, sales + 1) for _ in range(1000)]
+        _, elapsed = timed(lambda: [db.get_sale_lines(sale_id) for sale_id in ids])
+        print(f"drill-down           {elapsed * 1000 / len(ids):.3f} ms a sale")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:4]))
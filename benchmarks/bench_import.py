@@ -0,0 +1,49 @@
+"""
+Bulk CSV import throughput: first load (all inserts) then a re-import
+of the same file with a share of rows changed (all upserts).
+Run: python -m benchmarks.bench_import [rows]
+"""
+
+import csv
+import os
+import random
+import sys
+
+from database import POSDatabase
+from importer import import_products_csv
+from benchmarks.common import temp_db_path, remove_db, make_barcode, make_product_names
+
+
+def write_csv(path: str, count: int, seed: int):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Barcode", "Name", "Price", "Stock"])
+        for i, name in enumerate(make_product_names(count)):
+            writer.writerow([make_barcode(i), name, f"{rng.uniform(0.5, 50):.2f}", rng.randint(0, 500)])
+        writer.writerow(["", "Broken row", "1.00", "1"])
+
+
+def run(rows: int = 100000):
+    path = temp_db_path("import")
+    csv_path = path + ".csv"
+    db = POSDatabase(path)
+    try:
+        write_csv(csv_path, rows, seed=1)
+        first = import_products_csv(db, csv_path)
+        db.load_catalog()
+        write_csv(csv_path, rows, seed=2)
+        second = import_products_csv(db, csv_path)
+
+        print(f"{rows} rows")
+        print(f"first import:  {first.summary()}  ({first.rows_per_second:.0f} rows/s)")
+        print(f"re-import:     {second.summary()}  ({second.rows_per_second:.0f} rows/s, catalog loaded)")
+    finally:
+        db.close()
+        remove_db(path)
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
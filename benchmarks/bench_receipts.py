@@ -0,0 +1,50 @@
+"""
+Receipt rendering from stored sales: one receipt, a full day into one
+file, and a whole month into one file and into one file per sale.
+Run: python -m benchmarks.bench_receipts [products] [sales] [days]
+"""
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+
+from database import POSDatabase
+from receipts import render_receipt, write_receipts
+from benchmarks.common import temp_db_path, remove_db, populate_products, populate_sales, timed, rate
+
+
+def run(products: int = 20000, sales: int = 300000, days: int = 30):
+    path = temp_db_path("receipts")
+    db = POSDatabase(path)
+    out_dir = tempfile.mkdtemp(prefix="pos_bench_receipts_")
+    try:
+        populate_products(db, products)
+        populate_sales(db, products, sales, days)
+        print(f"{sales} sales over {days} days ({sales // days} a day), {products} products")
+
+        singles = 1000
+        _, elapsed = timed(lambda: [render_receipt(db, sale_id) for sale_id in range(1, singles + 1)])
+        print(f"single receipt:      {elapsed * 1000 / singles:.3f} ms each")
+
+        day = datetime.date.today() - datetime.timedelta(days=days // 2)
+        month_start = datetime.date.today() - datetime.timedelta(days=days)
+        cases = [
+            ("one day, one file", os.path.join(out_dir, "day.txt"), day, day),
+            ("all days, one file", os.path.join(out_dir, "all.txt"), month_start, None),
+        ]
+        per_sale_dir = os.path.join(out_dir, "per_sale")
+        os.mkdir(per_sale_dir)
+        cases.append(("one day, per sale", per_sale_dir, day, day))
+        for label, target, start, end in cases:
+            count, elapsed = timed(write_receipts, db, target, start, end)
+            print(f"{label:<20} {count:>7} receipts in {elapsed:6.2f} s  ({rate(count, elapsed):9.0f}/s)")
+    finally:
+        db.close()
+        remove_db(path)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:4]))
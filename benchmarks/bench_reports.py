@@ -0,0 +1,58 @@
+"""
+Report queries against the sales summaries, compared with scanning the raw
+sales history. Sales are generated straight into the tables, then the
+summaries are rebuilt once.
+Run: python -m benchmarks.bench_reports [products] [sales] [days]
+"""
+
+import datetime
+import sys
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, populate_sales, timed
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Fastest of ``repeat`` runs, in milliseconds"""
+    return min(timed(func)[1] for _ in range(repeat)) * 1000
+
+
+def run(products: int = 20000, sales: int = 500000, days: int = 3 * 365):
+    path = temp_db_path("reports")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        populate_sales(db, products, sales, days)
+        _, rebuild_time = timed(db.rebuild_sales_summaries)
+
+        today = datetime.date.today().isoformat()
+        month = today[:7]
+        conn = db.get_connection()
+        queries = [
+            ("today's revenue",
+             lambda: db.get_sales_totals(today, today),
+             lambda: conn.execute("SELECT COUNT(*), SUM(total_amount) FROM sales WHERE timestamp >= ?",
+                                  (today,)).fetchone()),
+            ("sales by hour",
+             lambda: db.get_sales_by_hour(today),
+             lambda: conn.execute("SELECT substr(timestamp, 12, 2), COUNT(*), SUM(total_amount) FROM sales "
+                                  "WHERE timestamp >= ? GROUP BY 1", (today,)).fetchall()),
+            ("top 20 this month",
+             lambda: db.get_top_products(month),
+             lambda: conn.execute("SELECT si.product_id, SUM(si.quantity), SUM(si.subtotal) AS revenue "
+                                  "FROM sale_items si JOIN sales s ON s.id = si.sale_id "
+                                  "WHERE s.timestamp >= ? GROUP BY 1 ORDER BY revenue DESC LIMIT 20",
+                                  (month,)).fetchall()),
+        ]
+
+        print(f"{sales} sales over {days} days, {products} products")
+        print(f"summary rebuild: {rebuild_time:.1f} s")
+        for label, summary, raw in queries:
+            print(f"{label:<18} summary {best_of(summary):8.3f} ms   raw scan {best_of(raw, 2):9.1f} ms")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,118 @@
+"""
+Scanner burst detection: replay timed key streams from a jittery HID
+scanner at a sustained scan rate, mixed with a cashier typing name
+searches, through ScanBurstDetector and the till. Checks that every
+scan comes out as exactly its own code and that typing is never taken
+for a scan, then compares the barcode-only fast path with the full
+search path on the same codes.
+Run: python -m benchmarks.bench_scanner [--products N] [--scans N] [--rate SCANS_PER_S]
+                                        [--key-gap S] [--typed-share F] [--unknown-share F]
+"""
+
+import argparse
+import random
+import time
+
+from cart import Till
+from database import POSDatabase
+from scanner_input import ScanBurstDetector, SCANNER_KEY_GAP
+from benchmarks.common import temp_db_path, remove_db, populate_products, make_barcode, percentile
+
+RETURN = "\n"
+
+
+def key_stream(rng: random.Random, db: POSDatabase, products: int, scans: int, rate: float, key_gap: float,
+               typed_share: float, unknown_share: float):
+    """Timed (seconds, char) key events and the (kind, text) each Return should produce"""
+    events, expected = [], []
+    t = 0.0
+    for _ in range(scans):
+        start = t
+        if rng.random() < typed_share:
+            # A cashier typing the first word of a product name
+            text = db.get_product_by_id(rng.randrange(products) + 1)[2].split()[0]
+            kind, gaps = "typed", (0.08, 0.3)
+        else:
+            index = rng.randrange(products)
+            text = make_barcode(products + index if rng.random() < unknown_share else index)
+            kind, gaps = "scan", (key_gap * 0.1, key_gap)
+        for char in text + RETURN:
+            events.append((t, char))
+            t += rng.uniform(*gaps)
+        expected.append((kind, text))
+        t = max(t, start + 1 / rate)
+    return events, expected
+
+
+def replay(events, detector: ScanBurstDetector, till: Till):
+    """Feed the keys through the detector; returns ((kind, text) per Return, fast-path seconds per scan)"""
+    seen, fast_times = [], []
+    typed = []
+    for now, char in events:
+        if char != RETURN:
+            detector.key(char, now)
+            typed.append(char)
+            continue
+        code = detector.end(now)
+        if code is None:
+            seen.append(("typed", "".join(typed)))
+        else:
+            began = time.perf_counter()
+            till.scan_barcode(code)
+            fast_times.append(time.perf_counter() - began)
+            seen.append(("scan", code))
+        typed.clear()
+    return seen, fast_times
+
+
+def run(products: int = 50000, scans: int = 20000, rate: float = 8.0, key_gap: float = 0.02,
+        typed_share: float = 0.05, unknown_share: float = 0.05, seed: int = 9):
+    path = temp_db_path("scanner")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        db.get_connection().execute("UPDATE products SET stock = 1000000")
+        db.load_catalog()
+        events, expected = key_stream(random.Random(seed), db, products, scans, rate, key_gap,
+                                      typed_share, unknown_share)
+
+        # Reservations off: this measures lookup and cart work, not database writes
+        seen, fast_times = replay(events, ScanBurstDetector(), Till(db, reserve=False))
+        wrong = sum(a != b for a, b in zip(expected, seen)) + abs(len(expected) - len(seen))
+        typed_as_scan = sum(e[0] == "typed" and s[0] == "scan" for e, s in zip(expected, seen))
+        scans_lost = sum(e[0] == "scan" and s != e for e, s in zip(expected, seen))
+        print(f"{len(expected)} entries at {rate:g} scans/s, scanner key gap up to {key_gap * 1000:g} ms "
+              f"(threshold {SCANNER_KEY_GAP * 1000:g} ms)")
+        print(f"  scans dropped or merged: {scans_lost}   typing taken for a scan: {typed_as_scan}   "
+              f"entries wrong: {wrong}")
+
+        codes = [text for kind, text in expected if kind == "scan"]
+        till = Till(db, reserve=False)
+        full_times = []
+        for code in codes:
+            began = time.perf_counter()
+            till.scan(code)
+            full_times.append(time.perf_counter() - began)
+        for label, samples in (("fast path (barcode only)", fast_times), ("full search path", full_times)):
+            print(f"  {label:<25} p50 {percentile(samples, 50) * 1e6:8.1f} us  "
+                  f"p99 {percentile(samples, 99) * 1e6:8.1f} us  max {max(samples) * 1e6:9.1f} us")
+        return wrong
+    finally:
+        db.close()
+        remove_db(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scanner burst detection and scan fast path")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--scans", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=8.0, help="scans per second")
+    parser.add_argument("--key-gap", type=float, default=0.02, help="longest gap between a scanner's keys (s)")
+    parser.add_argument("--typed-share", type=float, default=0.05, help="share of entries typed by hand")
+    parser.add_argument("--unknown-share", type=float, default=0.05, help="share of scans of unknown barcodes")
+    args = parser.parse_args()
+    run(args.products, args.scans, args.rate, args.key_gap, args.typed_share, args.unknown_share)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Product name/barcode search latency with the in-memory search index.
+Run: python -m benchmarks.bench_search [products] [queries]
+"""
+
+import random
+import sys
+import time
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, make_barcode, percentile, timed
+
+
+def make_queries(db: POSDatabase, products: int, count: int, rng: random.Random):
+    """Mix of word prefixes, mid-word substrings and partial barcodes"""
+    queries = []
+    for _ in range(count):
+        product = db.get_product_by_barcode(make_barcode(rng.randrange(products)))
+        word = rng.choice(product[2].split())
+        kind = rng.random()
+        if kind < 0.6:
+            queries.append(word[:rng.randint(1, len(word))])
+        elif kind < 0.9 and len(word) > 4:
+            start = rng.randint(1, len(word) - 3)
+            queries.append(word[start:start + 3])
+        else:
+            queries.append(product[1][-6:])
+    return queries
+
+
+def run(products: int = 500000, queries: int = 2000):
+    path = temp_db_path("search")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        _, load_time = timed(db.load_catalog)
+        _, index_time = timed(db.catalog.get_index)
+        rng = random.Random(11)
+        terms = make_queries(db, products, queries, rng)
+
+        samples = []
+        for term in terms:
+            start = time.perf_counter()
+            db.search_products(term, limit=20)
+            samples.append(time.perf_counter() - start)
+
+        print(f"catalog: {products} products, loaded in {load_time:.1f} s, index built in {index_time:.1f} s")
+        print(f"queries: {queries} (top 20)")
+        print(f"mean:    {sum(samples) / len(samples) * 1000:8.3f} ms")
+        print(f"p50:     {percentile(samples, 50) * 1000:8.3f} ms")
+        print(f"p95:     {percentile(samples, 95) * 1000:8.3f} ms")
+        print(f"p99:     {percentile(samples, 99) * 1000:8.3f} ms")
+        print(f"max:     {max(samples) * 1000:8.3f} ms")
+
+        product = db.get_product_by_barcode(make_barcode(0))
+        _, update_time = timed(db.update_product, product[0], "Renamed " + product[2], product[3], product[4])
+        print(f"incremental rename: {update_time * 1000:.3f} ms")
+    finally:
+        db.close()
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
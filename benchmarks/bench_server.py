@@ -0,0 +1,162 @@
+"""
+Concurrent load benchmark for the HTTP/JSON service (server.py).
+Starts the server on a temporary database, then runs simulated tills that
+each create a cart, scan a basket and check out over keep-alive
+connections, for each client count in turn.
+Run: python -m benchmarks.bench_server [--products N] [--clients 1,4,16] [--baskets N]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+from database import POSDatabase
+from checkout_journal import CheckoutQueue
+from server import POSServer
+from benchmarks.common import temp_db_path, remove_db, populate_products, make_barcode, percentile, rate
+
+
+class Client:
+    """Minimal keep-alive HTTP/JSON client"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port: int):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method: str, path: str, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+async def till(port: int, products: int, baskets: int, basket: int, rng: random.Random, latencies: list):
+    """One simulated till; returns (requests, checkouts, errors)"""
+    client = await Client.connect(port)
+    requests = checkouts = errors = 0
+    try:
+        _, cart = await client.request("POST", "/carts")
+        cart_path = f"/carts/{cart['cart_id']}"
+        for _ in range(baskets):
+            for _ in range(basket):
+                began = time.perf_counter()
+                status, _ = await client.request("POST", cart_path + "/scan",
+                                                 {"term": make_barcode(rng.randrange(products))})
+                latencies.append(time.perf_counter() - began)
+                requests += 1
+                errors += status != 200
+            began = time.perf_counter()
+            status, _ = await client.request("POST", cart_path + "/checkout", {"customer": "Bench"})
+            latencies.append(time.perf_counter() - began)
+            requests += 1
+            if status == 200:
+                checkouts += 1
+            else:
+                errors += 1
+                await client.request("DELETE", cart_path)
+                _, cart = await client.request("POST", "/carts")
+                cart_path = f"/carts/{cart['cart_id']}"
+    finally:
+        client.close()
+    return requests, checkouts, errors
+
+
+async def load(port: int, clients: int, products: int, baskets: int, basket: int, seed: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(till(port, products, baskets, basket, random.Random(seed + i), latencies)
+                                     for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    requests = sum(r[0] for r in results)
+    return {
+        "clients": clients,
+        "requests_per_s": round(rate(requests, elapsed), 1),
+        "checkouts_per_s": round(rate(sum(r[1] for r in results), elapsed), 1),
+        "errors": sum(r[2] for r in results),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run(products: int = 20000, clients=(1, 4, 16), baskets: int = 50, basket: int = 10,
+        journal: bool = True, seed: int = 5):
+    path = temp_db_path("server")
+    db = POSDatabase(path)
+    populate_products(db, products)
+    db.get_connection().execute("UPDATE products SET stock = 1000000")
+    queue = CheckoutQueue(db, journal_path=path + ".journal") if journal else None
+    pos_server = POSServer(db, queue)
+
+    # The server gets its own thread and event loop, as it would its own process
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    ports = []
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(pos_server.start("127.0.0.1", 0))
+        ports.append(server.sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    try:
+        results = []
+        for count in clients:
+            result = asyncio.run(load(ports[0], count, products, baskets, basket, seed))
+            results.append(result)
+            print(f"{count:>4} clients: {result['requests_per_s']:>9} req/s  "
+                  f"{result['checkouts_per_s']:>8} checkouts/s  "
+                  f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                  f"errors {result['errors']}")
+        return results
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        pos_server.close()
+        if queue is not None:
+            queue.close()
+        db.close()
+        remove_db(path)
+        remove_db(path + ".journal")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load against the HTTP/JSON service")
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--clients", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--baskets", type=int, default=50, help="checkouts per client")
+    parser.add_argument("--basket", type=int, default=10, help="scans per checkout")
+    parser.add_argument("--direct", action="store_true", help="checkout with record_sale instead of the journal")
+    args = parser.parse_args()
+    run(args.products, [int(c) for c in args.clients.split(",")], args.baskets, args.basket,
+        journal=not args.direct)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start benchmark: time from process start until the till can serve a
+barcode scan, on a large database. Each path runs in a fresh interpreter.
+
+  eager  the old startup: a throwaway handle to check for products with
+         get_all_products(), a second handle that loads the whole catalog,
+         a third for the inventory window and a file copy for backup, all
+         before the first scan
+  lazy   main.py's startup: one handle, has_products(), journal replay,
+         catalog loaded in the background while scans go to SQLite
+
+Run: python -m benchmarks.bench_startup [products] [sales] [runs]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from database import POSDatabase
+from benchmarks.common import temp_db_path, remove_db, populate_products, populate_sales, make_barcode
+
+EAGER = """
+import shutil
+db = POSDatabase(path)
+empty = not db.get_all_products()
+db.close()
+db = POSDatabase(path)
+db.load_catalog()
+queue = CheckoutQueue(db, journal_path=path + ".journal")
+inventory_db = POSDatabase(path)
+shutil.copyfile(path, path + ".bak")
+catalog_ready = time.perf_counter()
+product = Till(db, queue).scan(barcode)
+ready = time.perf_counter()
+"""
+
+LAZY = """
+db = POSDatabase(path)
+main.seed_sample_products(db)
+queue = CheckoutQueue(db, journal_path=path + ".journal")
+thread = db.preload_catalog()
+product = Till(db, queue).scan(barcode)
+ready = time.perf_counter()
+thread.join()
+catalog_ready = time.perf_counter()
+"""
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import json, sys
+sys.path.insert(0, {root!r})
+import main
+from database import POSDatabase
+from checkout_journal import CheckoutQueue
+from cart import Till
+imported = time.perf_counter()
+path, barcode = {path!r}, {barcode!r}
+{body}
+assert product is not None
+print(json.dumps({{"imports": imported - start, "first_scan": ready - start,
+                   "catalog": catalog_ready - start}}))
+"""
+
+
+def measure(path: str, body: str, barcode: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = SCRIPT.format(root=root, path=path, barcode=barcode, body=body)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=root).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(products: int = 300000, sales: int = 300000, runs: int = 3):
+    path = temp_db_path("startup")
+    db = POSDatabase(path)
+    try:
+        populate_products(db, products)
+        populate_sales(db, products, sales, days=365)
+        db.rebuild_sales_summaries()
+        db.close()
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{products} products, {sales} sales ({size_mb:.0f} MB)")
+        barcode = make_barcode(products // 2)
+        for label, body in (("eager", EAGER), ("lazy", LAZY)):
+            results = [measure(path, body, barcode) for _ in range(runs)]
+            best = min(results, key=lambda r: r["first_scan"])
+            print(f"{label:<6} imports {best['imports'] * 1000:7.0f} ms   first scan {best['first_scan'] * 1000:7.0f} ms"
+                  f"   catalog ready {best['catalog'] * 1000:7.0f} ms")
+    finally:
+        remove_db(path)
+        for suffix in (".journal", ".bak"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,173 @@
+"""
+End-to-end till benchmark: replay a synthetic scan stream through the
+headless Till (lookup -> cart -> checkout) and report throughput and
+latency percentiles. Results go to a JSON file so runs from different
+versions can be compared.
+Run: python -m benchmarks.bench_till [--products N] [--history N] [--scans N]
+                                     [--no-reserve] [--instrument]
+                                     [--json results.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+
+from cart import Till, CartError
+from checkout_journal import CheckoutQueue
+from database import POSDatabase, InsufficientStockError
+from benchmarks.common import (temp_db_path, remove_db, populate_products, populate_sales,
+                               make_barcode, percentile, rate)
+
+
+def make_scan_stream(db: POSDatabase, products: int, scans: int, basket: int, search_share: float,
+                     rng: random.Random):
+    """Terms to scan, with None marking a checkout after every ``basket`` scans.
+
+    Most terms are barcodes; ``search_share`` of them are the first word of
+    a product name, as typed by a cashier.
+    """
+    stream = []
+    for i in range(scans):
+        index = rng.randrange(products)
+        if rng.random() < search_share:
+            stream.append(db.get_product_by_id(index + 1)[2].split()[0])
+        else:
+            stream.append(make_barcode(index))
+        if (i + 1) % basket == 0:
+            stream.append(None)
+    return stream
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds"""
+    if not samples:
+        return {}
+    return {f"p{pct}_ms": round(percentile(samples, pct) * 1000, 4) for pct in (50, 95, 99)}
+
+
+def replay(till: Till, stream):
+    scan_times, checkout_times = [], []
+    misses = 0
+    start = time.perf_counter()
+    for term in stream:
+        began = time.perf_counter()
+        if term is None:
+            if till.cart.lines:
+                try:
+                    till.checkout()
+                except InsufficientStockError:
+                    till.clear()
+                checkout_times.append(time.perf_counter() - began)
+            continue
+        try:
+            if till.scan(term) is None:
+                misses += 1
+        except CartError:
+            misses += 1
+        scan_times.append(time.perf_counter() - began)
+    return scan_times, checkout_times, misses, time.perf_counter() - start
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(products: int = 50000, history: int = 100000, scans: int = 20000, basket: int = 10,
+        search_share: float = 0.1, journal: bool = True, reserve: bool = True, instrument: bool = False,
+        seed: int = 11) -> dict:
+    path = temp_db_path("till")
+    db = POSDatabase(path, settings={"instrument": instrument, "slow_query_log": path + ".slow.log"})
+    queue = None
+    try:
+        populate_products(db, products)
+        db.get_connection().execute("UPDATE products SET stock = 1000000")
+        if history:
+            populate_sales(db, products, history, days=365)
+            db.rebuild_sales_summaries()
+        db.load_catalog()
+        stream = make_scan_stream(db, products, scans, basket, search_share, random.Random(seed))
+
+        if journal:
+            queue = CheckoutQueue(db, journal_path=path + ".journal")
+        # As the Tk till: with the journal, reservations go through its writer
+        till = Till(db, queue, reserve=reserve, defer_reservations=True)
+        scan_times, checkout_times, misses, elapsed = replay(till, stream)
+        if queue is not None:
+            queue.flush()
+
+        return {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "params": {"products": products, "history": history, "scans": scans, "basket": basket,
+                       "search_share": search_share, "journal": journal, "reserve": reserve,
+                       "instrument": instrument},
+            "scans_per_s": round(rate(len(scan_times), sum(scan_times)), 1),
+            "checkouts_per_s": round(rate(len(checkout_times), sum(checkout_times)), 1),
+            "end_to_end_scans_per_s": round(rate(len(scan_times), elapsed), 1),
+            "misses": misses,
+            "scan": summarize(scan_times),
+            "checkout": summarize(checkout_times),
+        }
+    finally:
+        if queue is not None:
+            queue.close()
+        db.close()
+        remove_db(path)
+        remove_db(path + ".journal")
+        remove_db(path + ".slow.log")
+
+
+def compare(old: dict, new: dict):
+    """Print each metric with its change from ``old``"""
+    def metrics(result):
+        flat = {"scans_per_s": result["scans_per_s"], "checkouts_per_s": result["checkouts_per_s"]}
+        for section in ("scan", "checkout"):
+            for key, value in result.get(section, {}).items():
+                flat[f"{section}.{key}"] = value
+        return flat
+
+    before, after = metrics(old), metrics(new)
+    print(f"compared with {old.get('revision', '?')} ({old.get('timestamp', '?')}):")
+    for key, value in after.items():
+        if key in before and before[key]:
+            change = (value - before[key]) * 100 / before[key]
+            print(f"  {key:<22} {before[key]:>12} -> {value:>12}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless scan -> cart -> checkout benchmark")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--history", type=int, default=100000, help="sales already in the database")
+    parser.add_argument("--scans", type=int, default=20000)
+    parser.add_argument("--basket", type=int, default=10, help="scans per checkout")
+    parser.add_argument("--search-share", type=float, default=0.1, help="share of scans that are name searches")
+    parser.add_argument("--direct", action="store_true", help="checkout with record_sale instead of the journal")
+    parser.add_argument("--no-reserve", action="store_true", help="do not reserve stock as items are scanned")
+    parser.add_argument("--instrument", action="store_true", help="time every database call and statement")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    result = run(args.products, args.history, args.scans, args.basket, args.search_share,
+                 journal=not args.direct, reserve=not args.no_reserve, instrument=args.instrument)
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
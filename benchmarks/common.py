@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from database import POSDatabase
+
+
+def temp_db_path(label: str) -> str:
+    """Return a fresh database path in the temp directory"""
+    fd, path = tempfile.mkstemp(prefix=f"pos_bench_{label}_", suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def remove_db(path: str):
+    """Delete a benchmark database and its WAL side files"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def make_barcode(index: int) -> str:
+    """Deterministic 13-digit barcode for product number ``index``"""
+    return f"{2000000000000 + index:013d}"
+
+
+PRODUCT_WORDS = ["Cola", "Chips", "Candy", "Water", "Juice", "Bread", "Milk", "Cheese",
+                 "Coffee", "Tea", "Soap", "Rice", "Pasta", "Sugar", "Flour", "Oil"]
+SIZES = ["100g", "250g", "500g", "1kg", "33cl", "50cl", "1L", "1.5L", "2L", "x6", "x12"]
+
+
+def make_brands(rng: random.Random, count: int = 3000):
+    """Pronounceable synthetic brand names"""
+    syllables = [c + v for c in "bcdfgklmnprstvz" for v in "aeiou"]
+    return sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()
+                   for _ in range(count)})
+
+
+def make_product_names(count: int, seed: int = 42):
+    """``count`` synthetic product names such as 'Kobari Cola 33cl'"""
+    rng = random.Random(seed)
+    brands = make_brands(rng)
+    return [f"{rng.choice(brands)} {rng.choice(PRODUCT_WORDS)} {rng.choice(SIZES)}"
+            for _ in range(count)]
+
+
+def populate_products(db: POSDatabase, count: int, seed: int = 42):
+    """Bulk insert ``count`` synthetic products"""
+    rng = random.Random(seed)
+    rows = []
+    for i, name in enumerate(make_product_names(count, seed)):
+        rows.append((make_barcode(i), name, rng.randint(50, 5000), rng.randint(0, 500)))
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, ?)", rows)
+
+
+def populate_sales(db: POSDatabase, products: int, sales: int, days: int, seed: int = 5):
+    """Insert ``sales`` random sales spread over the last ``days`` days"""
+    rng = random.Random(seed)
+    start = datetime.datetime.now() - datetime.timedelta(days=days)
+    span = days * 86400
+    sale_rows, item_rows = [], []
+    for sale_id in range(1, sales + 1):
+        timestamp = (start + datetime.timedelta(seconds=span * sale_id // sales)).isoformat()
+        total = 0
+        for _ in range(rng.randint(1, 5)):
+            subtotal = rng.randint(50, 3000)
+            total += subtotal
+            item_rows.append((sale_id, rng.randrange(1, products + 1), rng.randint(1, 3), subtotal))
+        sale_rows.append((sale_id, timestamp, total, "Guest"))
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO sales (id, timestamp, total_amount, customer_name) VALUES (?, ?, ?, ?)",
+                           sale_rows)
+        cursor.executemany("INSERT INTO sale_items (sale_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
+                           item_rows)
+
+
+def rate(count: int, seconds: float) -> float:
+    """Operations per second"""
+    return count / seconds if seconds else float("inf")
+
+
+def timed(func, *args):
+    """Run ``func`` and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def percentile(samples, pct: float) -> float:
+    """The ``pct``-th percentile (0-100) of ``samples``"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,265 @@
+"""
+Cart and checkout logic with no display dependency.
+The Tk till, the benchmarks and any other front end drive a Till; the UI
+only paints what it returns.
+"""
+
+import queue
+import uuid
+from typing import List, Optional, Tuple
+
+from database import POSDatabase, InsufficientStockError
+from product_catalog import ID, NAME, PRICE, STOCK
+
+# Stock level under which the till warns while scanning
+LOW_STOCK = 5
+# Most name matches offered when a search term is not a barcode
+SEARCH_LIMIT = 50
+
+class CartError(Exception):
+    """Raised when a cart change would take more than the stock on hand"""
+
+    def __init__(self, message: str, product: Tuple):
+        self.product = product
+        super().__init__(message)
+
+class CartLine:
+    """One product in the cart"""
+
+    __slots__ = ("product", "quantity")
+
+    def __init__(self, product: Tuple, quantity: int = 0):
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def subtotal(self) -> int:
+        return self.product[PRICE] * self.quantity
+
+class Cart:
+    """Cart lines keyed by product ID, with running totals in minor units.
+
+    Every change adjusts ``total`` and ``item_count`` by its own difference,
+    so reading them never walks the lines.
+    """
+
+    __slots__ = ("lines", "total", "item_count")
+
+    def __init__(self):
+        self.lines = {}    # product ID -> CartLine
+        self.total = 0
+        self.item_count = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, product_id):
+        return product_id in self.lines
+
+    def quantity(self, product_id: int) -> int:
+        line = self.lines.get(product_id)
+        return line.quantity if line else 0
+
+    def product(self, product_id: int) -> Optional[Tuple]:
+        line = self.lines.get(product_id)
+        return line.product if line else None
+
+    def add(self, product: Tuple) -> int:
+        """Add one unit of ``product``; returns the line's new quantity"""
+        if product[STOCK] <= 0:
+            raise CartError(f"'{product[NAME]}' is out of stock!", product)
+        quantity = self.quantity(product[ID])
+        if quantity >= product[STOCK]:
+            raise CartError(f"Only {product[STOCK]} units available for '{product[NAME]}'", product)
+        return self.set_quantity(product[ID], quantity + 1, product)
+
+    def set_quantity(self, product_id: int, quantity: int, product: Optional[Tuple] = None) -> int:
+        """Set a line's quantity (0 removes it); returns the quantity kept"""
+        line = self.lines.get(product_id)
+        if line is None:
+            if quantity <= 0:
+                return 0
+            line = self.lines[product_id] = CartLine(product)
+        quantity = max(quantity, 0)
+
+        # Keep running totals instead of re-summing the cart
+        change = quantity - line.quantity
+        self.total += line.product[PRICE] * change
+        self.item_count += change
+
+        if not quantity:
+            del self.lines[product_id]
+            return 0
+        line.quantity = quantity
+        return quantity
+
+    def remove(self, product_id: int):
+        self.set_quantity(product_id, 0)
+
+    def clear(self):
+        self.lines.clear()
+        self.total = 0
+        self.item_count = 0
+
+    def sale_items(self) -> List[Tuple[int, int, int]]:
+        """(product_id, quantity, subtotal) lines for recording the sale"""
+        return [(product_id, line.quantity, line.subtotal) for product_id, line in self.lines.items()]
+
+class Till:
+    """One checkout lane: product lookup, the current cart and checkout.
+
+    With a CheckoutQueue, checkout returns as soon as the sale is journaled
+    and gives back its client reference; without one the sale is written
+    with POSDatabase.record_sale and its sale ID is returned.
+
+    With ``reserve`` every cart change also reserves the line's quantity
+    in the database under ``holder``, so other lanes and windows cannot
+    sell the same units; checkout turns the reservations into the stock
+    decrement. Change the cart through the Till's methods, not the Cart's.
+
+    With ``defer_reservations`` (and a CheckoutQueue) the reservation
+    writes go through the queue's writer thread instead, ahead of the sale
+    that ends the cart, so the caller never waits on the database. Cart
+    changes are checked against the catalog's stock straight away; units
+    held by other carts only show up later, and ``take_conflicts`` cuts
+    those lines back.
+    """
+
+    def __init__(self, db: POSDatabase, checkout_queue=None, reserve: bool = True,
+                 defer_reservations: bool = False):
+        self.db = db
+        self.checkout_queue = checkout_queue
+        self.reserve = reserve
+        self.defer_reservations = defer_reservations and checkout_queue is not None
+        self.holder = uuid.uuid4().hex
+        self.cart = Cart()
+        # (holder, product ID, units free) from reservations the writer could not take
+        self.conflicts = queue.Queue()
+
+    def find(self, term: str, limit: int = SEARCH_LIMIT) -> List[Tuple]:
+        """Products for a scanned barcode or typed search term, best first"""
+        term = term.strip()
+        if not term:
+            return []
+        product = self.db.get_product_by_barcode(term)
+        if product:
+            return [product]
+        return self.db.search_products(term, limit=limit)
+
+    def scan(self, term: str) -> Optional[Tuple]:
+        """Add the single product ``term`` identifies; None if it matches none or several"""
+        matches = self.find(term, limit=2)
+        if len(matches) != 1:
+            return None
+        self.add(matches[0])
+        return matches[0]
+
+    def scan_barcode(self, barcode: str) -> Optional[Tuple]:
+        """Add the product with exactly this barcode (scanner input, no name search); None if unknown"""
+        product = self.db.get_product_by_barcode(barcode)
+        if product is None:
+            return None
+        self.add(product)
+        return product
+
+    def add(self, product: Tuple) -> int:
+        """Add one unit of ``product``; returns the line's new quantity"""
+        quantity = self.cart.add(product)
+        self._reserve(product, quantity - 1)
+        return quantity
+
+    def set_quantity(self, product_id: int, quantity: int, product: Optional[Tuple] = None) -> int:
+        """Set a line's quantity (0 removes it); returns the quantity kept"""
+        product = self.cart.product(product_id) or product
+        if product is None:
+            return 0
+        previous = self.cart.quantity(product_id)
+        quantity = self.cart.set_quantity(product_id, quantity, product)
+        if quantity != previous:
+            self._reserve(product, previous)
+        return quantity
+
+    def remove(self, product_id: int):
+        self.set_quantity(product_id, 0)
+
+    def clear(self):
+        """Empty the cart and give back its reservations"""
+        self.cart.clear()
+        if self.reserve:
+            if self.defer_reservations:
+                self.checkout_queue.release(self.holder)
+                # Conflicts still on their way belong to the old cart
+                self.holder = uuid.uuid4().hex
+            else:
+                self.db.release_reservations(self.holder)
+
+    def take_conflicts(self) -> List[Tuple[Tuple, int]]:
+        """Cut lines whose deferred reservation failed to the units still free.
+
+        Call it from the thread that owns the cart; returns (product, units
+        kept) for every line cut.
+        """
+        cut = []
+        while True:
+            try:
+                holder, product_id, available = self.conflicts.get_nowait()
+            except queue.Empty:
+                return cut
+            product = self.cart.product(product_id)
+            available = max(available, 0)
+            if holder != self.holder or product is None or self.cart.quantity(product_id) <= available:
+                continue    # that cart is gone, or a later change already fits
+            self.cart.set_quantity(product_id, available, product)
+            self._reserve(product, available)
+            cut.append((product, available))
+
+    def _conflict(self, holder: str, product_id: int, available: int):
+        # Called on the checkout writer thread
+        self.conflicts.put((holder, product_id, available))
+
+    def _reserve(self, product: Tuple, previous: int):
+        """Reserve the cart's quantity of ``product``, or put the line back to ``previous`` and raise CartError"""
+        if not self.reserve:
+            return
+        if self.defer_reservations:
+            self.checkout_queue.reserve(self.holder, product[ID], self.cart.quantity(product[ID]), self._conflict)
+            return
+        try:
+            self.db.reserve_stock(self.holder, product[ID], self.cart.quantity(product[ID]))
+        except InsufficientStockError as e:
+            self.cart.set_quantity(product[ID], previous, product)
+            available = max(e.shortages[0][2], 0)
+            raise CartError(f"Only {available} units of '{product[NAME]}' are free (the rest are in other carts)",
+                            product) from None
+
+    def checkout(self, customer_name: str = "Guest"):
+        """Record the cart as a sale and empty it.
+
+        Raises InsufficientStockError, leaving the cart as it was, if any
+        line is short (with deferred reservations, after cutting the lines
+        other carts turned out to hold).
+        """
+        if not self.cart.lines:
+            raise ValueError("Cart is empty")
+        quantities = {product_id: line.quantity for product_id, line in self.cart.lines.items()}
+        items = self.cart.sale_items()
+        total = self.cart.total
+        holder = self.holder if self.reserve else None
+        if self.defer_reservations and holder is not None:
+            cut = self.take_conflicts()
+            if cut:
+                raise InsufficientStockError([(product[ID], quantities[product[ID]], available)
+                                              for product, available in cut])
+            # The queue writes the cart's pending reservations before the sale drops them
+            result = self.checkout_queue.submit(items, total, customer_name, holder=holder)
+        elif self.checkout_queue is not None:
+            if holder is not None:
+                # Retake anything that lapsed while the cart sat idle
+                self.db.confirm_reservations(holder, quantities)
+            result = self.checkout_queue.submit(items, total, customer_name, holder=holder)
+        else:
+            result = self.db.record_sale(items, total, customer_name, holder=holder)
+        self.cart.clear()
+        # The journaled sale drops the old holder's reservations when it commits
+        self.holder = uuid.uuid4().hex
+        return result
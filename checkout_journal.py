@@ -0,0 +1,371 @@
+"""
+Write-behind checkout pipeline.
+A sale is accepted once its line is appended (and fsynced) to a local
+journal file; a background thread commits accepted sales to SQLite in
+batches. Journal entries still on disk at startup are replayed, and the
+sales.client_ref column makes replays idempotent. A sale the database
+rejects for good is moved to a failed-checkouts file instead of holding
+up every sale behind it.
+"""
+
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from database import POSDatabase, InsufficientStockError
+from money import to_minor
+from product_catalog import STOCK
+
+# Most sales written per SQLite transaction
+BATCH_MAX = 200
+# How long the writer waits for more sales once one arrives, so a burst
+# shares a transaction
+BATCH_WINDOW = 0.02
+# Back-off between failed flush attempts (doubles up to the maximum)
+RETRY_DELAY = 0.1
+RETRY_DELAY_MAX = 5.0
+# Attempts before an error other than a busy database is taken as permanent
+PERMANENT_ATTEMPTS = 3
+# Committed sale IDs remembered for wait_for (receipts of recent sales)
+RECENT_SALES = 1000
+
+def journal_path_for(db_path: str) -> str:
+    """Journal file kept next to the database"""
+    return os.path.splitext(db_path)[0] + "_checkouts.jsonl"
+
+def failed_path_for(journal_path: str) -> str:
+    """Where sales the database rejected are kept, next to the journal"""
+    return os.path.splitext(journal_path)[0] + "_failed.jsonl"
+
+def _journal_entry(entry) -> dict:
+    """Check that a replayed journal line is a sale and convert amounts written as floats"""
+    if not isinstance(entry, dict):
+        raise TypeError(f"expected an object, not {type(entry).__name__}")
+    if not isinstance(entry["ref"], str) or not isinstance(entry["total"], (int, float)):
+        raise TypeError("ref or total has the wrong type")
+    # Floats were written before amounts were integer minor units
+    legacy = isinstance(entry["total"], float)
+    items = [[product_id, quantity, to_minor(subtotal) if legacy else subtotal]
+             for product_id, quantity, subtotal in entry["items"]]
+    entry["total"] = to_minor(entry["total"]) if legacy else entry["total"]
+    entry["items"] = items
+    return entry
+
+def _is_transient(error: Exception) -> bool:
+    """True for errors that go away by waiting (another writer holds the database)"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error))
+
+class CheckoutQueue:
+    """Accept sales at journal speed and commit them in the background.
+
+    ``submit`` checks stock against the in-memory catalog, appends the sale
+    to the journal, takes the stock off the catalog and returns the sale's
+    client reference. The database sale ID follows once the writer has
+    committed it (see ``wait_for``). The journal is truncated whenever
+    everything in it is committed.
+
+    A busy database is waited out indefinitely. Any other error fails the
+    batch after PERMANENT_ATTEMPTS tries; its sales are then written one
+    by one and those still rejected are appended to ``failed_path`` and
+    counted in ``failed`` (the latest reason in ``failed_error``). Their
+    stock is returned to the catalog.
+
+    The writer also takes stock reservation changes (``reserve``,
+    ``release``, ``expire_reservations``) so a till never writes to the
+    database itself. They run in queue order ahead of the sales batched
+    with them, so a cart's reservations are in place before its sale
+    commits and drops them.
+    """
+
+    def __init__(self, db: POSDatabase, journal_path: Optional[str] = None, fsync: bool = True,
+                 batch_max: int = BATCH_MAX, batch_window: float = BATCH_WINDOW):
+        self.db = db
+        self.journal_path = journal_path or journal_path_for(db.db_path)
+        self.failed_path = failed_path_for(self.journal_path)
+        self.failed = 0
+        self.failed_error = None
+        self.fsync = fsync
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self.last_error = None
+        self.sale_ids = {}
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._unflushed = 0
+        # Refs accepted but not yet committed, so wait_for can tell them from forgotten ones
+        self._accepted = set()
+
+        self.replay()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="checkout-writer", daemon=True)
+        self._thread.start()
+
+    def replay(self) -> int:
+        """Commit any sales left in the journal by a previous run; returns how many"""
+        entries = self._read_journal()
+        if entries:
+            self.sale_ids.update(self._commit(entries, adjust_catalog_stock=True))
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        return len(entries)
+
+    def _read_journal(self) -> List[dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue    # torn final line: that sale was never acknowledged
+                try:
+                    entries.append(_journal_entry(entry))
+                except (KeyError, TypeError, ValueError) as e:
+                    # Parses but is no sale this version can write: keep it rather than stop the till
+                    self._fail(entry, adjust_catalog_stock=True, error=e)
+        return entries
+
+    def submit(self, cart_items: List[Tuple], total: int, customer_name: str = "Guest",
+               holder: Optional[str] = None) -> str:
+        """Accept a sale and return its client reference.
+
+        ``holder``'s stock reservations are dropped when the sale is
+        committed. Raises InsufficientStockError (and accepts nothing) if
+        the catalog does not hold enough stock for every line.
+        """
+        quantities = {}
+        for product_id, quantity, _ in cart_items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        catalog = self.db.get_catalog()
+        with self._lock:
+            shortages = []
+            for product_id, quantity in quantities.items():
+                product = catalog.get_by_id(product_id)
+                available = product[STOCK] if product else 0
+                if available < quantity:
+                    shortages.append((product_id, quantity, available))
+            if shortages:
+                raise InsufficientStockError(shortages)
+
+            entry = {
+                "ref": uuid.uuid4().hex,
+                "timestamp": datetime.datetime.now().isoformat(),
+                "total": total,
+                "customer": customer_name,
+                "items": [list(item) for item in cart_items],
+            }
+            if holder is not None:
+                entry["holder"] = holder
+            self._journal.write(json.dumps(entry, separators=(',', ':')) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            catalog.adjust_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+            self._unflushed += 1
+            self._accepted.add(entry["ref"])
+        self._pending.put(entry)
+        return entry["ref"]
+
+    def wait_for(self, ref: str, timeout: Optional[float] = None) -> Optional[int]:
+        """Block until the sale ``ref`` is committed and return its sale ID.
+
+        Returns None on timeout, for a failed sale, and for a ref that is
+        not pending and no longer among the RECENT_SALES remembered.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._committed:
+            while ref not in self.sale_ids:
+                if ref not in self._accepted:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._committed.wait(remaining)
+            return self.sale_ids[ref]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every accepted sale is committed; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._committed:
+            while self._unflushed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._committed.wait(remaining)
+            return True
+
+    def reserve(self, holder: str, product_id: int, quantity: int, on_conflict=None):
+        """Queue POSDatabase.reserve_stock; ``on_conflict(holder, product_id, units free)``
+        runs on the writer thread if other carts hold too much"""
+        self._pending.put(("reserve", holder, product_id, quantity, on_conflict))
+
+    def release(self, holder: str):
+        """Queue dropping every reservation of ``holder``"""
+        self._pending.put(("release", holder))
+
+    def expire_reservations(self):
+        """Queue the clean-up of lapsed reservations"""
+        self._pending.put(("expire",))
+
+    @property
+    def backlog(self) -> int:
+        """Sales accepted but not yet committed"""
+        return self._unflushed
+
+    def close(self, timeout: Optional[float] = 10.0) -> bool:
+        """Commit what is queued and stop the writer.
+
+        Returns False if sales were still uncommitted after ``timeout``;
+        they stay in the journal and are replayed on the next start.
+        """
+        flushed = self.flush(timeout)
+        self._pending.put(None)
+        self._thread.join(timeout)
+        self._journal.close()
+        return flushed
+
+    def _run(self):
+        try:
+            self._drain()
+        finally:
+            self.db.release_connection()
+
+    def _drain(self):
+        while True:
+            entry = self._pending.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = time.monotonic() + self.batch_window
+            stop = False
+            while len(batch) < self.batch_max:
+                try:
+                    entry = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+            jobs = [entry for entry in batch if isinstance(entry, tuple)]
+            if jobs:
+                self._run_jobs(jobs)
+                batch = [entry for entry in batch if not isinstance(entry, tuple)]
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _run_jobs(self, jobs: List[tuple]):
+        """Apply queued reservation changes in one transaction, then report conflicts"""
+        conflicts = []
+
+        def apply():
+            conflicts.clear()
+            with self.db.transaction(immediate=True):
+                for job in jobs:
+                    if job[0] == "reserve":
+                        _, holder, product_id, quantity, on_conflict = job
+                        try:
+                            self.db.reserve_stock(holder, product_id, quantity)
+                        except InsufficientStockError as e:
+                            if on_conflict is not None:
+                                conflicts.append((on_conflict, holder, product_id, e.shortages[0][2]))
+                    elif job[0] == "release":
+                        self.db.release_reservations(job[1])
+                    else:
+                        self.db.expire_reservations()
+
+        try:
+            self._retry(apply)
+        except Exception:
+            return    # reservations are advisory; the sales still go through
+        self.last_error = None
+        for on_conflict, holder, product_id, available in conflicts:
+            on_conflict(holder, product_id, available)
+
+    def _retry(self, func):
+        """``func()``, retried while the database is busy and up to PERMANENT_ATTEMPTS times for anything else"""
+        delay = RETRY_DELAY
+        attempts = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                self.last_error = e
+                if not _is_transient(e):
+                    attempts += 1
+                    if attempts >= PERMANENT_ATTEMPTS:
+                        raise
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_DELAY_MAX)
+
+    def _record(self, entries: List[dict], adjust_catalog_stock: bool) -> dict:
+        return self._retry(lambda: self.db.record_journaled_sales(entries, adjust_catalog_stock=adjust_catalog_stock))
+
+    def _commit(self, entries: List[dict], adjust_catalog_stock: bool = False) -> dict:
+        """Commit ``entries``; returns client ref -> sale ID, None for sales moved to the failed file"""
+        try:
+            return self._record(entries, adjust_catalog_stock)
+        except Exception:
+            sale_ids = {}
+            if len(entries) > 1:
+                # Find the sales that are rejected for good and write the rest
+                for entry in entries:
+                    try:
+                        sale_ids.update(self._record([entry], adjust_catalog_stock))
+                    except Exception:
+                        pass
+            for entry in entries:
+                if entry["ref"] not in sale_ids:
+                    self._fail(entry, adjust_catalog_stock)
+                    sale_ids[entry["ref"]] = None
+            return sale_ids
+
+    def _fail(self, entry: dict, adjust_catalog_stock: bool, error: Optional[Exception] = None):
+        """Move a rejected sale to the failed-checkouts file"""
+        error = error or self.last_error
+        record = {"failed_at": datetime.datetime.now().isoformat(), "error": str(error),
+                  "entry": entry}
+        with open(self.failed_path, 'a', encoding='utf-8') as failed:
+            failed.write(json.dumps(record, separators=(',', ':')) + "\n")
+            failed.flush()
+            os.fsync(failed.fileno())
+        self.failed += 1
+        self.failed_error = error
+        if not adjust_catalog_stock and self.db.catalog.loaded:
+            # submit() took the stock off the catalog; the sale never reached the database
+            quantities = {}
+            try:
+                for product_id, quantity, _ in entry["items"]:
+                    quantities[product_id] = quantities.get(product_id, 0) + quantity
+            except (KeyError, TypeError, ValueError):
+                return    # malformed entry: no stock to give back
+            self.db.catalog.adjust_stock(quantities)
+
+    def _write(self, batch: List[dict]):
+        """Commit ``batch``; sales rejected for good go to the failed file"""
+        sale_ids = self._commit(batch)
+
+        with self._committed:
+            self.last_error = None
+            self.sale_ids.update(sale_ids)
+            self._accepted.difference_update(sale_ids)
+            while len(self.sale_ids) > RECENT_SALES:
+                del self.sale_ids[next(iter(self.sale_ids))]
+            self._unflushed -= len(batch)
+            if not self._unflushed:
+                # Everything in the journal is in the database now
+                self._journal.seek(0)
+                self._journal.truncate()
+            self._committed.notify_all()
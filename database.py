@@ -1,151 +1,1103 @@
 import sqlite3
 import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from typing import List, Tuple, Optional
+from product_catalog import ProductCatalog
+from instrumentation import create_instrumentation
+from money import to_minor
+
+# Connection tuning applied to every POSDatabase connection.
+# Override per instance with POSDatabase(db_path, settings={...}).
+DB_SETTINGS = {
+    "timeout": 5.0,              # seconds to wait on a locked database (busy timeout)
+    "cached_statements": 256,    # prepared statements kept per connection
+    "journal_mode": "WAL",       # readers never block the writer
+    "synchronous": "NORMAL",     # safe with WAL, far fewer fsyncs
+    "cache_size_kb": 16384,      # page cache per connection
+    "temp_store": "MEMORY",
+    # Per-call and per-statement timing (see instrumentation.py); off costs nothing
+    "instrument": os.environ.get("POS_INSTRUMENT") == "1",
+    "slow_query_ms": 50.0,       # statements slower than this go to the slow-query log
+    "slow_query_log": "slow_queries.log",
+}
+
+# Stay under SQLite's default host-parameter limit on older builds
+MAX_SQL_PARAMS = 900
+
+# Seconds a cart's stock reservations last without activity on the cart
+RESERVATION_TTL = 10 * 60
+
+# Sortable product columns and the SQL expression each one orders by
+PRODUCT_SORT_COLUMNS = {
+    "id": "id",
+    "barcode": "barcode",
+    "name": "name COLLATE NOCASE",
+    "price": "price",
+    "stock": "stock",
+}
+
+def _chunks(values: List, size: int = MAX_SQL_PARAMS):
+    """Split ``values`` into lists small enough for one IN (...) clause"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _rebuild_summaries(cursor: sqlite3.Cursor):
+    """Recompute every summary table from sales and sale_items"""
+    cursor.execute("DELETE FROM sales_hourly")
+    cursor.execute("DELETE FROM sales_daily")
+    cursor.execute("DELETE FROM product_sales_monthly")
+    for table, key, length in (("sales_hourly", "hour", 13), ("sales_daily", "day", 10)):
+        cursor.execute(f"""
+            INSERT INTO {table} ({key}, sale_count, item_count, revenue)
+            SELECT substr(s.timestamp, 1, {length}), COUNT(*), SUM(COALESCE(i.items, 0)), SUM(s.total_amount)
+            FROM sales s
+            LEFT JOIN (SELECT sale_id, SUM(quantity) AS items FROM sale_items GROUP BY sale_id) i
+                ON i.sale_id = s.id
+            GROUP BY 1
+        """)
+    cursor.execute("""
+        INSERT INTO product_sales_monthly (month, product_id, quantity, revenue)
+        SELECT substr(s.timestamp, 1, 7), si.product_id, SUM(si.quantity), SUM(si.subtotal)
+        FROM sale_items si JOIN sales s ON s.id = si.sale_id
+        GROUP BY 1, 2
+    """)
+
+def _migration_base_tables(cursor: sqlite3.Cursor):
+    """Products, sales and sale items (no-op on databases that predate versioning)"""
+    # Products table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            stock INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Updated sales table with customer name
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            total_amount REAL NOT NULL,
+            customer_name TEXT DEFAULT 'Guest'
+        )
+    ''')
+
+    # Sale items table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            subtotal REAL NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+def _migration_sales_summaries(cursor: sqlite3.Cursor):
+    """Summary tables for reports, filled from any existing sales"""
+    # Kept up to date by record_sale
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_hourly (
+            hour TEXT PRIMARY KEY,
+            sale_count INTEGER NOT NULL,
+            item_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT PRIMARY KEY,
+            sale_count INTEGER NOT NULL,
+            item_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_sales_monthly (
+            month TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (month, product_id)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_summaries(cursor)
+
+def _migration_hot_path_indexes(cursor: sqlite3.Cursor):
+    """Indexes for receipts, per-product sales, date ranges and name sorting"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items (sale_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items (product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_timestamp ON sales (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products (name COLLATE NOCASE)")
+
+def _migration_sale_client_ref(cursor: sqlite3.Cursor):
+    """Client-side sale reference so journaled checkouts are written once"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(sales)")}
+    if "client_ref" not in columns:
+        cursor.execute("ALTER TABLE sales ADD COLUMN client_ref TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_client_ref ON sales (client_ref)")
+
+def _migration_change_log(cursor: sqlite3.Cursor):
+    """Append-only change log for lane sync, seeded with the current products"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    # Existing products reach the central store as if they were added now
+    products = cursor.execute("SELECT barcode, name, price, stock FROM products ORDER BY id").fetchall()
+    for chunk in _chunks(products, 5000):
+        _log_changes(cursor, [
+            ("products", {"rows": [[barcode, name, price] for barcode, name, price, _ in chunk]}),
+            ("stocks", {"rows": [[barcode, stock] for barcode, _, _, stock in chunk if stock]}),
+        ])
+
+def _minor(column: str) -> str:
+    """SQL converting a REAL amount column to integer minor units"""
+    return f"CAST(ROUND({column} * 100) AS INTEGER)"
+
+def _payload_to_minor(kind: str, payload: dict) -> dict:
+    """Convert the amounts in a change log payload written before integer money"""
+    if kind == "product":
+        payload["price"] = to_minor(payload["price"])
+    elif kind == "products":
+        payload["rows"] = [[barcode, name, to_minor(price)] for barcode, name, price in payload["rows"]]
+    elif kind == "sale":
+        payload["total"] = to_minor(payload["total"])
+        payload["items"] = [[barcode, quantity, to_minor(subtotal)]
+                            for barcode, quantity, subtotal in payload["items"]]
+    return payload
+
+def _migration_integer_money(cursor: sqlite3.Cursor):
+    """Store prices, totals and revenue as INTEGER minor units instead of REAL"""
+    # Column types cannot be altered, so each table is rebuilt under its own
+    # name, keeping IDs and AUTOINCREMENT counters
+    rebuilds = [
+        ("products", '''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            stock INTEGER NOT NULL DEFAULT 0
+        ''', f"id, barcode, name, {_minor('price')}, stock"),
+        ("sales", '''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            total_amount INTEGER NOT NULL,
+            customer_name TEXT DEFAULT 'Guest',
+            client_ref TEXT
+        ''', f"id, timestamp, {_minor('total_amount')}, customer_name, client_ref"),
+        ("sale_items", '''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            subtotal INTEGER NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        ''', f"id, sale_id, product_id, quantity, {_minor('subtotal')}"),
+    ]
+    for table, columns, select in rebuilds:
+        sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        cursor.execute(f"CREATE TABLE {table}_new ({columns})")
+        cursor.execute(f"INSERT INTO {table}_new SELECT {select} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        if sequence is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+    # Dropping the old tables dropped their indexes
+    _migration_hot_path_indexes(cursor)
+    _migration_sale_client_ref(cursor)
+
+    for table, key in (("sales_hourly", "hour"), ("sales_daily", "day")):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f'''
+            CREATE TABLE {table} (
+                {key} TEXT PRIMARY KEY,
+                sale_count INTEGER NOT NULL,
+                item_count INTEGER NOT NULL,
+                revenue INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    cursor.execute("DROP TABLE product_sales_monthly")
+    cursor.execute('''
+        CREATE TABLE product_sales_monthly (
+            month TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            revenue INTEGER NOT NULL,
+            PRIMARY KEY (month, product_id)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_summaries(cursor)
+
+    # Changes not yet synced (and a central store's log) carry amounts too
+    for table in ("change_log", "central_log"):
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            rows = cursor.execute(
+                f"SELECT seq, kind, payload FROM {table} WHERE kind IN ('product', 'products', 'sale')").fetchall()
+            cursor.executemany(f"UPDATE {table} SET payload = ? WHERE seq = ?", [
+                (json.dumps(_payload_to_minor(kind, json.loads(payload)), separators=(',', ':')), seq)
+                for seq, kind, payload in rows])
+
+def _migration_stock_reservations(cursor: sqlite3.Cursor):
+    """Per-product edit version and short-lived stock reservations held by open carts"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(products)")}
+    if "version" not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            holder TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (holder, product_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_product ON stock_reservations (product_id, expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_expiry ON stock_reservations (expires_at)")
+
+def _migration_sales_history_indexes(cursor: sqlite3.Cursor):
+    """Indexes for browsing sales newest first by customer, and a sale's lines in order"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales (customer_name COLLATE NOCASE, timestamp)")
+    # Covers the drill-down and the per-sale item counts without touching the table
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale_lines "
+                   "ON sale_items (sale_id, id, product_id, quantity, subtotal)")
+    cursor.execute("DROP INDEX IF EXISTS idx_sale_items_sale")
+
+def _migration_product_sort_indexes(cursor: sqlite3.Cursor):
+    """Indexes for keyset pages of the inventory list sorted by price or stock"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_price ON products (price, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock, id)")
+
+def _log_changes(cursor: sqlite3.Cursor, changes: List[Tuple[str, dict]]):
+    """Append (kind, payload) changes to the change log"""
+    if changes:
+        cursor.executemany("INSERT INTO change_log (kind, payload) VALUES (?, ?)",
+                           [(kind, json.dumps(payload, separators=(',', ':'))) for kind, payload in changes])
+
+# Schema upgrades in order; the database's PRAGMA user_version counts how
+# many have run. Append new steps, never edit or reorder shipped ones.
+# Each runs in its own transaction together with the user_version bump, so
+# user_version is the only thing that stops a step running again: the
+# schema steps tolerate objects that already exist (databases from before
+# versioning), but _migration_integer_money rewrites data and must run once.
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_sales_summaries,
+    _migration_hot_path_indexes,
+    _migration_sale_client_ref,
+    _migration_change_log,
+    _migration_integer_money,
+    _migration_stock_reservations,
+    _migration_sales_history_indexes,
+    _migration_product_sort_indexes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+class InsufficientStockError(Exception):
+    """Raised when a sale would take a product's stock below zero.
+
+    ``shortages`` lists (product_id, requested, available) for every
+    offending line; nothing is written when this is raised.
+    """
+
+    def __init__(self, shortages: List[Tuple[int, int, int]]):
+        self.shortages = shortages
+        super().__init__("Insufficient stock for product(s): " +
+                         ", ".join(str(product_id) for product_id, _, _ in shortages))
+
+class StaleProductError(Exception):
+    """Raised when a product changed (or was deleted) after the copy being edited was read"""
+
+    def __init__(self, product_id: int):
+        self.product_id = product_id
+        super().__init__(f"Product {product_id} was changed elsewhere; reload it and try again")
 
 class POSDatabase:
-    def __init__(self, db_path: str = "pos_system.db"):
+    def __init__(self, db_path: str = "pos_system.db", settings: Optional[dict] = None):
         self.db_path = db_path
+        self.settings = dict(DB_SETTINGS, **(settings or {}))
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Held around commits and while a catalog load takes its snapshot
+        self._commit_lock = threading.Lock()
+        self.catalog = ProductCatalog()
+        self._catalog_lock = threading.RLock()
+        self.instrumentation = create_instrumentation(self.settings)
+        if self.instrumentation is not None:
+            self.instrumentation.wrap_methods(self)
         self.init_database()
-    
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.settings["timeout"],
+            cached_statements=self.settings["cached_statements"],
+            isolation_level=None,
+            check_same_thread=False,
+            factory=self.instrumentation.connection_factory() if self.instrumentation else sqlite3.Connection
+        )
+        conn.execute(f"PRAGMA journal_mode = {self.settings['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous = {self.settings['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.settings['cache_size_kb'])}")
+        conn.execute(f"PRAGMA temp_store = {self.settings['temp_store']}")
+        return conn
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release_connection(self):
+        """Close the calling thread's connection; call it as a worker thread finishes"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """Run a block in one transaction and yield a cursor.
+
+        Nested use joins the outer transaction. ``immediate`` takes the
+        write lock up front so read-then-write blocks cannot deadlock.
+        """
+        conn = self.get_connection()
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            with self._commit_lock:
+                self._local.catalog_epoch = self.catalog.epoch
+                conn.commit()
+
+    def _write_through(self, func, *args, **kwargs):
+        """Apply this thread's last commit to the catalog (see ProductCatalog.write)"""
+        if self.get_connection().in_transaction:
+            epoch = self.catalog.epoch    # nested: the outer transaction commits later
+        else:
+            epoch = getattr(self._local, "catalog_epoch", self.catalog.epoch)
+        self.catalog.write(epoch, func, *args, **kwargs)
+
+    def close(self):
+        """Close every connection opened by this instance"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        if self.instrumentation is not None:
+            self.instrumentation.close()
+
     def init_database(self):
-        """Initialize database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Products table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                barcode TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                stock INTEGER NOT NULL DEFAULT 0
-            )
-        ''')
-        
-        # Updated sales table with customer name
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                customer_name TEXT DEFAULT 'Guest'
-            )
-        ''')
-        
-        # Sale items table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sale_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sale_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                subtotal REAL NOT NULL,
-                FOREIGN KEY (sale_id) REFERENCES sales (id),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def add_product(self, barcode: str, name: str, price: float, stock: int) -> bool:
+        """Create the schema, or upgrade an existing database to SCHEMA_VERSION"""
+        conn = self.get_connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"Database schema version {version} is newer than this program supports ({SCHEMA_VERSION})")
+        for target, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.transaction(immediate=True) as cursor:
+                # Another process may have upgraded while we waited for the lock
+                if cursor.execute("PRAGMA user_version").fetchone()[0] >= target:
+                    continue
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+
+    def load_catalog(self) -> ProductCatalog:
+        """Load every product into the in-memory catalog.
+
+        Both queries read one snapshot. It is taken under the commit lock,
+        so each of this instance's commits is either in it or tagged with
+        the new catalog epoch and replayed after the load.
+        """
+        with self._catalog_lock, self.transaction() as cursor:
+            with self._commit_lock:
+                # The first step of the SELECT fixes the snapshot
+                cursor.execute("SELECT id, barcode, name, price, stock FROM products")
+                self.catalog.begin_load()
+            rows = cursor.fetchall()
+            # Units sold per product from the monthly summary, far smaller than sale_items
+            counts = cursor.execute(
+                "SELECT product_id, SUM(quantity) FROM product_sales_monthly GROUP BY product_id").fetchall()
+            self.catalog.set_sales_counts(counts)
+            self.catalog.load(rows)
+        return self.catalog
+
+    def get_catalog(self) -> ProductCatalog:
+        """Return the product catalog, loading it on first use"""
+        if not self.catalog.loaded:
+            with self._catalog_lock:
+                if not self.catalog.loaded:
+                    self.load_catalog()
+        return self.catalog
+
+    def _preload_catalog(self):
+        try:
+            self.get_catalog()
+        finally:
+            self.release_connection()
+
+    def preload_catalog(self) -> threading.Thread:
+        """Load the catalog on a background thread and return the thread.
+
+        Until it is loaded, barcode and ID lookups and searches query SQLite
+        directly, and anything that needs the whole catalog (stock checks at
+        checkout) waits for the load. Start anything else that changes the
+        catalog in the background (sync) once the thread has finished.
+        """
+        thread = threading.Thread(target=self._preload_catalog, name="catalog-load", daemon=True)
+        thread.start()
+        return thread
+
+    def has_products(self) -> bool:
+        """True if there is at least one product (without counting them)"""
+        return self.get_connection().execute("SELECT 1 FROM products LIMIT 1").fetchone() is not None
+
+    def add_product(self, barcode: str, name: str, price: int, stock: int) -> bool:
         """Add new product to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, ?)",
-                (barcode, name, price, stock)
-            )
-            conn.commit()
-            conn.close()
-            return True
+            with self.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, ?)",
+                    (barcode, name, price, stock)
+                )
+                product_id = cursor.lastrowid
+                changes = [("product", {"barcode": barcode, "name": name, "price": price})]
+                if stock:
+                    changes.append(("stock", {"barcode": barcode, "delta": stock}))
+                _log_changes(cursor, changes)
         except sqlite3.IntegrityError:
             return False
-    
+        self._write_through(self.catalog.put, (product_id, barcode, name, price, stock))
+        return True
+
+    def upsert_products(self, rows: List[Tuple]) -> Tuple[int, int]:
+        """Insert new products and update price and stock of existing ones
+
+        ``rows`` are (barcode, name, price, stock) with unique barcodes. The
+        whole batch is one transaction; returns (inserted, updated).
+        """
+        barcodes = [row[0] for row in rows]
+        with self.transaction(immediate=True) as cursor:
+            existing = {}
+            for chunk in _chunks(barcodes):
+                cursor.execute(
+                    "SELECT barcode, name, stock FROM products "
+                    f"WHERE barcode IN ({','.join('?' * len(chunk))})", chunk)
+                existing.update((barcode, (name, stock)) for barcode, name, stock in cursor.fetchall())
+            cursor.executemany("""
+                INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, ?)
+                ON CONFLICT(barcode) DO UPDATE SET price = excluded.price, stock = excluded.stock,
+                                                   version = version + 1
+            """, rows)
+
+            # One change per kind for the whole batch keeps the log small
+            products, stocks = [], []
+            for barcode, name, price, stock in rows:
+                name, old_stock = existing.get(barcode, (name, 0))
+                products.append([barcode, name, price])
+                if stock != old_stock:
+                    stocks.append([barcode, stock - old_stock])
+            _log_changes(cursor, [("products", {"rows": products}), ("stocks", {"rows": stocks})])
+
+            changed = []
+            if self.catalog.loaded or self.catalog.loading:
+                for chunk in _chunks(barcodes):
+                    cursor.execute(
+                        "SELECT id, barcode, name, price, stock FROM products "
+                        f"WHERE barcode IN ({','.join('?' * len(chunk))})", chunk)
+                    changed.extend(cursor.fetchall())
+
+        self._write_through(self.catalog.put_many, changed)
+        return len(rows) - len(existing), len(existing)
+
     def get_product_by_barcode(self, barcode: str) -> Optional[Tuple]:
         """Get product by barcode"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE barcode = ?", (barcode,))
-        product = cursor.fetchone()
-        conn.close()
-        return product
-    
+        if self.catalog.loaded:
+            return self.catalog.get_by_barcode(barcode)
+        # Catalog still loading: one index lookup instead of waiting for it
+        return self.get_connection().execute(
+            "SELECT id, barcode, name, price, stock FROM products WHERE barcode = ?", (barcode,)).fetchone()
+
+    def get_product_by_id(self, product_id: int) -> Optional[Tuple]:
+        """Get product by ID"""
+        if self.catalog.loaded:
+            return self.catalog.get_by_id(product_id)
+        return self.get_connection().execute(
+            "SELECT id, barcode, name, price, stock FROM products WHERE id = ?", (product_id,)).fetchone()
+
+    def search_products(self, term: str, limit: Optional[int] = 20) -> List[Tuple]:
+        """Search products by name or barcode, best matches first"""
+        if self.catalog.loaded:
+            return self.catalog.search(term, limit)
+        # Catalog still loading: plain substring match, no ranking
+        pattern = f"%{term.strip()}%"
+        return self.get_connection().execute(
+            "SELECT id, barcode, name, price, stock FROM products WHERE name LIKE ? OR barcode LIKE ? "
+            "ORDER BY name COLLATE NOCASE LIMIT ?", (pattern, pattern, -1 if limit is None else limit)).fetchall()
+
+    def suggest_products(self, term: str, limit: int = 8) -> List[Tuple]:
+        """Autocomplete suggestions ranked by match quality and sales (none while the catalog loads)"""
+        if not self.catalog.loaded:
+            return []
+        return self.catalog.suggest(term, limit)
+
     def update_stock(self, product_id: int, new_stock: int):
         """Update product stock"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE products SET stock = ? WHERE id = ?", (new_stock, product_id))
-        conn.commit()
-        conn.close()
-    
-    def record_sale(self, cart_items: List[Tuple], total: float, customer_name: str = "Guest") -> int:
-        """Record sale with customer name and return sale ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        timestamp = datetime.datetime.now().isoformat()
-        cursor.execute("INSERT INTO sales (timestamp, total_amount, customer_name) VALUES (?, ?, ?)", 
-                      (timestamp, total, customer_name))
+        with self.transaction(immediate=True) as cursor:
+            self._log_stock_change(cursor, product_id, new_stock)
+            cursor.execute("UPDATE products SET stock = ?, version = version + 1 WHERE id = ?",
+                           (new_stock, product_id))
+        self._write_through(self.catalog.update, product_id, stock=new_stock)
+
+    def _log_stock_change(self, cursor: sqlite3.Cursor, product_id: int, new_stock: int):
+        """Log an absolute stock change as the delta other lanes should apply"""
+        row = cursor.execute("SELECT barcode, stock FROM products WHERE id = ?", (product_id,)).fetchone()
+        if row is not None and row[1] != new_stock:
+            _log_changes(cursor, [("stock", {"barcode": row[0], "delta": new_stock - row[1]})])
+
+    def record_sale(self, cart_items: List[Tuple], total: int, customer_name: str = "Guest",
+                    holder: Optional[str] = None) -> int:
+        """Record sale with customer name and return sale ID
+
+        Runs in one immediate transaction: stock less other carts'
+        reservations is checked for every line, line items go in with a
+        single bulk insert and stock drops through a conditional decrement.
+        ``holder``'s reservations become the decrement and are dropped.
+        Raises InsufficientStockError (and records nothing) if any line
+        would oversell.
+        """
+        quantities = {}
+        for product_id, quantity, _ in cart_items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        with self.transaction(immediate=True) as cursor:
+            available = self._fetch_available(cursor, list(quantities), holder)
+            shortages = [(product_id, quantity, available.get(product_id, 0))
+                         for product_id, quantity in quantities.items()
+                         if available.get(product_id, 0) < quantity]
+            if shortages:
+                raise InsufficientStockError(shortages)
+
+            timestamp = datetime.datetime.now().isoformat()
+            sale_id = self._insert_sale(cursor, cart_items, total, customer_name, timestamp, uuid.uuid4().hex)
+            cursor.executemany(
+                "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                [(quantity, product_id, quantity) for product_id, quantity in quantities.items()]
+            )
+            if cursor.rowcount != len(quantities):
+                raise sqlite3.DatabaseError("Stock changed during sale")
+            if holder is not None:
+                cursor.execute("DELETE FROM stock_reservations WHERE holder = ?", (holder,))
+
+        self._write_through(self.catalog.adjust_stock,
+                            {product_id: -quantity for product_id, quantity in quantities.items()})
+        self._write_through(self.catalog.add_sales, quantities)
+        return sale_id
+
+    def record_journaled_sales(self, entries: List[dict], adjust_catalog_stock: bool = False) -> dict:
+        """Write already-accepted sales in one transaction; returns client ref -> sale ID
+
+        Each entry has ``ref``, ``timestamp``, ``total``, ``customer`` and
+        ``items`` ((product_id, quantity, subtotal) lines). Entries whose ref
+        is already in the database are skipped, so replaying a journal is
+        safe. Stock is decremented without a floor: the goods have left the
+        shop, so a shortfall shows up as negative stock rather than a lost
+        sale. The catalog's stock is left alone unless
+        ``adjust_catalog_stock`` (the till already took it off). An entry's
+        ``holder`` reservations are dropped in the same transaction, so the
+        units stay held until the decrement lands.
+        """
+        refs = [entry["ref"] for entry in entries]
+        sale_ids = {}
+        sold = {}
+        with self.transaction(immediate=True) as cursor:
+            for chunk in _chunks(refs):
+                cursor.execute(f"SELECT client_ref, id FROM sales WHERE client_ref IN ({','.join('?' * len(chunk))})",
+                               chunk)
+                sale_ids.update(cursor.fetchall())
+            cursor.executemany("DELETE FROM stock_reservations WHERE holder = ?",
+                               [(entry["holder"],) for entry in entries if entry.get("holder")])
+            for entry in entries:
+                if entry["ref"] in sale_ids:
+                    continue
+                quantities = {}
+                for product_id, quantity, _ in entry["items"]:
+                    quantities[product_id] = quantities.get(product_id, 0) + quantity
+                    sold[product_id] = sold.get(product_id, 0) + quantity
+                sale_ids[entry["ref"]] = self._insert_sale(cursor, entry["items"], entry["total"],
+                                                           entry["customer"], entry["timestamp"], entry["ref"])
+                cursor.executemany("UPDATE products SET stock = stock - ? WHERE id = ?",
+                                   [(quantity, product_id) for product_id, quantity in quantities.items()])
+
+        if adjust_catalog_stock:
+            self._write_through(self.catalog.adjust_stock,
+                                {product_id: -quantity for product_id, quantity in sold.items()})
+        self._write_through(self.catalog.add_sales, sold)
+        return sale_ids
+
+    def _insert_sale(self, cursor: sqlite3.Cursor, cart_items: List[Tuple], total: int,
+                     customer_name: str, timestamp: str, client_ref: Optional[str] = None,
+                     log: bool = True) -> int:
+        """Insert the sale, its line items and summary updates; returns the sale ID"""
+        cursor.execute(
+            "INSERT INTO sales (timestamp, total_amount, customer_name, client_ref) VALUES (?, ?, ?, ?)",
+            (timestamp, total, customer_name, client_ref))
         sale_id = cursor.lastrowid
-        
-        # Insert sale items and update stock
-        for product_id, quantity, subtotal in cart_items:
+        cursor.executemany(
+            "INSERT INTO sale_items (sale_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
+            [(sale_id, product_id, quantity, subtotal) for product_id, quantity, subtotal in cart_items]
+        )
+        self._add_sale_to_summaries(cursor, timestamp, total, cart_items)
+        if not log:
+            return sale_id
+
+        barcodes = {}
+        product_ids = list({product_id for product_id, _, _ in cart_items})
+        for chunk in _chunks(product_ids):
             cursor.execute(
-                "INSERT INTO sale_items (sale_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
-                (sale_id, product_id, quantity, subtotal)
-            )
-            
-            # Update stock
-            cursor.execute("SELECT stock FROM products WHERE id = ?", (product_id,))
-            current_stock = cursor.fetchone()[0]
-            new_stock = max(0, current_stock - quantity)
-            cursor.execute("UPDATE products SET stock = ? WHERE id = ?", (new_stock, product_id))
-        
-        conn.commit()
-        conn.close()
+                f"SELECT id, barcode FROM products WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            barcodes.update(cursor.fetchall())
+        _log_changes(cursor, [("sale", {
+            "ref": client_ref, "timestamp": timestamp, "total": total, "customer": customer_name,
+            "items": [[barcodes.get(product_id), quantity, subtotal]
+                      for product_id, quantity, subtotal in cart_items],
+        })])
         return sale_id
-    
+
+    def get_changes(self, after: int = 0, limit: int = 100) -> List[Tuple]:
+        """(seq, kind, payload) change log entries with seq above ``after``"""
+        cursor = self.get_connection().execute(
+            "SELECT seq, kind, payload FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit))
+        return [(seq, kind, json.loads(payload)) for seq, kind, payload in cursor.fetchall()]
+
+    def prune_changes(self, upto: int):
+        """Drop change log entries up to ``upto`` (once the central store has them)"""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM change_log WHERE seq <= ?", (upto,))
+
+    def get_sync_value(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.get_connection().execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_sync_value(self, key: str, value):
+        with self.transaction() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def apply_changes(self, changes: List[Tuple[str, dict]], keep_sales: bool = False,
+                      sync_key: Optional[str] = None, sync_value=None):
+        """Apply changes made elsewhere, without logging them again
+
+        Products are matched by barcode; stock changes and sales move stock
+        by deltas, so every copy converges whatever order lanes sync in.
+        Sales are stored only with ``keep_sales`` (the central store); a
+        sale whose reference is already present is skipped. ``sync_key`` is
+        set to ``sync_value`` in the same transaction, so a sync position
+        never runs ahead of the data.
+        """
+        touched = set()
+        deltas = {}
+        deleted = []
+        with self.transaction(immediate=True) as cursor:
+            for kind, payload in changes:
+                if kind in ("product", "products"):
+                    rows = payload["rows"] if kind == "products" else [
+                        (payload["barcode"], payload["name"], payload["price"])]
+                    cursor.executemany("""
+                        INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, 0)
+                        ON CONFLICT(barcode) DO UPDATE SET name = excluded.name, price = excluded.price,
+                                                           version = version + 1
+                        -- A lane's own edits come back from the central store: no-ops there
+                        WHERE name != excluded.name OR price != excluded.price
+                    """, rows)
+                    touched.update(row[0] for row in rows)
+                elif kind == "stock":
+                    self._apply_stock_delta(cursor, deltas, payload["barcode"], payload["delta"])
+                elif kind == "stocks":
+                    for barcode, delta in payload["rows"]:
+                        self._apply_stock_delta(cursor, deltas, barcode, delta)
+                elif kind == "delete":
+                    row = cursor.execute("SELECT id FROM products WHERE barcode = ?",
+                                         (payload["barcode"],)).fetchone()
+                    if row is not None:
+                        cursor.execute("DELETE FROM products WHERE id = ?", row)
+                        cursor.execute("DELETE FROM stock_reservations WHERE product_id = ?", row)
+                        deleted.append(row[0])
+                    touched.discard(payload["barcode"])
+                    deltas.pop(payload["barcode"], None)
+                elif kind == "sale":
+                    if keep_sales:
+                        if cursor.execute("SELECT 1 FROM sales WHERE client_ref = ?",
+                                          (payload["ref"],)).fetchone():
+                            continue
+                        items = []
+                        for barcode, quantity, subtotal in payload["items"]:
+                            row = cursor.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()
+                            if row is not None:
+                                items.append((row[0], quantity, subtotal))
+                        self._insert_sale(cursor, items, payload["total"], payload["customer"],
+                                          payload["timestamp"], payload["ref"], log=False)
+                    for barcode, quantity, _ in payload["items"]:
+                        self._apply_stock_delta(cursor, deltas, barcode, -quantity)
+            if sync_key is not None:
+                cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                               (sync_key, str(sync_value)))
+
+            rows = []
+            for chunk in _chunks(list(touched)):
+                cursor.execute("SELECT id, barcode, name, price, stock FROM products "
+                               f"WHERE barcode IN ({','.join('?' * len(chunk))})", chunk)
+                rows.extend(cursor.fetchall())
+
+        def refresh_catalog():
+            for product_id in deleted:
+                self.catalog.remove(product_id)
+            stock_changes = {}
+            for product_id, barcode, name, price, stock in rows:
+                if self.catalog.get_by_id(product_id) is None:
+                    self.catalog.put((product_id, barcode, name, price, stock))
+                    deltas.pop(barcode, None)    # the fresh row already has them
+                else:
+                    self.catalog.update(product_id, name=name, price=price)
+            for barcode, (product_id, delta) in deltas.items():
+                stock_changes[product_id] = delta
+            self.catalog.adjust_stock(stock_changes)
+        self._write_through(refresh_catalog)
+
+    def _apply_stock_delta(self, cursor: sqlite3.Cursor, deltas: dict, barcode: str, delta: int):
+        row = cursor.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        if row is None:
+            return
+        cursor.execute("UPDATE products SET stock = stock + ? WHERE id = ?", (delta, row[0]))
+        product_id, total = deltas.get(barcode, (row[0], 0))
+        deltas[barcode] = (product_id, total + delta)
+
+    def _add_sale_to_summaries(self, cursor: sqlite3.Cursor, timestamp: str, total: int,
+                               cart_items: List[Tuple]):
+        """Fold one sale into the hourly, daily and per-product summaries"""
+        lines = {}
+        for product_id, quantity, subtotal in cart_items:
+            line = lines.setdefault(product_id, [0, 0])
+            line[0] += quantity
+            line[1] += subtotal
+        items = sum(quantity for quantity, _ in lines.values())
+
+        for table, key, period in (("sales_hourly", "hour", timestamp[:13]),
+                                   ("sales_daily", "day", timestamp[:10])):
+            cursor.execute(f"""
+                INSERT INTO {table} ({key}, sale_count, item_count, revenue) VALUES (?, 1, ?, ?)
+                ON CONFLICT({key}) DO UPDATE SET
+                    sale_count = sale_count + 1,
+                    item_count = item_count + excluded.item_count,
+                    revenue = revenue + excluded.revenue
+            """, (period, items, total))
+        cursor.executemany("""
+            INSERT INTO product_sales_monthly (month, product_id, quantity, revenue) VALUES (?, ?, ?, ?)
+            ON CONFLICT(month, product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue
+        """, [(timestamp[:7], product_id, quantity, revenue)
+              for product_id, (quantity, revenue) in lines.items()])
+
+    def rebuild_sales_summaries(self):
+        """Recompute the sales summaries from the raw sales (after repairs or imports)"""
+        with self.transaction(immediate=True) as cursor:
+            _rebuild_summaries(cursor)
+
+    def get_sales_totals(self, start_day: str, end_day: str) -> Tuple[int, int, int]:
+        """(sales, items sold, revenue) for the inclusive YYYY-MM-DD range"""
+        cursor = self.get_connection().execute("""
+            SELECT COALESCE(SUM(sale_count), 0), COALESCE(SUM(item_count), 0), COALESCE(SUM(revenue), 0)
+            FROM sales_daily WHERE day BETWEEN ? AND ?
+        """, (start_day, end_day))
+        return cursor.fetchone()
+
+    def get_sales_by_hour(self, day: str) -> List[Tuple]:
+        """(hour 0-23, sales, items sold, revenue) for each hour of ``day`` with sales"""
+        cursor = self.get_connection().execute("""
+            SELECT CAST(substr(hour, 12, 2) AS INTEGER), sale_count, item_count, revenue
+            FROM sales_hourly WHERE hour >= ? AND hour < ? ORDER BY hour
+        """, (day, day + "U"))    # 'T' separates date and hour; 'U' sorts just after it
+        return cursor.fetchall()
+
+    def get_daily_sales(self, start_day: str, end_day: str) -> List[Tuple]:
+        """(day, sales, items sold, revenue) for each day in the inclusive range with sales"""
+        cursor = self.get_connection().execute(
+            "SELECT day, sale_count, item_count, revenue FROM sales_daily WHERE day BETWEEN ? AND ? ORDER BY day",
+            (start_day, end_day))
+        return cursor.fetchall()
+
+    def get_top_products(self, month: str, limit: int = 20) -> List[Tuple]:
+        """(product_id, name, quantity, revenue) of the best sellers in YYYY-MM by revenue"""
+        cursor = self.get_connection().execute("""
+            SELECT m.product_id, COALESCE(p.name, '(deleted)'), m.quantity, m.revenue
+            FROM product_sales_monthly m LEFT JOIN products p ON p.id = m.product_id
+            WHERE m.month = ?
+            ORDER BY m.revenue DESC, m.quantity DESC
+            LIMIT ?
+        """, (month, limit))
+        return cursor.fetchall()
+
+    def _fetch_available(self, cursor: sqlite3.Cursor, product_ids: List[int], holder: Optional[str] = None,
+                         now: Optional[float] = None) -> dict:
+        """Map product ID to stock not held by other carts' unexpired reservations"""
+        now = time.time() if now is None else now
+        available = {}
+        for chunk in _chunks(product_ids):
+            cursor.execute(f"""
+                SELECT p.id, p.stock - COALESCE((SELECT SUM(r.quantity) FROM stock_reservations r
+                                                 WHERE r.product_id = p.id AND r.expires_at > ? AND r.holder != ?), 0)
+                FROM products p WHERE p.id IN ({','.join('?' * len(chunk))})
+            """, [now, holder or ""] + chunk)
+            available.update(cursor.fetchall())
+        return available
+
+    def get_available_stock(self, product_id: int, holder: Optional[str] = None) -> int:
+        """Stock of a product that ``holder`` could still reserve (0 if there is no such product)"""
+        with self.transaction() as cursor:
+            return self._fetch_available(cursor, [product_id], holder).get(product_id, 0)
+
+    def reserve_stock(self, holder: str, product_id: int, quantity: int, ttl: float = RESERVATION_TTL):
+        """Hold ``quantity`` units of a product for ``holder`` (an open cart).
+
+        Replaces the holder's earlier reservation of that product (0 drops
+        it) and extends all of the holder's reservations by ``ttl`` seconds.
+        Only this product's stock and reservation rows are read, so lanes
+        working on different products never wait on each other for long.
+        Raises InsufficientStockError if the stock less other holders'
+        unexpired reservations is short.
+        """
+        now = time.time()
+        with self.transaction(immediate=True) as cursor:
+            if quantity > 0:
+                available = self._fetch_available(cursor, [product_id], holder, now).get(product_id, 0)
+                if available < quantity:
+                    raise InsufficientStockError([(product_id, quantity, available)])
+                cursor.execute("""
+                    INSERT INTO stock_reservations (holder, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(holder, product_id) DO UPDATE SET quantity = excluded.quantity
+                """, (holder, product_id, quantity, now + ttl))
+            else:
+                cursor.execute("DELETE FROM stock_reservations WHERE holder = ? AND product_id = ?",
+                               (holder, product_id))
+            cursor.execute("UPDATE stock_reservations SET expires_at = ? WHERE holder = ?", (now + ttl, holder))
+
+    def confirm_reservations(self, holder: str, quantities: dict, ttl: float = RESERVATION_TTL):
+        """Make ``holder``'s reservations exactly ``quantities`` (product ID -> units) in one go.
+
+        Used at checkout, so a cart whose reservations lapsed while it sat
+        idle takes them again or fails with InsufficientStockError (and
+        changes nothing) before the sale is accepted.
+        """
+        now = time.time()
+        with self.transaction(immediate=True) as cursor:
+            available = self._fetch_available(cursor, list(quantities), holder, now)
+            shortages = [(product_id, quantity, available.get(product_id, 0))
+                         for product_id, quantity in quantities.items()
+                         if available.get(product_id, 0) < quantity]
+            if shortages:
+                raise InsufficientStockError(shortages)
+            cursor.execute("DELETE FROM stock_reservations WHERE holder = ?", (holder,))
+            cursor.executemany("INSERT INTO stock_reservations (holder, product_id, quantity, expires_at) "
+                               "VALUES (?, ?, ?, ?)",
+                               [(holder, product_id, quantity, now + ttl)
+                                for product_id, quantity in quantities.items()])
+
+    def release_reservations(self, holder: str):
+        """Drop every reservation ``holder`` has (cart emptied or abandoned)"""
+        self.get_connection().execute("DELETE FROM stock_reservations WHERE holder = ?", (holder,))
+
+    def expire_reservations(self) -> int:
+        """Delete lapsed reservations and return how many there were.
+
+        Lapsed rows are already ignored by availability checks; this only
+        keeps the table small.
+        """
+        return self.get_connection().execute("DELETE FROM stock_reservations WHERE expires_at <= ?",
+                                              (time.time(),)).rowcount
+
     def get_sale_details(self, sale_id: int) -> List[Tuple]:
         """Get detailed sale information for receipt"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
+        cursor = self.get_connection().execute("""
             SELECT p.name, p.price, si.quantity, si.subtotal
             FROM sale_items si
             JOIN products p ON si.product_id = p.id
             WHERE si.sale_id = ?
         """, (sale_id,))
-        items = cursor.fetchall()
-        conn.close()
-        return items
-    
+        return cursor.fetchall()
+
+    def get_sales_page(self, start_day: Optional[str] = None, end_day: Optional[str] = None,
+                       customer: Optional[str] = None, min_total: Optional[int] = None,
+                       max_total: Optional[int] = None, before: Optional[Tuple[str, int]] = None,
+                       limit: int = 200) -> List[Tuple]:
+        """(id, timestamp, customer, total, items) of sales, newest first, one page at a time
+
+        Days are an inclusive YYYY-MM-DD range, ``customer`` matches the
+        whole name ignoring case and totals are minor units. ``before`` is
+        the (timestamp, id) of the last row of the previous page, so every
+        page is an index seek however deep the scroll.
+        """
+        clauses, params = [], []
+        if start_day:
+            clauses.append("timestamp >= ?")
+            params.append(start_day)
+        if end_day:
+            clauses.append("timestamp < ?")
+            params.append(end_day + "U")    # 'T' follows the date; 'U' sorts just after it
+        if customer:
+            clauses.append("customer_name = ? COLLATE NOCASE")
+            params.append(customer)
+        if min_total is not None:
+            clauses.append("total_amount >= ?")
+            params.append(min_total)
+        if max_total is not None:
+            clauses.append("total_amount <= ?")
+            params.append(max_total)
+        if before is not None:
+            clauses.append("timestamp <= ? AND (timestamp < ? OR id < ?)")
+            params.extend((before[0], before[0], before[1]))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        params.append(limit)
+        cursor = self.get_connection().execute(f"""
+            SELECT id, timestamp, customer_name, total_amount,
+                   (SELECT COALESCE(SUM(quantity), 0) FROM sale_items WHERE sale_id = sales.id)
+            FROM sales{where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        """, params)
+        return cursor.fetchall()
+
+    def get_sale_lines(self, sale_id: int) -> List[Tuple]:
+        """(product_id, barcode, name, quantity, subtotal) of one sale's lines, as sold"""
+        cursor = self.get_connection().execute("""
+            SELECT si.product_id, COALESCE(p.barcode, ''), COALESCE(p.name, '(deleted)'), si.quantity, si.subtotal
+            FROM sale_items si
+            LEFT JOIN products p ON p.id = si.product_id
+            WHERE si.sale_id = ?
+            ORDER BY si.id
+        """, (sale_id,))
+        return cursor.fetchall()
+
     def get_all_products(self) -> List[Tuple]:
         """Get all products"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products ORDER BY name")
-        products = cursor.fetchall()
-        conn.close()
-        return products
-    
+        cursor = self.get_connection().execute("SELECT id, barcode, name, price, stock FROM products ORDER BY name")
+        return cursor.fetchall()
+
+    def get_products_page(self, order_by: str = "name", descending: bool = False,
+                          after: Optional[Tuple] = None, limit: int = 200) -> List[Tuple]:
+        """Get one page of products in keyset order
+
+        ``after`` is the (sort value, id) of the last row of the previous
+        page, so each page is an index seek rather than an OFFSET scan.
+        """
+        column = PRODUCT_SORT_COLUMNS[order_by]
+        direction, op = ("DESC", "<") if descending else ("ASC", ">")
+        sql = "SELECT id, barcode, name, price, stock FROM products"
+        params = []
+        if after is not None:
+            sql += f" WHERE {column} {op}= ? AND ({column} {op} ? OR id {op} ?)"
+            params = [after[0], after[0], after[1]]
+        sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+        params.append(limit)
+        return self.get_connection().execute(sql, params).fetchall()
+
+    def get_product_version(self, product_id: int) -> Optional[Tuple]:
+        """(name, price, stock, version) of a product as stored, for an edit to start from"""
+        return self.get_connection().execute(
+            "SELECT name, price, stock, version FROM products WHERE id = ?", (product_id,)).fetchone()
+
+    def edit_product(self, product_id: int, name: str, price: int, stock_delta: int, expected_version: int) -> int:
+        """Change name and price and move stock by ``stock_delta``; returns the new version.
+
+        The update only applies if the product is still at
+        ``expected_version``, so an edit made from a stale copy raises
+        StaleProductError instead of overwriting someone else's. Stock is
+        adjusted relative to whatever it is now, so sales made while the
+        edit was open are kept. Raises InsufficientStockError if the
+        adjustment would take stock below zero.
+        """
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute("""
+                UPDATE products SET name = ?, price = ?, stock = stock + ?, version = version + 1
+                WHERE id = ? AND version = ? AND stock + ? >= 0
+            """, (name, price, stock_delta, product_id, expected_version, stock_delta))
+            updated = cursor.rowcount
+            row = cursor.execute("SELECT barcode, stock, version FROM products WHERE id = ?",
+                                 (product_id,)).fetchone()
+            if not updated:
+                if row is None or row[2] != expected_version:
+                    raise StaleProductError(product_id)
+                raise InsufficientStockError([(product_id, -stock_delta, row[1])])
+            barcode, stock, version = row
+            changes = [("product", {"barcode": barcode, "name": name, "price": price})]
+            if stock_delta:
+                changes.append(("stock", {"barcode": barcode, "delta": stock_delta}))
+            _log_changes(cursor, changes)
+        self._write_through(self.catalog.update, product_id, name=name, price=price, stock=stock)
+        return version
+
     def delete_product(self, product_id: int):
         """Delete product by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        conn.commit()
-        conn.close()
-    
-    def update_product(self, product_id: int, name: str, price: float, stock: int):
+        with self.transaction() as cursor:
+            row = cursor.execute("SELECT barcode FROM products WHERE id = ?", (product_id,)).fetchone()
+            cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            cursor.execute("DELETE FROM stock_reservations WHERE product_id = ?", (product_id,))
+            if row is not None:
+                _log_changes(cursor, [("delete", {"barcode": row[0]})])
+        self._write_through(self.catalog.remove, product_id)
+
+    def update_product(self, product_id: int, name: str, price: int, stock: int):
         """Update product details"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE products SET name = ?, price = ?, stock = ? WHERE id = ?",
-            (name, price, stock, product_id)
-        )
-        conn.commit()
-        conn.close()
+        with self.transaction(immediate=True) as cursor:
+            self._log_stock_change(cursor, product_id, stock)
+            cursor.execute(
+                "UPDATE products SET name = ?, price = ?, stock = ?, version = version + 1 WHERE id = ?",
+                (name, price, stock, product_id)
+            )
+            row = cursor.execute("SELECT barcode FROM products WHERE id = ?", (product_id,)).fetchone()
+            if row is not None:
+                _log_changes(cursor, [("product", {"barcode": row[0], "name": name, "price": price})])
+        self._write_through(self.catalog.update, product_id, name=name, price=price, stock=stock)
@@ -0,0 +1,51 @@
+import tkinter as tk
+from tkinter import messagebox, filedialog
+
+class DiagnosticsWindow:
+    """Database hot spots collected by the instrumentation layer"""
+
+    def __init__(self, parent, instrumentation):
+        self.instrumentation = instrumentation
+        self.window = tk.Toplevel(parent)
+        self.window.title("Database Diagnostics")
+        self.window.geometry("900x520")
+        self.window.configure(bg='#f8f9fa')
+
+        controls = tk.Frame(self.window, bg='#f8f9fa')
+        controls.pack(fill="x", padx=8, pady=(8, 4))
+        tk.Label(controls, text=f"Slow-query threshold: {instrumentation.slow_seconds * 1000:g} ms",
+                font=("Segoe UI", 9), fg='#495057', bg='#f8f9fa').pack(side="left")
+        for text, command, colour in (("Refresh", self.refresh, '#007bff'),
+                                      ("Save JSON...", self.save, '#28a745'),
+                                      ("Reset", self.reset, '#6c757d')):
+            tk.Button(controls, text=text, command=command,
+                     font=("Segoe UI", 9), bg=colour, fg='white',
+                     padx=12, pady=2, relief='flat', bd=0).pack(side="right", padx=4)
+
+        frame = tk.Frame(self.window, bg='#ffffff')
+        frame.pack(fill="both", expand=True, padx=8, pady=(4, 8))
+        self.text = tk.Text(frame, font=("Consolas", 9), wrap="none", bg='#ffffff', fg='#212529')
+        scrollbar = tk.Scrollbar(frame, command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.refresh()
+
+    def refresh(self):
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", self.instrumentation.report())
+        self.text.configure(state="disabled")
+
+    def save(self):
+        """Dump every counter to a JSON file"""
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            initialfile="pos_diagnostics.json",
+                                            filetypes=[("JSON files", "*.json")])
+        if path:
+            self.instrumentation.dump(path)
+            messagebox.showinfo("Success", f"Diagnostics saved to {path}", parent=self.window)
+
+    def reset(self):
+        self.instrumentation.reset()
+        self.refresh()
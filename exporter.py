@@ -0,0 +1,129 @@
+"""
+Streaming CSV exports of products, sales and sale line items.
+Rows are read with cursor.fetchmany() batches, so memory stays flat
+whatever the table size.
+"""
+
+import csv
+import datetime
+import math
+import os
+import threading
+from typing import Callable, Optional
+
+# name -> (title, header, SELECT list, FROM clause, date column, ORDER BY).
+# Amounts are stored in minor units and written as decimals.
+EXPORTS = {
+    "products": (
+        "Products",
+        ["ID", "Barcode", "Name", "Price", "Stock"],
+        "id, barcode, name, printf('%.2f', price / 100.0), stock",
+        "products",
+        None,
+        "id",
+    ),
+    "sales": (
+        "Sales",
+        ["Sale ID", "Timestamp", "Customer", "Total"],
+        "id, timestamp, customer_name, printf('%.2f', total_amount / 100.0)",
+        "sales",
+        "timestamp",
+        "timestamp, id",
+    ),
+    "sale_items": (
+        "Sale items",
+        ["Item ID", "Sale ID", "Timestamp", "Product ID", "Barcode", "Name", "Quantity", "Subtotal"],
+        "si.id, si.sale_id, s.timestamp, si.product_id, p.barcode, p.name, si.quantity, printf('%.2f', si.subtotal / 100.0)",
+        "sale_items si JOIN sales s ON s.id = si.sale_id LEFT JOIN products p ON p.id = si.product_id",
+        "s.timestamp",
+        "s.timestamp, si.id",
+    ),
+}
+
+BATCH_SIZE = 2000
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled; the partial file is removed"""
+
+def _date_filter(column: Optional[str], start: Optional[datetime.date], end: Optional[datetime.date]):
+    """WHERE clause and parameters for an inclusive date range"""
+    if column is None:
+        return "", []
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= ?")
+        params.append(start.isoformat())
+    if end:
+        clauses.append(f"{column} < ?")
+        params.append((end + datetime.timedelta(days=1)).isoformat())
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def count_rows(db, kind: str, start=None, end=None) -> int:
+    """Number of rows an export will write"""
+    _, _, _, source, column, _ = EXPORTS[kind]
+    where, params = _date_filter(column, start, end)
+    cursor = db.get_connection().execute(f"SELECT COUNT(*) FROM {source}{where}", params)
+    return cursor.fetchone()[0]
+
+def export_csv(db, kind: str, path: str, start: Optional[datetime.date] = None,
+               end: Optional[datetime.date] = None, batch_size: int = BATCH_SIZE,
+               progress: Optional[Callable[[int, int], None]] = None,
+               cancel_event: Optional[threading.Event] = None) -> int:
+    """Write one export to ``path`` and return the number of rows written.
+
+    ``progress(done, total)`` is called after every batch. Setting
+    ``cancel_event`` stops the export between batches and raises
+    ExportCancelled. The file is written under a temporary name and only
+    renamed into place once complete.
+    """
+    _, header, columns, source, column, order = EXPORTS[kind]
+    where, params = _date_filter(column, start, end)
+    total = count_rows(db, kind, start, end) if progress else 0
+
+    temp_path = path + ".part"
+    done = 0
+    cursor = db.get_connection().execute(
+        f"SELECT {columns} FROM {source}{where} ORDER BY {order}", params)
+    try:
+        with open(temp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled(kind)
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+        os.replace(temp_path, path)
+    except BaseException:
+        cursor.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return done
+
+def export_sale(db, sale_id: int, path: str) -> int:
+    """Write one sale's line items to ``path`` (same columns as the sale_items export)"""
+    _, header, columns, source, _, order = EXPORTS["sale_items"]
+    rows = db.get_connection().execute(
+        f"SELECT {columns} FROM {source} WHERE si.sale_id = ? ORDER BY {order}", (sale_id,)).fetchall()
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return len(rows)
+
+def export_reorder(rows, path: str) -> int:
+    """Write analytics.ProductAnalytics.reorder_rows() output to ``path``"""
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Product ID", "Barcode", "Name", "Class", "Stock", "Units/Day",
+                         "Days of Cover", "Reorder Quantity"])
+        for product_id, barcode, name, abc, stock, velocity, cover, reorder in rows:
+            writer.writerow([product_id, barcode, name, abc, stock, f"{velocity:.2f}",
+                             "" if cover == math.inf else f"{cover:.1f}", reorder])
+    return len(rows)
@@ -0,0 +1,159 @@
+"""
+Bulk product import from CSV with upsert by barcode.
+New barcodes are inserted; existing ones get the file's price and stock.
+Run: python importer.py products.csv [--db pos_system.db] [--batch 5000] [--rejects rejects.csv]
+"""
+
+import argparse
+import csv
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from database import POSDatabase
+from money import to_minor
+
+BATCH_SIZE = 5000
+
+# Accepted header spellings for each field (matched case-insensitively)
+COLUMN_ALIASES = {
+    "barcode": ("barcode", "code", "ean", "upc", "sku"),
+    "name": ("name", "product", "product name", "description"),
+    "price": ("price", "unit price"),
+    "stock": ("stock", "quantity", "qty"),
+}
+
+class ImportResult:
+    """Counts and rejected rows from one import"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []    # (line number, reason, raw row)
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.inserted + self.updated) / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.inserted} added, {self.updated} updated, "
+                f"{len(self.rejected)} rejected in {self.seconds:.1f} s")
+
+    def write_rejects(self, path: str):
+        """Write rejected rows with their line number and reason"""
+        with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Line", "Reason", "Row"])
+            for line, reason, row in self.rejected:
+                writer.writerow([line, reason] + list(row))
+
+def _map_columns(header: List[str]) -> dict:
+    """Field name -> column index, from the CSV header"""
+    normalized = [column.strip().lower() for column in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[field] = normalized.index(alias)
+                break
+        else:
+            raise ValueError(f"CSV header has no '{field}' column")
+    return columns
+
+def _parse_row(row: List[str], columns: dict) -> Tuple:
+    """Validate one CSV row into (barcode, name, price in minor units, stock)"""
+    try:
+        barcode = row[columns["barcode"]].strip()
+        name = row[columns["name"]].strip()
+        price = row[columns["price"]]
+        stock = row[columns["stock"]].strip()
+    except IndexError:
+        raise ValueError("missing columns")
+    if not barcode or not name:
+        raise ValueError("barcode and name are required")
+    try:
+        price = to_minor(price)
+        stock = int(stock)
+    except ValueError:
+        raise ValueError("invalid price or stock")
+    if price < 0 or stock < 0:
+        raise ValueError("price and stock must be positive values")
+    return barcode, name, price, stock
+
+def import_products_csv(db: POSDatabase, path: str, batch_size: int = BATCH_SIZE,
+                        progress: Optional[Callable[[int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> ImportResult:
+    """Stream ``path`` into the products table in batches of ``batch_size``.
+
+    Each batch is validated and upserted in one transaction. A barcode that
+    appears twice in a batch keeps its last row. ``progress(rows_read)``
+    runs after every batch; setting ``cancel_event`` stops between batches
+    (batches already committed stay).
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    rows_read = 0
+
+    def flush(batch):
+        if batch:
+            inserted, updated = db.upsert_products(list(batch.values()))
+            result.inserted += inserted
+            result.updated += updated
+        if progress:
+            progress(rows_read)
+
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("CSV file is empty")
+        columns = _map_columns(header)
+
+        batch = {}
+        for row in reader:
+            rows_read += 1
+            if not any(field.strip() for field in row):
+                continue
+            try:
+                product = _parse_row(row, columns)
+            except ValueError as e:
+                result.rejected.append((reader.line_num, str(e), row))
+                continue
+            batch[product[0]] = product
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = {}
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+        else:
+            flush(batch)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Import products from CSV (upsert by barcode)")
+    parser.add_argument("csv_file")
+    parser.add_argument("--db", default="pos_system.db", help="database file (default: pos_system.db)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--rejects", help="write rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    try:
+        result = import_products_csv(db, args.csv_file, args.batch)
+    finally:
+        db.close()
+
+    print(result.summary())
+    print(f"{result.rows_per_second:.0f} rows/s")
+    if result.rejected:
+        for line, reason, _ in result.rejected[:10]:
+            print(f"  line {line}: {reason}")
+        if args.rejects:
+            result.write_rejects(args.rejects)
+            print(f"Rejected rows written to {args.rejects}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Optional timing of POSDatabase calls and SQL statements.
+Enabled per database with settings={"instrument": True} (or POS_INSTRUMENT=1
+in the environment). When it is off nothing is wrapped, so there is no
+cost at all. When on, every public POSDatabase method and every statement
+gets call counts, a latency histogram and rows returned, and statements
+slower than the threshold go to a rotating log with their query plan.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+SLOW_QUERY_MS = 50.0
+SLOW_LOG_PATH = "slow_queries.log"
+SLOW_LOG_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+# POSDatabase methods that are plumbing rather than work
+SKIP_METHODS = {"get_connection", "transaction", "close"}
+
+class Stats:
+    """Counters for one method or statement.
+
+    For statements the histogram buckets the execute step; ``max`` and
+    ``total`` also include the fetches that followed it.
+    """
+
+    __slots__ = ("count", "total", "max", "rows", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, seconds: float, rows: int = 0, calls: int = 1, span: Optional[float] = None):
+        self.count += calls
+        self.total += seconds
+        self.rows += rows
+        span = seconds if span is None else span
+        if span > self.max:
+            self.max = span
+        if calls:
+            self.histogram[bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 4) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "histogram": dict(zip([f"<={bound}ms" for bound in BUCKETS_MS] + ["slower"], self.histogram)),
+        }
+
+class Instrumentation:
+    """Collects method and statement timings for one POSDatabase"""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, log_path: str = SLOW_LOG_PATH):
+        self.slow_seconds = slow_ms / 1000
+        self.methods = {}
+        self.statements = {}
+        self._lock = threading.Lock()
+        self._connection_class = None
+        self.slow_log = logging.getLogger(f"pos.slow_queries.{id(self)}")
+        self.slow_log.propagate = False
+        self.slow_log.setLevel(logging.INFO)
+        handler = RotatingFileHandler(log_path, maxBytes=SLOW_LOG_BYTES, backupCount=SLOW_LOG_BACKUPS,
+                                      encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.slow_log.addHandler(handler)
+
+    def _stats(self, table: dict, key: str) -> Stats:
+        stats = table.get(key)
+        if stats is None:
+            with self._lock:
+                stats = table.setdefault(key, Stats())
+        return stats
+
+    def wrap_methods(self, db):
+        """Time every public method of ``db`` (instance attributes shadow the class)"""
+        for name in dir(type(db)):
+            if name.startswith("_") or name in SKIP_METHODS:
+                continue
+            method = getattr(db, name)
+            if callable(method):
+                setattr(db, name, self._timed(name, method))
+
+    def _timed(self, name: str, method):
+        methods = self.methods
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            if isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = 0 if result is None else 1
+            # Looked up per call: reset() replaces the Stats objects
+            self._stats(methods, name).add(elapsed, rows)
+            return result
+
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def connection_factory(self):
+        """sqlite3.connect factory whose cursors report to this instance"""
+        if self._connection_class is None:
+            instrumentation = self
+
+            class InstrumentedConnection(sqlite3.Connection):
+                def cursor(self, factory=None):
+                    cursor = super().cursor(factory or InstrumentedCursor)
+                    cursor.instrumentation = instrumentation
+                    return cursor
+
+                # The C shortcuts make a plain cursor without calling cursor()
+                def execute(self, sql, parameters=()):
+                    return self.cursor().execute(sql, parameters)
+
+                def executemany(self, sql, seq_of_parameters):
+                    return self.cursor().executemany(sql, seq_of_parameters)
+
+            self._connection_class = InstrumentedConnection
+        return self._connection_class
+
+    def statement_done(self, sql: str, elapsed: float, rows: int, calls: int, span: float):
+        self._stats(self.statements, sql).add(elapsed, rows, calls, span)
+
+    def log_slow(self, cursor, sql: str, params, elapsed: float):
+        """Write a slow statement and its query plan to the slow-query log"""
+        plan = ""
+        try:
+            explain = sqlite3.Connection.cursor(cursor.connection)
+            rows = explain.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            plan = "\n".join(f"    {row[-1]}" for row in rows)
+        except sqlite3.Error:
+            pass
+        self.slow_log.info("%.1f ms: %s\n%s", elapsed * 1000, " ".join(sql.split()), plan)
+
+    def close(self):
+        """Close the slow-query log file (it reopens on the next entry)"""
+        for handler in self.slow_log.handlers:
+            handler.close()
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "methods": {name: stats.as_dict() for name, stats in self.methods.items()},
+            "statements": {" ".join(sql.split()): stats.as_dict() for sql, stats in self.statements.items()},
+        }
+
+    def dump(self, path: str):
+        """Write every counter to ``path`` as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def report(self, top: int = 15) -> str:
+        """Hot spots by total time, as text"""
+        lines = []
+        for title, table in (("Database methods", self.methods), ("SQL statements", self.statements)):
+            lines.append(f"{title} (top {top} by total time)")
+            lines.append(f"{'calls':>8} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'rows':>9}  name")
+            ranked = sorted(table.items(), key=lambda item: item[1].total, reverse=True)
+            for name, stats in ranked[:top]:
+                if not stats.count:
+                    continue
+                mean = stats.total * 1000 / stats.count
+                lines.append(f"{stats.count:>8} {stats.total * 1000:>10.1f} {mean:>9.3f} "
+                             f"{stats.max * 1000:>9.2f} {stats.rows:>9}  {' '.join(name.split())[:90]}")
+            lines.append("")
+        return "\n".join(lines)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute plus the fetches that follow it"""
+
+    instrumentation = None
+
+    def execute(self, sql, parameters=()):
+        self._sql, self._params, self._elapsed, self._logged = sql, parameters, 0.0, False
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._finish(time.perf_counter() - start, 0, 1)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql, self._params, self._elapsed, self._logged = sql, None, 0.0, False
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._finish(time.perf_counter() - start, 0, 1)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._finish(time.perf_counter() - start, 0 if row is None else 1, 0)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._finish(time.perf_counter() - start, len(rows), 0)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._finish(time.perf_counter() - start, len(rows), 0)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish(time.perf_counter() - start, 0, 0)
+            raise
+        self._finish(time.perf_counter() - start, 1, 0)
+        return row
+
+    def _finish(self, elapsed: float, rows: int, calls: int):
+        sql = getattr(self, "_sql", None)
+        if sql is None or self.instrumentation is None:
+            return
+        instrumentation = self.instrumentation
+        self._elapsed += elapsed
+        instrumentation.statement_done(sql, elapsed, rows, calls, self._elapsed)
+        if not self._logged and self._elapsed >= instrumentation.slow_seconds:
+            self._logged = True
+            instrumentation.log_slow(self, sql, self._params, self._elapsed)
+
+def create_instrumentation(settings: dict) -> Optional[Instrumentation]:
+    """Instrumentation for a POSDatabase's settings, or None when disabled"""
+    if not settings.get("instrument"):
+        return None
+    return Instrumentation(settings.get("slow_query_ms", SLOW_QUERY_MS),
+                           settings.get("slow_query_log", SLOW_LOG_PATH))
@@ -1,14 +1,46 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-from database import POSDatabase
-import csv
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from database import POSDatabase, StaleProductError, InsufficientStockError
+from background import BackgroundWorker
+from product_catalog import ID, BARCODE, NAME, PRICE, STOCK
+from money import to_minor, format_amount, format_money
+import analytics
+import exporter
+import importer
+import datetime
+import math
+import threading
+
+# Treeview column -> (heading text, sort key, product row index)
+PRODUCT_COLUMNS = {
+    "ID": ("ID", "id", ID),
+    "Barcode": ("Barcode", "barcode", BARCODE),
+    "Name": ("Product Name", "name", NAME),
+    "Price": ("Price", "price", PRICE),
+    "Stock": ("Stock", "stock", STOCK),
+}
 
 class InventoryManager:
-    def __init__(self, parent):
+    # Rows fetched per page as the product list scrolls
+    PAGE_SIZE = 200
+    # Quiet time after the last keystroke before the search runs
+    SEARCH_DEBOUNCE_MS = 150
+
+    def __init__(self, parent, db=None):
         self.parent = parent
-        self.db = POSDatabase()
+        self.db = db or POSDatabase()
         self.window = None
         self.zoom_level = 1.0
+        self.sort_column = "Name"
+        self.sort_descending = False
+        self.filtered_rows = None
+        self.page_after = None
+        self.page_exhausted = True
+        self.page_pending = False
+        self.search_worker = None
+        self.search_after_id = None
+        self.import_thread = None
+        self.import_outcome = None
         
     def open_inventory_window(self):
         """Open inventory management window"""
@@ -17,6 +49,8 @@ class InventoryManager:
             return
             
         self.window = tk.Toplevel(self.parent)
+        self.window.bind("<Destroy>", self.on_window_destroy)
+        self.search_worker = BackgroundWorker(self.window, on_exit=self.db.release_connection)
         self.window.title("Inventory Management")
         self.window.geometry("900x550")
         self.window.configure(bg='#f8f9fa')
@@ -107,7 +141,7 @@ class InventoryManager:
                                    bg='#f8f9fa', fg='#495057',
                                    relief='solid', bd=1)
         self.search_entry.pack(fill="x", pady=(2, 0))
-        self.search_var.trace('w', self.filter_products)
+        self.search_var.trace('w', self.schedule_filter)
         
         # Zoom controls
         zoom_frame = tk.Frame(action_frame, bg='#ffffff')
@@ -140,9 +174,16 @@ class InventoryManager:
         ttk.Button(action_frame, text="Delete", command=self.delete_product,
                   style="Danger.TButton").pack(fill="x", padx=6, pady=2)
         
+        self.import_button = ttk.Button(action_frame, text="Import", command=self.import_csv,
+                                       style="Compact.TButton")
+        self.import_button.pack(fill="x", padx=6, pady=2)
+        
         ttk.Button(action_frame, text="Export", command=self.export_csv,
                   style="Compact.TButton").pack(fill="x", padx=6, pady=2)
         
+        ttk.Button(action_frame, text="Reorder", command=self.open_reorder_report,
+                  style="Compact.TButton").pack(fill="x", padx=6, pady=2)
+        
         ttk.Button(action_frame, text="Refresh", command=self.refresh_list,
                   style="Compact.TButton").pack(fill="x", padx=6, pady=2)
     
@@ -159,12 +200,10 @@ class InventoryManager:
                                 show="headings",
                                 style="Compact.Treeview")
         
-        # Compact headers
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("Barcode", text="Barcode")
-        self.tree.heading("Name", text="Product Name")
-        self.tree.heading("Price", text="Price")
-        self.tree.heading("Stock", text="Stock")
+        # Compact headers, click to sort
+        for column in PRODUCT_COLUMNS:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+        self.update_headings()
         
         # Optimized column widths
         self.tree.column("ID", width=40, anchor="center")
@@ -174,11 +213,11 @@ class InventoryManager:
         self.tree.column("Stock", width=60, anchor="center")
         
         # Minimal scrollbar
-        scrollbar = ttk.Scrollbar(products_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(products_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
         
         self.tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
         
         # Row styling
         self.tree.tag_configure('low_stock', background='#fff3cd', foreground='#856404')
@@ -186,28 +225,104 @@ class InventoryManager:
         
         self.tree.bind("<Double-1>", lambda e: self.edit_product())
     
+    def schedule_filter(self, *args):
+        """Debounce search keystrokes; only the last one in a burst runs a query"""
+        if self.search_after_id is not None:
+            self.window.after_cancel(self.search_after_id)
+        self.search_worker.cancel()
+        self.search_after_id = self.window.after(self.SEARCH_DEBOUNCE_MS, self.filter_products)
+    
     def filter_products(self, *args):
-        """Filter products based on search term"""
-        search_term = self.search_var.get().lower()
-        
-        # Clear current items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        products = self.db.get_all_products()
-        
-        for product in products:
-            # Check if search term matches product name or barcode
-            if (search_term in product[2].lower() or 
-                search_term in product[1].lower() or
-                not search_term):
-                
-                tag = 'low_stock' if product[4] < 5 else 'normal'
-                
-                self.tree.insert("", "end",
-                               values=(product[0], product[1], product[2],
-                                      f"{product[3]:.2f} DA", product[4]),
-                               tags=(tag,))
+        """Filter products based on search term, showing the first page"""
+        self.search_after_id = None
+        search_term = self.search_var.get().strip()
+        sort_column, descending = self.sort_column, self.sort_descending
+        
+        # Query off the Tk thread; a newer search supersedes this one
+        self.search_worker.submit(
+            lambda: self.fetch_first_page(search_term, sort_column, descending),
+            self.show_first_page)
+    
+    def fetch_first_page(self, search_term, sort_column, descending):
+        """Run a search (background thread); returns (filtered rows or None, first page)"""
+        _, sort_key, index = PRODUCT_COLUMNS[sort_column]
+        if not search_term:
+            return None, self.db.get_products_page(sort_key, descending, None, self.PAGE_SIZE)
+        
+        # Search hits come from the in-memory index; sort them here
+        rows = self.db.search_products(search_term, limit=None)
+        if index == NAME:
+            rows.sort(key=lambda p: (p[NAME].lower(), p[ID]), reverse=descending)
+        else:
+            rows.sort(key=lambda p: (p[index], p[ID]), reverse=descending)
+        return rows, rows[:self.PAGE_SIZE]
+    
+    def show_first_page(self, result):
+        """Replace the list with a finished search (Tk thread)"""
+        self.filtered_rows, page = result
+        self.tree.delete(*self.tree.get_children())
+        self.page_exhausted = False
+        self.page_pending = False
+        self.page_after = 0 if self.filtered_rows is not None else None
+        self.show_page(page)
+    
+    def load_next_page(self):
+        """Append the next page of products to the list"""
+        self.page_pending = False
+        if self.page_exhausted:
+            return
+        
+        _, sort_key, _ = PRODUCT_COLUMNS[self.sort_column]
+        if self.filtered_rows is not None:
+            page = self.filtered_rows[self.page_after:self.page_after + self.PAGE_SIZE]
+        else:
+            # Keyset pagination, sorted by the database
+            page = self.db.get_products_page(sort_key, self.sort_descending,
+                                             self.page_after, self.PAGE_SIZE)
+        self.show_page(page)
+    
+    def show_page(self, page):
+        """Append rows and advance the page cursor"""
+        _, _, index = PRODUCT_COLUMNS[self.sort_column]
+        if self.filtered_rows is not None:
+            self.page_after += len(page)
+        elif page:
+            self.page_after = (page[-1][index], page[-1][ID])
+        
+        if len(page) < self.PAGE_SIZE:
+            self.page_exhausted = True
+        
+        for product in page:
+            tag = 'low_stock' if product[4] < 5 else 'normal'
+            
+            self.tree.insert("", "end",
+                           values=(product[0], product[1], product[2],
+                                  format_money(product[3]), product[4]),
+                           tags=(tag,))
+    
+    def on_tree_scroll(self, first, last):
+        """Track the scrollbar and fetch another page near the bottom"""
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.page_exhausted and not self.page_pending:
+            self.page_pending = True
+            self.window.after_idle(self.load_next_page)
+    
+    def sort_by(self, column):
+        """Sort the list by a column, toggling direction on repeat clicks"""
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        self.update_headings()
+        self.filter_products()
+    
+    def update_headings(self):
+        """Show the sort direction on the active column heading"""
+        for column, (text, _, _) in PRODUCT_COLUMNS.items():
+            if column == self.sort_column:
+                text += " \u25bc" if self.sort_descending else " \u25b2"
+            self.tree.heading(column, text=text)
     
     def handle_zoom(self, event):
         """Handle mouse wheel zoom with Ctrl"""
@@ -237,6 +352,13 @@ class InventoryManager:
     def refresh_list(self):
         """Refresh product list"""
         self.filter_products()
+    
+    def on_window_destroy(self, event):
+        """Stop background searches when the window closes"""
+        if event.widget is self.window and self.search_worker:
+            self.search_worker.stop()
+            self.search_worker = None
+            self.search_after_id = None
 
     def add_product(self):
         """Add new product dialog"""
@@ -258,15 +380,31 @@ class InventoryManager:
         
         item = self.tree.item(selection[0])
         product_id = item['values'][0]
-        current_name = item['values'][2]
-        current_price = float(item['values'][3].replace(' DA', ''))
-        current_stock = int(item['values'][4])
+        # Start from the stored row; the list may be older than the last sale or edit
+        current = self.db.get_product_version(product_id)
+        if current is None:
+            messagebox.showerror("Error", "This product no longer exists.")
+            self.refresh_list()
+            return
+        current_name, current_price, current_stock, version = current
         
         dialog = ProductDialog(self.window, "Edit Product", 
                              current_name, current_price, current_stock)
         if dialog.result:
             _, name, price, stock = dialog.result
-            self.db.update_product(product_id, name, price, stock)
+            try:
+                # Stock moves by the difference, so sales made meanwhile still count
+                self.db.edit_product(product_id, name, price, stock - current_stock, version)
+            except StaleProductError:
+                messagebox.showwarning("Product Changed",
+                                       "Someone else changed this product while you were editing it.\n"
+                                       "Your changes were not saved; check the reloaded list and try again.")
+                self.refresh_list()
+                return
+            except InsufficientStockError as e:
+                messagebox.showerror("Error", f"Stock cannot go below zero ({e.shortages[0][2]} on hand now).")
+                self.refresh_list()
+                return
             self.refresh_list()
             messagebox.showinfo("Success", "Product updated successfully!")
     
@@ -285,23 +423,309 @@ class InventoryManager:
             messagebox.showinfo("Success", "Product deleted successfully!")
     
     def export_csv(self):
-        """Export products to CSV"""
-        from tkinter import filedialog
+        """Open the export dialog (products, sales, sale items)"""
+        ExportDialog(self.window, self.db)
+    
+    def open_reorder_report(self):
+        """Open the reorder suggestions computed from the sales history"""
+        ReorderReport(self.window, self.db)
+    
+    def import_csv(self):
+        """Bulk import products from CSV (upsert by barcode) in the background"""
+        if self.import_thread is not None:
+            return
+        filename = filedialog.askopenfilename(
+            parent=self.window,
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        self.import_button.configure(state="disabled", text="Importing...")
+        self.import_thread = threading.Thread(target=self.run_import, args=(filename,), daemon=True)
+        self.import_thread.start()
+        self.window.after(100, self.poll_import)
+    
+    def run_import(self, filename):
+        """Background thread body; never touches Tk"""
+        try:
+            result = importer.import_products_csv(self.db, filename)
+            message = result.summary()
+            if result.rejected:
+                rejects_path = filename + ".rejects.csv"
+                result.write_rejects(rejects_path)
+                message += f"\nRejected rows written to {rejects_path}"
+            self.import_outcome = ("done", message)
+        except Exception as e:
+            self.import_outcome = ("error", f"Import failed: {e}")
+        finally:
+            self.db.release_connection()
+    
+    def poll_import(self):
+        """Wait for the import thread, then report and refresh the list"""
+        if self.import_outcome is None:
+            self.window.after(100, self.poll_import)
+            return
+        
+        status, message = self.import_outcome
+        self.import_thread = None
+        self.import_outcome = None
+        self.import_button.configure(state="normal", text="Import")
+        self.refresh_list()
+        if status == "done":
+            messagebox.showinfo("Import", message, parent=self.window)
+        else:
+            messagebox.showerror("Error", message, parent=self.window)
+
+class ReorderReport:
+    """Products to reorder, from sales velocity over a window of days.
+
+    analytics.analyse runs on a background worker; re-running with other
+    settings supersedes a computation still in flight.
+    """
+
+    def __init__(self, parent, db):
+        self.db = db
+        self.rows = []
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Reorder Report")
+        self.window.geometry("860x520")
+        self.window.configure(bg='#f8f9fa')
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(1, weight=1)
+        self.worker = BackgroundWorker(self.window, on_exit=self.db.release_connection)
+        self.window.bind("<Destroy>", self.on_window_destroy)
+
+        controls = tk.Frame(self.window, bg='#f8f9fa')
+        controls.grid(row=0, column=0, sticky="ew", padx=8, pady=(8, 4))
+        self.days_entry = self.create_setting(controls, "Days of sales:", analytics.WINDOW_DAYS)
+        self.lead_entry = self.create_setting(controls, "Lead time (days):", analytics.LEAD_TIME_DAYS)
+        self.all_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(controls, text="All products", variable=self.all_var, command=self.run,
+                      font=("Segoe UI", 9), fg='#495057', bg='#f8f9fa').pack(side="left", padx=4)
+        tk.Button(controls, text="Calculate", command=self.run,
+                 font=("Segoe UI", 9), bg='#007bff', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="left", padx=4)
+        self.export_button = tk.Button(controls, text="Export CSV", command=self.export,
+                                       font=("Segoe UI", 9), bg='#17a2b8', fg='white',
+                                       padx=12, pady=2, relief='flat', bd=0, state="disabled")
+        self.export_button.pack(side="right", padx=4)
+
+        frame = tk.Frame(self.window, bg='#ffffff')
+        frame.grid(row=1, column=0, sticky="nsew", padx=8, pady=4)
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        headings = [("Barcode", 120, "w"), ("Product", 260, "w"), ("Class", 50, "center"),
+                    ("Stock", 70, "e"), ("Per Day", 80, "e"), ("Cover (days)", 90, "e"), ("Order", 80, "e")]
+        self.tree = ttk.Treeview(frame, columns=[name for name, _, _ in headings], show="headings")
+        for name, width, anchor in headings:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width, anchor=anchor)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.status_var = tk.StringVar()
+        tk.Label(self.window, textvariable=self.status_var, font=("Segoe UI", 8),
+                fg='#6c757d', bg='#f8f9fa').grid(row=2, column=0, sticky="w", padx=8, pady=(0, 6))
+
+        self.run()
+
+    def create_setting(self, parent, text, value):
+        """Labelled number entry; Return recalculates"""
+        tk.Label(parent, text=text, font=("Segoe UI", 9), fg='#495057', bg='#f8f9fa').pack(side="left")
+        entry = tk.Entry(parent, font=("Segoe UI", 9), width=5,
+                         bg='#ffffff', fg='#495057', relief='solid', bd=1)
+        entry.insert(0, str(value))
+        entry.pack(side="left", padx=(4, 8))
+        entry.bind("<Return>", self.run)
+        return entry
+
+    def run(self, event=None):
+        """Recompute the report with the current settings"""
+        try:
+            days, lead_time = int(self.days_entry.get()), int(self.lead_entry.get())
+            if days < 1 or lead_time < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Days must be whole numbers (at least 1 day of sales).",
+                                 parent=self.window)
+            return
+        include_all = self.all_var.get()
+        self.status_var.set("Calculating...")
+        self.worker.submit(lambda: analytics.analyse(self.db, days, lead_time).reorder_rows(include_all),
+                           self.show_rows, self.show_error)
+
+    def show_rows(self, rows):
+        """Fill the table with a finished computation (Tk thread)"""
+        self.rows = rows
+        self.tree.delete(*self.tree.get_children())
+        for _, barcode, name, abc, stock, velocity, cover, reorder in rows:
+            cover_text = "-" if cover == math.inf else f"{cover:.1f}"
+            self.tree.insert("", "end", values=(barcode, name, abc, stock, f"{velocity:.2f}", cover_text,
+                                                reorder or ""))
+        self.export_button.configure(state="normal" if rows else "disabled")
+        to_order = sum(1 for row in rows if row[-1])
+        self.status_var.set(f"{to_order} products to reorder, {len(rows)} shown")
+
+    def show_error(self, error):
+        self.status_var.set(f"Calculation failed: {error}")
+
+    def export(self):
+        """Save the rows shown as CSV"""
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                            initialfile=f"reorder_{datetime.date.today().isoformat()}.csv",
+                                            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if path:
+            count = exporter.export_reorder(self.rows, path)
+            messagebox.showinfo("Success", f"{count} products exported to {path}", parent=self.window)
+
+    def on_window_destroy(self, event):
+        """Stop the background worker when the window closes"""
+        if event.widget is self.window and self.worker:
+            self.worker.stop()
+            self.worker = None
+
+class ExportDialog:
+    """Runs a streaming export on a background thread with progress and cancel"""
+
+    def __init__(self, parent, db):
+        self.db = db
+        self.thread = None
+        self.cancel_event = None
+        self.progress = (0, 0)
+        self.outcome = None
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Export")
+        self.dialog.geometry("340x260")
+        self.dialog.configure(bg='#f8f9fa')
+        self.dialog.transient(parent)
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.dialog.grid_columnconfigure(0, weight=1)
+        
+        form_frame = tk.Frame(self.dialog, bg='#ffffff', relief='solid', bd=1)
+        form_frame.grid(row=0, column=0, padx=12, pady=12, sticky="ew")
+        form_frame.grid_columnconfigure(1, weight=1)
+        
+        titles = [title for title, *_ in exporter.EXPORTS.values()]
+        self.kinds = dict(zip(titles, exporter.EXPORTS))
+        tk.Label(form_frame, text="Export:", font=("Segoe UI", 9), fg='#495057',
+                bg='#ffffff').grid(row=0, column=0, sticky="w", padx=12, pady=(10, 4))
+        self.kind_var = tk.StringVar(value=titles[0])
+        ttk.Combobox(form_frame, textvariable=self.kind_var, values=titles,
+                    state="readonly", width=18).grid(row=0, column=1, sticky="ew", padx=12, pady=(10, 4))
+        
+        tk.Label(form_frame, text="From (YYYY-MM-DD):", font=("Segoe UI", 9), fg='#495057',
+                bg='#ffffff').grid(row=1, column=0, sticky="w", padx=12, pady=4)
+        self.start_entry = tk.Entry(form_frame, font=("Segoe UI", 9), width=12,
+                                   bg='#f8f9fa', fg='#495057', relief='solid', bd=1)
+        self.start_entry.grid(row=1, column=1, sticky="ew", padx=12, pady=4)
+        
+        tk.Label(form_frame, text="To (YYYY-MM-DD):", font=("Segoe UI", 9), fg='#495057',
+                bg='#ffffff').grid(row=2, column=0, sticky="w", padx=12, pady=(4, 10))
+        self.end_entry = tk.Entry(form_frame, font=("Segoe UI", 9), width=12,
+                                 bg='#f8f9fa', fg='#495057', relief='solid', bd=1)
+        self.end_entry.grid(row=2, column=1, sticky="ew", padx=12, pady=(4, 10))
+        
+        self.progress_bar = ttk.Progressbar(self.dialog, mode='determinate', maximum=100)
+        self.progress_bar.grid(row=1, column=0, sticky="ew", padx=12)
+        self.status_var = tk.StringVar(value="Dates apply to sales and sale items.")
+        tk.Label(self.dialog, textvariable=self.status_var, font=("Segoe UI", 8),
+                fg='#6c757d', bg='#f8f9fa').grid(row=2, column=0, pady=4)
+        
+        button_frame = tk.Frame(self.dialog, bg='#f8f9fa')
+        button_frame.grid(row=3, column=0, pady=8)
+        self.export_button = tk.Button(button_frame, text="Export", command=self.start,
+                                      font=("Segoe UI", 9), bg='#007bff', fg='white',
+                                      padx=16, pady=6, relief='flat', bd=0)
+        self.export_button.pack(side="left", padx=4)
+        tk.Button(button_frame, text="Cancel", command=self.cancel,
+                 font=("Segoe UI", 9), bg='#6c757d', fg='white',
+                 padx=16, pady=6, relief='flat', bd=0).pack(side="left", padx=4)
+    
+    def parse_date(self, entry):
+        """Optional YYYY-MM-DD date from an entry"""
+        text = entry.get().strip()
+        return datetime.date.fromisoformat(text) if text else None
+    
+    def start(self):
+        """Ask for a file and start exporting in the background"""
+        if self.thread is not None:
+            return
+        try:
+            start = self.parse_date(self.start_entry)
+            end = self.parse_date(self.end_entry)
+        except ValueError:
+            messagebox.showerror("Error", "Dates must look like 2024-01-31.", parent=self.dialog)
+            return
+        
+        kind = self.kinds[self.kind_var.get()]
         filename = filedialog.asksaveasfilename(
+            parent=self.dialog,
             defaultextension=".csv",
+            initialfile=f"{kind}.csv",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
+        if not filename:
+            return
+        
+        self.cancel_event = threading.Event()
+        self.export_button.configure(state="disabled")
+        self.status_var.set("Exporting...")
+        self.thread = threading.Thread(target=self.run_export,
+                                       args=(kind, filename, start, end), daemon=True)
+        self.thread.start()
+        self.dialog.after(100, self.poll)
+    
+    def run_export(self, kind, filename, start, end):
+        """Background thread body; never touches Tk"""
+        try:
+            rows = exporter.export_csv(self.db, kind, filename, start, end,
+                                       progress=self.on_progress, cancel_event=self.cancel_event)
+            self.outcome = ("done", f"{rows} rows exported to {filename}")
+        except exporter.ExportCancelled:
+            self.outcome = ("cancelled", "Export cancelled.")
+        except Exception as e:
+            self.outcome = ("error", f"Export failed: {e}")
+        finally:
+            self.db.release_connection()
+    
+    def on_progress(self, done, total):
+        self.progress = (done, total)
+    
+    def poll(self):
+        """Show progress until the export thread finishes"""
+        done, total = self.progress
+        if total:
+            self.progress_bar['value'] = done * 100 / total
+            self.status_var.set(f"{done} / {total} rows")
+        if self.outcome is None:
+            self.dialog.after(100, self.poll)
+            return
         
-        if filename:
-            products = self.db.get_all_products()
-            with open(filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["ID", "Barcode", "Name", "Price", "Stock"])
-                writer.writerows(products)
-            messagebox.showinfo("Success", f"Products exported to {filename}")
+        status, message = self.outcome
+        self.thread = None
+        self.outcome = None
+        self.export_button.configure(state="normal")
+        self.status_var.set(message)
+        if status == "done":
+            self.progress_bar['value'] = 100
+            messagebox.showinfo("Success", message, parent=self.dialog)
+        elif status == "error":
+            messagebox.showerror("Error", message, parent=self.dialog)
+    
+    def cancel(self):
+        """Cancel a running export, or close the dialog"""
+        if self.thread is not None:
+            self.cancel_event.set()
+        else:
+            self.dialog.destroy()
 
 class ProductDialog:
-    def __init__(self, parent, title, name="", price=0.0, stock=0):
+    def __init__(self, parent, title, name="", price=0, stock=0):
         self.result = None
         
         self.dialog = tk.Toplevel(parent)
@@ -334,7 +758,7 @@ class ProductDialog:
         self.name_entry = self.create_compact_entry(form_frame, 3, name)
         
         self.create_compact_field(form_frame, "Price (DA):", 4)
-        self.price_entry = self.create_compact_entry(form_frame, 5, str(price))
+        self.price_entry = self.create_compact_entry(form_frame, 5, format_amount(price))
         
         self.create_compact_field(form_frame, "Stock:", 6)
         self.stock_entry = self.create_compact_entry(form_frame, 7, str(stock))
@@ -375,7 +799,7 @@ class ProductDialog:
         try:
             barcode = self.barcode_entry.get().strip()
             name = self.name_entry.get().strip()
-            price = float(self.price_entry.get())
+            price = to_minor(self.price_entry.get())
             stock = int(self.stock_entry.get())
             
             if not barcode or not name:
@@ -1,33 +1,126 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-from database import POSDatabase
-from inventory_manager import InventoryManager
-import datetime
-import shutil
+from database import POSDatabase, InsufficientStockError
+from suggestions import SuggestionDropdown
+from backup import BackupManager
+from checkout_journal import CheckoutQueue
+from cart import Till, CartError, LOW_STOCK
+from sync import SyncEngine, CENTRAL_DB_ENV
+from reports import ReportsWindow
+from money import format_money
+from receipts import render_receipt
+from scanner_input import ScanBurstDetector
 import os
 
+SAMPLE_PRODUCTS = [
+    ("1234567890123", "Sample Cola", 199, 50),
+    ("2345678901234", "Sample Chips", 249, 30),
+    ("3456789012345", "Sample Candy", 99, 100),
+]
+
+def seed_sample_products(db: POSDatabase):
+    """Give an empty database a few products to try the till with"""
+    if not db.has_products():
+        for barcode, name, price, stock in SAMPLE_PRODUCTS:
+            db.add_product(barcode, name, price, stock)
+
 class POSSystem:
-    def __init__(self):
+    # Pause after the last keystroke before suggestions refresh
+    SUGGEST_DELAY_MS = 120
+    # How long a scan's outcome stays in the status line
+    SCAN_STATUS_MS = 4000
+    # Scheduled backups start this long after launch, off the startup path
+    BACKUP_START_DELAY_MS = 60000
+    # How often lapsed stock reservations (abandoned carts) are cleared out
+    RESERVATION_PURGE_MS = 60000
+    # How often lines that other carts turned out to hold are cut back
+    RESERVATION_CHECK_MS = 250
+    # How often the checkout queue is checked for sales the database rejected
+    CHECKOUT_CHECK_MS = 5000
+
+    def __init__(self, db=None):
         self.root = tk.Tk()
         self.root.title("POS System")
         self.root.geometry("1000x650")
         self.root.configure(bg='#f8f9fa')
         
-        self.db = POSDatabase()
-        self.inventory_manager = InventoryManager(self.root)
-        self.cart = {}
+        self.db = db or POSDatabase()
+        # Journal replay first, so the catalog loads with its stock already taken
+        self.checkout_queue = CheckoutQueue(self.db)
+        self.catalog_thread = self.db.preload_catalog()
+        self._inventory_manager = None
+        # Reservations are written by the checkout queue's writer, never on the Tk thread
+        self.till = Till(self.db, self.checkout_queue, defer_reservations=True)
+        self.cart = self.till.cart
+        self.cart_rows = {}
         self.admin_password = "admin123"
         self.last_sale_id = None
+        self.last_sale_ref = None
         self.zoom_level = 1.0
+        self.suggest_after_id = None
+        self.scan_burst = ScanBurstDetector()
+        self.scan_status_after_id = None
         
         # Bind zoom controls
         self.root.bind("<Control-MouseWheel>", self.handle_zoom)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.setup_styles()
         self.setup_ui()
         self.barcode_entry.focus_set()
-        self.auto_backup()
+        self.backup_manager = BackupManager(self.db)
+        self.root.after(self.BACKUP_START_DELAY_MS, self.backup_manager.start)
+        self.sync_engine = None
+        self.root.after(100, self.poll_catalog)
+        self.root.after(self.RESERVATION_PURGE_MS, self.purge_reservations)
+        self.root.after(self.RESERVATION_CHECK_MS, self.check_reservations)
+        self.failed_checkouts_shown = 0
+        self.root.after(self.CHECKOUT_CHECK_MS, self.check_failed_checkouts)
+
+    @property
+    def inventory_manager(self):
+        """Inventory window controller, created on first use"""
+        if self._inventory_manager is None:
+            from inventory_manager import InventoryManager
+            self._inventory_manager = InventoryManager(self.root, self.db)
+        return self._inventory_manager
+
+    def poll_catalog(self):
+        """Start background sync once the catalog has finished loading"""
+        if self.catalog_thread.is_alive():
+            self.root.after(100, self.poll_catalog)
+            return
+        # Multi-lane stores point every lane at the same central database
+        central_db = os.environ.get(CENTRAL_DB_ENV)
+        if central_db:
+            self.sync_engine = SyncEngine(self.db, central_db)
+            self.sync_engine.start()
     
+    def purge_reservations(self):
+        """Drop reservations left by carts that were abandoned (here or on another lane)"""
+        self.checkout_queue.expire_reservations()
+        self.root.after(self.RESERVATION_PURGE_MS, self.purge_reservations)
+
+    def check_reservations(self):
+        """Cut back cart lines whose units another cart reserved first"""
+        for product, kept in self.till.take_conflicts():
+            self.paint_cart_row(product[0])
+            self.update_total()
+            self.show_scan_status(f"Only {kept} units of '{product[2]}' are free (the rest are in other carts)",
+                                  error=True)
+        self.root.after(self.RESERVATION_CHECK_MS, self.check_reservations)
+
+    def check_failed_checkouts(self):
+        """Warn once for each sale the checkout queue could not save"""
+        failed = self.checkout_queue.failed
+        if failed > self.failed_checkouts_shown:
+            count = failed - self.failed_checkouts_shown
+            self.failed_checkouts_shown = failed
+            messagebox.showwarning("Warning", f"{count} sale(s) could not be saved to the database "
+                                              f"({self.checkout_queue.failed_error}). They were kept in "
+                                              f"{self.checkout_queue.failed_path} for review.")
+        self.root.after(self.CHECKOUT_CHECK_MS, self.check_failed_checkouts)
+
     def setup_styles(self):
         """Configure compact, modern styles"""
         style = ttk.Style()
@@ -109,9 +202,18 @@ class POSSystem:
                                     relief='solid', bd=1,
                                     width=30)
         self.barcode_entry.grid(row=0, column=1, padx=8, pady=8, sticky="ew")
-        self.barcode_entry.bind("<Return>", self.process_search)
+        self.barcode_entry.bind("<Return>", self.on_return)
+        self.barcode_entry.bind("<KP_Enter>", self.on_return)
         self.search_var.trace('w', self.show_search_suggestions)
         
+        # Autocomplete dropdown with keyboard navigation
+        self.suggestions = SuggestionDropdown(self.barcode_entry, self.pick_suggestion)
+        self.barcode_entry.bind("<KeyPress>", self.track_key_timing, add="+")
+        self.barcode_entry.bind("<Down>", lambda e: self.suggestions.move(1) or "break")
+        self.barcode_entry.bind("<Up>", lambda e: self.suggestions.move(-1) or "break")
+        self.barcode_entry.bind("<Escape>", self.suggestions.hide)
+        self.barcode_entry.bind("<FocusOut>", lambda e: self.root.after(150, self.suggestions.hide))
+        
         # Quick add button
         tk.Button(scanner_frame, text="Add",
                  command=self.process_search,
@@ -129,6 +231,12 @@ class POSSystem:
                                      relief='solid', bd=1, width=20)
         self.customer_entry.grid(row=1, column=1, padx=8, pady=(0, 8), sticky="w")
         
+        # Outcome of the last scanner scan (scans never open dialogs)
+        self.scan_status_var = tk.StringVar()
+        self.scan_status_label = tk.Label(scanner_frame, textvariable=self.scan_status_var,
+                                          font=("Segoe UI", int(8 * self.zoom_level)), fg='#28a745', bg='#ffffff')
+        self.scan_status_label.grid(row=1, column=1, padx=8, pady=(0, 8), sticky="e")
+        
         # Zoom controls
         zoom_frame = tk.Frame(scanner_frame, bg='#ffffff')
         zoom_frame.grid(row=1, column=2, padx=8)
@@ -156,6 +264,9 @@ class POSSystem:
         ttk.Button(actions_frame, text="Receipt", command=self.print_receipt,
                   style="Primary.TButton").pack(fill="x", padx=6, pady=3)
         
+        ttk.Button(actions_frame, text="Reports", command=self.secure_reports_access,
+                  style="Primary.TButton").pack(fill="x", padx=6, pady=3)
+        
         # Compact total display
         total_frame = tk.Frame(actions_frame, bg='#e8f5e8', relief='solid', bd=1)
         total_frame.pack(fill="x", padx=6, pady=(12, 6))
@@ -231,19 +342,21 @@ class POSSystem:
         if not search_term:
             return
         
-        # Try barcode first
-        product = self.db.get_product_by_barcode(search_term)
+        # A highlighted suggestion wins over the typed text
+        suggestion = self.suggestions.selected()
+        if suggestion:
+            self.pick_suggestion(suggestion)
+            return
+        self.suggestions.hide()
         
-        # If not found, try product name search
-        if not product:
-            products = self.db.get_all_products()
-            matches = [p for p in products if search_term.lower() in p[2].lower()]
-            
-            if len(matches) == 1:
-                product = matches[0]
-            elif len(matches) > 1:
-                # Show selection dialog for multiple matches
-                product = self.select_from_matches(matches)
+        # Exact barcode first, then product name search
+        matches = self.till.find(search_term)
+        product = None
+        if len(matches) == 1:
+            product = matches[0]
+        elif len(matches) > 1:
+            # Show selection dialog for multiple matches
+            product = self.select_from_matches(matches)
         
         if product:
             self.add_to_cart(product)
@@ -270,7 +383,7 @@ class POSSystem:
         listbox.pack(fill="both", expand=True, padx=10, pady=10)
         
         for product in matches:
-            listbox.insert(tk.END, f"{product[2]} - {product[3]:.2f} DA")
+            listbox.insert(tk.END, f"{product[2]} - {format_money(product[3])}")
         
         def on_select():
             nonlocal selected_product
@@ -285,10 +398,91 @@ class POSSystem:
         dialog.wait_window()
         return selected_product
     
+    def track_key_timing(self, event):
+        """Feed printable keys to the scanner burst detector, timed by the event itself"""
+        if event.char and event.char.isprintable():
+            self.scan_burst.key(event.char, event.time / 1000)
+    
+    def on_return(self, event):
+        """Return ends either a scanner burst (fast path) or typed input (full search)"""
+        code = self.scan_burst.end(event.time / 1000)
+        if code is None:
+            self.process_search()
+        else:
+            self.process_scan(code)
+        return "break"
+    
+    def process_scan(self, code):
+        """Add the product with barcode ``code`` straight to the cart.
+        
+        No suggestions, name search or dialogs: a modal window would swallow
+        the keys of the next scan, so problems go to the status line.
+        """
+        if self.suggest_after_id is not None:
+            self.root.after_cancel(self.suggest_after_id)
+            self.suggest_after_id = None
+        self.suggestions.hide()
+        # Keep anything typed before the scanner started
+        text = self.search_var.get()
+        self.search_var.set(text[:-len(code)] if text.endswith(code) else "")
+        
+        try:
+            product = self.till.scan_barcode(code)
+        except CartError as e:
+            self.show_scan_status(str(e), error=True)
+            return
+        if product is None:
+            self.show_scan_status(f"Unknown barcode {code}", error=True)
+            return
+        self.paint_cart_row(product[0])
+        self.update_total()
+        if 0 < product[4] < LOW_STOCK:
+            self.show_scan_status(f"{product[2]}: only {product[4]} units left", error=True)
+        else:
+            self.show_scan_status(f"Added {product[2]}")
+    
+    def show_scan_status(self, message, error=False):
+        """Show a scan's outcome for a few seconds; errors also ring the bell"""
+        if error:
+            self.root.bell()
+        self.scan_status_label.configure(fg='#dc3545' if error else '#28a745')
+        self.scan_status_var.set(message)
+        if self.scan_status_after_id is not None:
+            self.root.after_cancel(self.scan_status_after_id)
+        self.scan_status_after_id = self.root.after(self.SCAN_STATUS_MS, self.clear_scan_status)
+    
+    def clear_scan_status(self):
+        self.scan_status_after_id = None
+        self.scan_status_var.set("")
+    
     def show_search_suggestions(self, *args):
-        """Show search suggestions (simplified)"""
-        # Could implement autocomplete dropdown here
-        pass
+        """Refresh the suggestion dropdown once typing pauses"""
+        if self.suggest_after_id is not None:
+            self.root.after_cancel(self.suggest_after_id)
+            self.suggest_after_id = None
+        # No lookups at all while a scanner is typing
+        if self.scan_burst.in_burst():
+            return
+        self.suggest_after_id = self.root.after(self.SUGGEST_DELAY_MS, self.update_suggestions)
+    
+    def update_suggestions(self):
+        """Show the top matches for the current text"""
+        self.suggest_after_id = None
+        search_term = self.search_var.get().strip()
+        
+        # Scanner bursts (and single characters) never open the dropdown
+        if len(search_term) < 2 or self.scan_burst.in_burst():
+            self.suggestions.hide()
+            return
+        
+        self.suggestions.show(self.db.suggest_products(search_term, self.suggestions.max_rows))
+    
+    def pick_suggestion(self, product):
+        """Add a product chosen from the dropdown"""
+        self.suggestions.hide()
+        self.add_to_cart(product)
+        self.barcode_entry.delete(0, tk.END)
+        self.barcode_entry.focus_set()
     
     def handle_zoom(self, event):
         """Handle zoom with Ctrl+scroll"""
@@ -316,58 +510,62 @@ class POSSystem:
     
     def add_to_cart(self, product):
         """Add product to shopping cart"""
-        product_id = product[0]
-        
-        if product[4] <= 0:
-            messagebox.showwarning("Out of Stock", f"'{product[2]}' is out of stock!")
-            return
-        
-        if product[4] < 5:
+        if 0 < product[4] < LOW_STOCK:
             messagebox.showwarning("Low Stock Warning", 
                                  f"Warning: Only {product[4]} units left for '{product[2]}'")
+        try:
+            self.till.add(product)
+        except CartError as e:
+            title = "Out of Stock" if product[4] <= 0 else "Insufficient Stock"
+            messagebox.showwarning(title, str(e))
+            return
+        self.paint_cart_row(product[0])
+        self.update_total()
+
+    def set_cart_quantity(self, product_id, quantity, product=None):
+        """Set one cart line's quantity (0 removes it), repainting only that row"""
+        try:
+            self.till.set_quantity(product_id, quantity, product)
+        except CartError as e:
+            messagebox.showwarning("Insufficient Stock", str(e))
+        self.paint_cart_row(product_id)
+
+    def paint_cart_row(self, product_id):
+        """Insert, refresh or drop the tree row of one cart line"""
+        quantity = self.cart.quantity(product_id)
+        row = self.cart_rows.get(product_id)
+        if not quantity:
+            if row is not None:
+                self.cart_tree.delete(self.cart_rows.pop(product_id))
+            return
         
-        if product_id in self.cart:
-            if self.cart[product_id]['quantity'] >= product[4]:
-                messagebox.showwarning("Insufficient Stock", 
-                                     f"Only {product[4]} units available for '{product[2]}'")
-                return
-            self.cart[product_id]['quantity'] += 1
+        product = self.cart.product(product_id)
+        price = product[3]
+        values = (
+            product[2],  # name
+            format_money(price),
+            quantity,
+            format_money(price * quantity)
+        )
+        if row is None:
+            row = self.cart_tree.insert("", "end", values=values, tags=(product_id,))
+            self.cart_rows[product_id] = row
         else:
-            self.cart[product_id] = {
-                'product': product,
-                'quantity': 1
-            }
-        
-        self.update_cart_display()
-        self.update_total()
+            self.cart_tree.item(row, values=values)
+        self.cart_tree.see(row)
 
     def update_cart_display(self):
-        """Update cart display with current items"""
-        for item in self.cart_tree.get_children():
-            self.cart_tree.delete(item)
-        
-        total_items = 0
-        for product_id, item in self.cart.items():
-            product = item['product']
-            quantity = item['quantity']
-            price = product[3]
-            subtotal = price * quantity
-            total_items += quantity
-            
-            self.cart_tree.insert("", "end", values=(
-                product[2],  # name
-                f"{price:.2f} DA",
-                quantity,
-                f"{subtotal:.2f} DA"
-            ), tags=(product_id,))
-        
-        # Update item count
-        self.item_count_var.set(f"{total_items} items")
+        """Repaint every cart row"""
+        self.cart_tree.delete(*self.cart_rows.values())
+        self.cart_rows.clear()
+        for product_id in list(self.cart.lines):
+            self.paint_cart_row(product_id)
+        self.update_total()
 
     def update_total(self):
-        """Update total amount display"""
-        total = sum(item['product'][3] * item['quantity'] for item in self.cart.values())
-        self.total_var.set(f"{total:.2f} DA")
+        """Update total amount and item count display"""
+        self.total_var.set(format_money(self.cart.total))
+        self.item_count_var.set(f"{self.cart.item_count} items")
 
     def checkout(self):
         """Process checkout and complete sale"""
@@ -375,39 +573,40 @@ class POSSystem:
             messagebox.showwarning("Warning", "Cart is empty!")
             return
         
-        total = sum(item['product'][3] * item['quantity'] for item in self.cart.values())
+        total = format_money(self.cart.total)
         customer_name = self.customer_entry.get().strip() or "Guest"
         
-        sale_items = []
-        for product_id, item in self.cart.items():
-            quantity = item['quantity']
-            subtotal = item['product'][3] * quantity
-            sale_items.append((product_id, quantity, subtotal))
-        
-        if messagebox.askyesno("Confirm Sale", f"Process sale for {total:.2f} DA?\nCustomer: {customer_name}"):
+        if messagebox.askyesno("Confirm Sale", f"Process sale for {total}?\nCustomer: {customer_name}"):
             try:
-                sale_id = self.db.record_sale(sale_items, total, customer_name)
-                self.last_sale_id = sale_id
+                # Accepted once journaled; the database write happens in the background
+                self.last_sale_ref = self.till.checkout(customer_name)
+                self.last_sale_id = None
                 
-                messagebox.showinfo("Success", f"Sale completed!\nSale ID: {sale_id}\nTotal: {total:.2f} DA")
+                messagebox.showinfo("Success", f"Sale completed!\nTotal: {total}")
                 
-                self.cart.clear()
                 self.customer_entry.delete(0, tk.END)
                 self.update_cart_display()
-                self.update_total()
                 
                 if messagebox.askyesno("Print Receipt", "Would you like to save a receipt?"):
                     self.print_receipt()
                 
+            except InsufficientStockError as e:
+                lines = []
+                for product_id, requested, available in e.shortages:
+                    product = self.cart.product(product_id)
+                    name = product[2] if product else product_id
+                    lines.append(f"{name}: {requested} in cart, {available} available")
+                self.update_cart_display()
+                messagebox.showerror("Insufficient Stock",
+                                   "Sale not recorded. Adjust these items:\n" + "\n".join(lines))
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to process sale: {str(e)}")
 
     def clear_cart(self):
         """Clear all items from cart"""
         if self.cart and messagebox.askyesno("Confirm", "Clear all items from cart?"):
-            self.cart.clear()
+            self.till.clear()
             self.update_cart_display()
-            self.update_total()
 
     def remove_item(self):
         """Remove selected item from cart"""
@@ -420,8 +619,7 @@ class POSSystem:
         if item['tags']:
             product_id = int(item['tags'][0])
             if product_id in self.cart:
-                del self.cart[product_id]
-                self.update_cart_display()
+                self.set_cart_quantity(product_id, 0)
                 self.update_total()
 
     def edit_quantity(self):
@@ -435,8 +633,8 @@ class POSSystem:
         if item['tags']:
             product_id = int(item['tags'][0])
             if product_id in self.cart:
-                current_qty = self.cart[product_id]['quantity']
-                max_stock = self.cart[product_id]['product'][4]
+                current_qty = self.cart.quantity(product_id)
+                max_stock = self.cart.product(product_id)[4]
                 
                 new_qty = simpledialog.askinteger(
                     "Edit Quantity", 
@@ -447,8 +645,7 @@ class POSSystem:
                 )
                 
                 if new_qty:
-                    self.cart[product_id]['quantity'] = new_qty
-                    self.update_cart_display()
+                    self.set_cart_quantity(product_id, new_qty)
                     self.update_total()
 
     def secure_inventory_access(self):
@@ -459,6 +656,14 @@ class POSSystem:
         else:
             messagebox.showerror("Access Denied", "Incorrect password!")
 
+    def secure_reports_access(self):
+        """Open the sales reports after an admin password check"""
+        password = simpledialog.askstring("Admin Access", "Enter admin password:", show='*')
+        if password == self.admin_password:
+            ReportsWindow(self.root, self.db)
+        elif password is not None:
+            messagebox.showerror("Access Denied", "Incorrect password!")
+
     def add_new_product(self, search_term):
         """Add new product via dialog"""
         from inventory_manager import ProductDialog
@@ -473,6 +678,8 @@ class POSSystem:
 
     def print_receipt(self):
         """Generate and save receipt as text file"""
+        if not self.last_sale_id and self.last_sale_ref:
+            self.last_sale_id = self.checkout_queue.wait_for(self.last_sale_ref, timeout=5.0)
         if not self.last_sale_id:
             messagebox.showwarning("Warning", "No recent sale to print!")
             return
@@ -487,67 +694,36 @@ class POSSystem:
             self.generate_receipt_file(receipt_path)
 
     def generate_receipt_file(self, filepath):
-        """Generate receipt file content"""
+        """Write the last sale's receipt, rendered from the stored sale"""
         try:
-            sale_data = self.db.get_sale_details(self.last_sale_id)
-            customer_name = self.customer_entry.get().strip() or "Guest"
-            
-            with open(filepath, 'w') as f:
-                f.write("=" * 40 + "\n")
-                f.write("         POS SYSTEM RECEIPT\n")
-                f.write("=" * 40 + "\n")
-                f.write(f"Sale ID: {self.last_sale_id}\n")
-                f.write(f"Customer: {customer_name}\n")
-                f.write(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("-" * 40 + "\n")
-                
-                total = 0
-                for item in sale_data:
-                    name, price, qty, subtotal = item
-                    f.write(f"{name:<20} {price:>6.2f} DA x{qty:>2} {subtotal:>7.2f} DA\n")
-                    total += subtotal
-                
-                f.write("-" * 40 + "\n")
-                f.write(f"{'TOTAL':<32} {total:>7.2f} DA\n")
-                f.write("=" * 40 + "\n")
-                f.write("Thank you for your purchase!\n")
-            
+            text = render_receipt(self.db, self.last_sale_id)
+            if text is None:
+                messagebox.showwarning("Warning", "No recent sale to print!")
+                return
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(text)
             messagebox.showinfo("Success", f"Receipt saved to {filepath}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate receipt: {str(e)}")
 
-    def auto_backup(self):
-        """Automatic backup on startup"""
-        backup_dir = "backups"
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
-        timestamp = datetime.datetime.now().strftime("%Y%m%d")
-        backup_path = os.path.join(backup_dir, f"auto_backup_{timestamp}.db")
-        
-        if not os.path.exists(backup_path):
-            try:
-                shutil.copy2(self.db.db_path, backup_path)
-            except Exception:
-                pass
+    def on_close(self):
+        """Finish pending sales, stop backups, close database connections and exit"""
+        self.till.clear()
+        if not self.checkout_queue.close():
+            messagebox.showwarning("Warning", "Some sales are still being saved; they will be "
+                                              "completed the next time the POS starts.")
+        if self.sync_engine:
+            self.sync_engine.stop()
+        self.backup_manager.stop()
+        self.db.close()
+        self.root.destroy()
 
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
-    # Initialize with sample products if database is empty
+    # One database handle for the whole app
     db = POSDatabase()
-    products = db.get_all_products()
-    
-    if not products:
-        sample_products = [
-            ("1234567890123", "Sample Cola", 1.99, 50),
-            ("2345678901234", "Sample Chips", 2.49, 30),
-            ("3456789012345", "Sample Candy", 0.99, 100),
-        ]
-        
-        for barcode, name, price, stock in sample_products:
-            db.add_product(barcode, name, price, stock)
-    
-    pos = POSSystem()
+    seed_sample_products(db)
+    pos = POSSystem(db)
     pos.run()
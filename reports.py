@@ -0,0 +1,155 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import datetime
+import threading
+
+from diagnostics import DiagnosticsWindow
+from money import format_money
+from sales_history import SalesHistoryWindow
+import receipts
+
+class ReportsWindow:
+    """Sales dashboard read from the summary tables"""
+
+    TOP_PRODUCTS = 20
+
+    def __init__(self, parent, db):
+        self.db = db
+        self.window = tk.Toplevel(parent)
+        self.window.title("Sales Reports")
+        self.window.geometry("760x560")
+        self.window.configure(bg='#f8f9fa')
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_columnconfigure(1, weight=1)
+        self.window.grid_rowconfigure(2, weight=1)
+
+        # Period selection
+        controls = tk.Frame(self.window, bg='#f8f9fa')
+        controls.grid(row=0, column=0, columnspan=2, sticky="ew", padx=8, pady=(8, 4))
+        tk.Label(controls, text="Day (YYYY-MM-DD):", font=("Segoe UI", 9),
+                fg='#495057', bg='#f8f9fa').pack(side="left")
+        self.day_var = tk.StringVar(value=datetime.date.today().isoformat())
+        day_entry = tk.Entry(controls, textvariable=self.day_var, font=("Segoe UI", 9), width=12,
+                             bg='#ffffff', fg='#495057', relief='solid', bd=1)
+        day_entry.pack(side="left", padx=(4, 8))
+        day_entry.bind("<Return>", self.refresh)
+        tk.Button(controls, text="Refresh", command=self.refresh,
+                 font=("Segoe UI", 9), bg='#007bff', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="left", padx=4)
+        self.reprint_button = tk.Button(controls, text="Reprint Receipts", command=self.reprint_day,
+                                        font=("Segoe UI", 9), bg='#28a745', fg='white',
+                                        padx=12, pady=2, relief='flat', bd=0)
+        self.reprint_button.pack(side="left", padx=4)
+        self.reprint_outcome = None
+        tk.Button(controls, text="Sales History", command=lambda: SalesHistoryWindow(self.window, db),
+                 font=("Segoe UI", 9), bg='#17a2b8', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="left", padx=4)
+        tk.Button(controls, text="Rebuild Summaries", command=self.rebuild,
+                 font=("Segoe UI", 9), bg='#6c757d', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="right", padx=4)
+        if db.instrumentation is not None:
+            tk.Button(controls, text="Diagnostics",
+                     command=lambda: DiagnosticsWindow(self.window, db.instrumentation),
+                     font=("Segoe UI", 9), bg='#17a2b8', fg='white',
+                     padx=12, pady=2, relief='flat', bd=0).pack(side="right", padx=4)
+
+        # Headline figures
+        self.day_summary_var = tk.StringVar()
+        self.month_summary_var = tk.StringVar()
+        for column, var in enumerate((self.day_summary_var, self.month_summary_var)):
+            tk.Label(self.window, textvariable=var, font=("Segoe UI", 10, "bold"),
+                    fg='#28a745', bg='#e8f5e8', relief='solid', bd=1,
+                    pady=8).grid(row=1, column=column, sticky="ew", padx=8, pady=4)
+
+        self.hours_tree = self.create_table(0, "Sales by hour",
+                                            [("Hour", 70), ("Sales", 70), ("Items", 70), ("Revenue", 100)])
+        self.top_tree = self.create_table(1, f"Top {self.TOP_PRODUCTS} products this month",
+                                          [("Product", 190), ("Qty", 60), ("Revenue", 100)])
+        self.refresh()
+
+    def create_table(self, column, title, headings):
+        """Titled treeview in the given grid column"""
+        frame = tk.LabelFrame(self.window, text=title, font=("Segoe UI", 9, "bold"),
+                              fg='#495057', bg='#ffffff')
+        frame.grid(row=2, column=column, sticky="nsew", padx=8, pady=(4, 8))
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        names = [name for name, _ in headings]
+        tree = ttk.Treeview(frame, columns=names, show="headings")
+        for name, width in headings:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor="w" if name == "Product" else "e")
+        tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree
+
+    def refresh(self, event=None):
+        """Reload every figure for the selected day and its month"""
+        try:
+            day = datetime.date.fromisoformat(self.day_var.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Dates must look like 2024-01-31.", parent=self.window)
+            return
+        day_text = day.isoformat()
+        month_start = day.replace(day=1).isoformat()
+
+        sales, items, revenue = self.db.get_sales_totals(day_text, day_text)
+        self.day_summary_var.set(f"{day_text}: {format_money(revenue)}  ({sales} sales, {items} items)")
+        sales, items, revenue = self.db.get_sales_totals(month_start, day_text)
+        self.month_summary_var.set(f"{day_text[:7]} to date: {format_money(revenue)}  ({sales} sales)")
+
+        self.hours_tree.delete(*self.hours_tree.get_children())
+        for hour, sales, items, revenue in self.db.get_sales_by_hour(day_text):
+            self.hours_tree.insert("", "end", values=(f"{hour:02d}:00", sales, items, format_money(revenue)))
+
+        self.top_tree.delete(*self.top_tree.get_children())
+        for _, name, quantity, revenue in self.db.get_top_products(day_text[:7], self.TOP_PRODUCTS):
+            self.top_tree.insert("", "end", values=(name, quantity, format_money(revenue)))
+
+    def reprint_day(self):
+        """Write every receipt of the selected day to one file in the background"""
+        try:
+            day = datetime.date.fromisoformat(self.day_var.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Dates must look like 2024-01-31.", parent=self.window)
+            return
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".txt",
+                                            initialfile=f"receipts_{day.isoformat()}.txt",
+                                            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        self.reprint_button.configure(state="disabled", text="Reprinting...")
+        threading.Thread(target=self.run_reprint, args=(day, path), daemon=True).start()
+        self.window.after(100, self.poll_reprint)
+
+    def run_reprint(self, day, path):
+        """Background thread body; never touches Tk"""
+        try:
+            count = receipts.write_receipts(self.db, path, day, day)
+            self.reprint_outcome = ("done", f"{count} receipts written to {path}")
+        except Exception as e:
+            self.reprint_outcome = ("error", f"Reprint failed: {e}")
+        finally:
+            self.db.release_connection()
+
+    def poll_reprint(self):
+        if self.reprint_outcome is None:
+            self.window.after(100, self.poll_reprint)
+            return
+        status, message = self.reprint_outcome
+        self.reprint_outcome = None
+        self.reprint_button.configure(state="normal", text="Reprint Receipts")
+        if status == "done":
+            messagebox.showinfo("Receipts", message, parent=self.window)
+        else:
+            messagebox.showerror("Error", message, parent=self.window)
+
+    def rebuild(self):
+        """Recompute the summaries from the raw sales"""
+        if messagebox.askyesno("Confirm", "Rebuild all sales summaries from the sales history?",
+                               parent=self.window):
+            self.db.rebuild_sales_summaries()
+            self.refresh()
+            messagebox.showinfo("Success", "Sales summaries rebuilt.", parent=self.window)
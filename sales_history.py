@@ -0,0 +1,241 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import datetime
+
+from background import BackgroundWorker
+from money import to_minor, format_money
+import exporter
+import receipts
+
+class SalesHistoryWindow:
+    """Past sales newest first, with filters and a drill-down into one sale.
+
+    The list is fetched a page at a time with keyset pagination on
+    (timestamp, id), on a background worker, so filtering and scrolling
+    never wait on the database in the Tk thread.
+    """
+
+    PAGE_SIZE = 200
+
+    def __init__(self, parent, db):
+        self.db = db
+        self.filters = {}
+        self.page_before = None
+        self.page_exhausted = True
+        self.page_pending = False
+        self.shown = 0
+        self.sale_id = None
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Sales History")
+        self.window.geometry("820x620")
+        self.window.configure(bg='#f8f9fa')
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(1, weight=3)
+        self.window.grid_rowconfigure(3, weight=2)
+        self.worker = BackgroundWorker(self.window, on_exit=self.db.release_connection)
+        self.window.bind("<Destroy>", self.on_window_destroy)
+
+        # Filters
+        controls = tk.Frame(self.window, bg='#f8f9fa')
+        controls.grid(row=0, column=0, sticky="ew", padx=8, pady=(8, 4))
+        self.start_entry = self.create_filter(controls, "From:", 11)
+        self.end_entry = self.create_filter(controls, "To:", 11)
+        self.customer_entry = self.create_filter(controls, "Customer:", 14)
+        self.min_entry = self.create_filter(controls, "Total from:", 8)
+        self.max_entry = self.create_filter(controls, "to:", 8)
+        tk.Button(controls, text="Search", command=self.apply_filters,
+                 font=("Segoe UI", 9), bg='#007bff', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="left", padx=4)
+        tk.Button(controls, text="Clear", command=self.clear_filters,
+                 font=("Segoe UI", 9), bg='#6c757d', fg='white',
+                 padx=12, pady=2, relief='flat', bd=0).pack(side="left", padx=4)
+
+        # Sales list
+        self.sales_tree, self.sales_scrollbar = self.create_table(
+            1, [("Sale", 70, "e"), ("Date", 150, "w"), ("Customer", 200, "w"), ("Items", 70, "e"),
+                ("Total", 110, "e")])
+        self.sales_tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.sales_tree.bind("<<TreeviewSelect>>", self.show_sale)
+
+        # Selected sale
+        detail = tk.Frame(self.window, bg='#f8f9fa')
+        detail.grid(row=2, column=0, sticky="ew", padx=8, pady=(4, 0))
+        self.sale_var = tk.StringVar(value="Select a sale to see its items.")
+        tk.Label(detail, textvariable=self.sale_var, font=("Segoe UI", 9, "bold"),
+                fg='#495057', bg='#f8f9fa').pack(side="left")
+        self.export_button = tk.Button(detail, text="Export CSV", command=self.export_sale,
+                                       font=("Segoe UI", 9), bg='#17a2b8', fg='white',
+                                       padx=12, pady=2, relief='flat', bd=0, state="disabled")
+        self.export_button.pack(side="right", padx=4)
+        self.reprint_button = tk.Button(detail, text="Reprint Receipt", command=self.reprint_sale,
+                                        font=("Segoe UI", 9), bg='#28a745', fg='white',
+                                        padx=12, pady=2, relief='flat', bd=0, state="disabled")
+        self.reprint_button.pack(side="right", padx=4)
+        self.lines_tree, _ = self.create_table(
+            3, [("Barcode", 120, "w"), ("Product", 260, "w"), ("Qty", 60, "e"), ("Unit", 100, "e"),
+                ("Subtotal", 110, "e")])
+
+        self.status_var = tk.StringVar()
+        tk.Label(self.window, textvariable=self.status_var, font=("Segoe UI", 8),
+                fg='#6c757d', bg='#f8f9fa').grid(row=4, column=0, sticky="w", padx=8, pady=(0, 6))
+
+        self.apply_filters()
+
+    def create_filter(self, parent, text, width):
+        """Labelled entry in the filter bar; Return runs the search"""
+        tk.Label(parent, text=text, font=("Segoe UI", 9), fg='#495057', bg='#f8f9fa').pack(side="left")
+        entry = tk.Entry(parent, font=("Segoe UI", 9), width=width,
+                         bg='#ffffff', fg='#495057', relief='solid', bd=1)
+        entry.pack(side="left", padx=(4, 8))
+        entry.bind("<Return>", self.apply_filters)
+        return entry
+
+    def create_table(self, row, headings):
+        """Treeview with a scrollbar in the given grid row"""
+        frame = tk.Frame(self.window, bg='#ffffff')
+        frame.grid(row=row, column=0, sticky="nsew", padx=8, pady=4)
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        names = [name for name, _, _ in headings]
+        tree = ttk.Treeview(frame, columns=names, show="headings", selectmode="browse")
+        for name, width, anchor in headings:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor=anchor)
+        tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree, scrollbar
+
+    def read_filters(self) -> dict:
+        """get_sales_page keyword arguments from the filter bar; ValueError on bad input"""
+        filters = {}
+        for key, entry in (("start_day", self.start_entry), ("end_day", self.end_entry)):
+            text = entry.get().strip()
+            if text:
+                try:
+                    filters[key] = datetime.date.fromisoformat(text).isoformat()
+                except ValueError:
+                    raise ValueError("Dates must look like 2024-01-31.")
+        customer = self.customer_entry.get().strip()
+        if customer:
+            filters["customer"] = customer
+        for key, entry in (("min_total", self.min_entry), ("max_total", self.max_entry)):
+            text = entry.get().strip()
+            if text:
+                try:
+                    filters[key] = to_minor(text)
+                except ValueError:
+                    raise ValueError("Totals must be amounts like 12.50.")
+        return filters
+
+    def apply_filters(self, event=None):
+        """Show the first page for the current filters"""
+        try:
+            filters = self.read_filters()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self.window)
+            return
+        self.filters = filters
+        # No next-page fetches until this search's first page is in
+        self.page_pending = True
+        self.status_var.set("Searching...")
+        self.worker.submit(lambda: self.db.get_sales_page(limit=self.PAGE_SIZE, **filters),
+                           self.show_first_page, self.show_error)
+
+    def clear_filters(self):
+        for entry in (self.start_entry, self.end_entry, self.customer_entry, self.min_entry, self.max_entry):
+            entry.delete(0, tk.END)
+        self.apply_filters()
+
+    def show_first_page(self, page):
+        """Replace the list with a finished search (Tk thread)"""
+        self.sales_tree.delete(*self.sales_tree.get_children())
+        self.shown = 0
+        self.show_sale_lines(None, [])
+        self.show_page(page)
+
+    def load_next_page(self):
+        """Fetch the page after the last row shown"""
+        filters, before = self.filters, self.page_before
+        self.worker.submit(lambda: self.db.get_sales_page(before=before, limit=self.PAGE_SIZE, **filters),
+                           self.show_page, self.show_error)
+
+    def show_page(self, page):
+        """Append rows and advance the keyset cursor"""
+        self.page_pending = False
+        self.page_exhausted = len(page) < self.PAGE_SIZE
+        if page:
+            self.page_before = (page[-1][1], page[-1][0])
+        for sale_id, timestamp, customer, total, items in page:
+            self.sales_tree.insert("", "end", iid=str(sale_id),
+                                   values=(sale_id, timestamp[:19].replace("T", " "), customer, items,
+                                           format_money(total)))
+        self.shown += len(page)
+        more = "" if self.page_exhausted else " (scroll for more)"
+        self.status_var.set(f"{self.shown} sales shown{more}")
+
+    def show_error(self, error):
+        self.page_pending = False
+        self.status_var.set(f"Search failed: {error}")
+
+    def on_tree_scroll(self, first, last):
+        """Track the scrollbar and fetch another page near the bottom"""
+        self.sales_scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.page_exhausted and not self.page_pending:
+            self.page_pending = True
+            self.window.after_idle(self.load_next_page)
+
+    def show_sale(self, event=None):
+        """Show the selected sale's lines (one indexed query)"""
+        selection = self.sales_tree.selection()
+        if not selection:
+            return
+        sale_id = int(selection[0])
+        self.show_sale_lines(sale_id, self.db.get_sale_lines(sale_id))
+
+    def show_sale_lines(self, sale_id, lines):
+        self.sale_id = sale_id
+        self.lines_tree.delete(*self.lines_tree.get_children())
+        state = "disabled" if sale_id is None else "normal"
+        self.reprint_button.configure(state=state)
+        self.export_button.configure(state=state)
+        if sale_id is None:
+            self.sale_var.set("Select a sale to see its items.")
+            return
+        _, timestamp, customer, _, total = self.sales_tree.item(str(sale_id), "values")
+        self.sale_var.set(f"Sale {sale_id}  -  {timestamp}  -  {customer}  -  {total}")
+        for _, barcode, name, quantity, subtotal in lines:
+            unit = subtotal // quantity if quantity else subtotal
+            self.lines_tree.insert("", "end", values=(barcode, name, quantity, format_money(unit),
+                                                      format_money(subtotal)))
+
+    def reprint_sale(self):
+        """Save the selected sale's receipt as a text file"""
+        text = receipts.render_receipt(self.db, self.sale_id)
+        if text is None:
+            messagebox.showwarning("Warning", "This sale no longer exists.", parent=self.window)
+            return
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".txt",
+                                            initialfile=f"receipt_{self.sale_id}.txt",
+                                            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            messagebox.showinfo("Success", f"Receipt saved to {path}", parent=self.window)
+
+    def export_sale(self):
+        """Save the selected sale's line items as CSV"""
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                            initialfile=f"sale_{self.sale_id}.csv",
+                                            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if path:
+            count = exporter.export_sale(self.db, self.sale_id, path)
+            messagebox.showinfo("Success", f"{count} items exported to {path}", parent=self.window)
+
+    def on_window_destroy(self, event):
+        """Stop the background worker when the window closes"""
+        if event.widget is self.window and self.worker:
+            self.worker.stop()
+            self.worker = None
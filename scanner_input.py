@@ -0,0 +1,61 @@
+"""
+Telling HID barcode scanners apart from people typing.
+USB and phone scanners in keyboard mode "type" a whole code in a few tens
+of milliseconds and end it with Return; nobody types that fast. The
+detector watches the gaps between keys and hands back the code of a burst
+as one scan, so the till can skip suggestions and name searches for it.
+"""
+
+from typing import Optional
+
+# Keys closer together than this belong to one scanner burst (seconds).
+# Wired scanners send a key every few ms; WiFi phone scanners are jittery.
+SCANNER_KEY_GAP = 0.05
+# Shortest code treated as a scan (shorter bursts are key rollover)
+MIN_SCAN_LENGTH = 4
+# Fast keys in a row after which the input is assumed to be a scanner
+BURST_KEYS = 3
+
+class ScanBurstDetector:
+    """Collects the current run of fast keys.
+
+    Call ``key`` for every printable key and ``end`` for the terminator
+    (Return). Times are in seconds; pass the event's own timestamp rather
+    than the time it is handled, so keys queued behind slow work still
+    show their real spacing.
+    """
+
+    __slots__ = ("max_gap", "min_length", "chars", "last_time")
+
+    def __init__(self, max_gap: float = SCANNER_KEY_GAP, min_length: int = MIN_SCAN_LENGTH):
+        self.max_gap = max_gap
+        self.min_length = min_length
+        self.chars = []
+        self.last_time = None
+
+    def _fast(self, now: float) -> bool:
+        # A negative gap is a clock wrap, not a fast key
+        return self.last_time is not None and 0 <= now - self.last_time <= self.max_gap
+
+    def key(self, char: str, now: float):
+        """Record a printable key; a pause before it starts a new run"""
+        if not self._fast(now):
+            self.chars.clear()
+        self.chars.append(char)
+        self.last_time = now
+
+    def in_burst(self) -> bool:
+        """True once the current run of fast keys is too long to be typing"""
+        return len(self.chars) >= BURST_KEYS
+
+    def end(self, now: float) -> Optional[str]:
+        """The scanned code if the terminator closes a burst, else None (typed input)"""
+        code = None
+        if len(self.chars) >= self.min_length and self._fast(now):
+            code = "".join(self.chars)
+        self.reset()
+        return code
+
+    def reset(self):
+        self.chars.clear()
+        self.last_time = None
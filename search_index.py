@@ -0,0 +1,203 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+GRAM = 3
+
+class ProductSearchIndex:
+    """Name and barcode search over product ids.
+
+    Two structures, both updated incrementally:
+    - a sorted (word, id) list over name words and barcodes for prefix
+      matches, walked from a bisect so ranked top-k results stop early;
+    - a trigram index (sorted id arrays per trigram of each name word) for
+      substring matches anywhere in the name, verified against the text.
+    Queries shorter than three characters use the prefix structure only.
+    """
+
+    def __init__(self):
+        self._docs = {}
+        self._postings = {}
+        self._words = []
+        self._word_ids = array('q')
+        self._word_grams = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _grams(self, name: str):
+        """Distinct trigrams of the words in ``name``, cached per indexed word"""
+        grams = set()
+        cache = self._word_grams
+        for word in name.split():
+            word_grams = cache.get(word)
+            if word_grams is None:
+                word_grams = cache[sys.intern(word)] = frozenset(
+                    word[i:i + GRAM] for i in range(len(word) - GRAM + 1))
+            grams |= word_grams
+        return grams
+
+    @staticmethod
+    def _tokens(name: str, barcode: str):
+        """Words a prefix search can start from: every name word plus the barcode"""
+        return {sys.intern(word) for word in name.split()} | {barcode}
+
+    def build(self, products: Iterable[Tuple[int, str, str]]):
+        """Rebuild from (id, barcode, name) rows"""
+        self._word_grams = {}
+        docs = {}
+        name_ids = {}
+        token_ids = {}
+        for product_id, barcode, name in products:
+            name, barcode = name.lower(), barcode.lower()
+            docs[product_id] = (name, barcode)
+            for word in set(name.split()):
+                ids = name_ids.get(word)
+                if ids is None:
+                    name_ids[sys.intern(word)] = [product_id]
+                else:
+                    ids.append(product_id)
+            # Name words and barcodes share one token space: "500" may be both
+            for token in self._tokens(name, barcode):
+                ids = token_ids.get(token)
+                if ids is None:
+                    token_ids[token] = [product_id]
+                else:
+                    ids.append(product_id)
+
+        # Expand per-word id lists into trigram postings
+        postings = {}
+        for word, ids in name_ids.items():
+            for gram in self._grams(word):
+                postings.setdefault(gram, []).extend(ids)
+
+        # One sorted (word, id) list over name words and barcodes
+        words = []
+        word_ids = array('q')
+        for token, ids in sorted(token_ids.items()):
+            ids.sort()
+            words.extend([token] * len(ids))
+            word_ids.extend(ids)
+        self._docs = docs
+        self._postings = {gram: array('q', sorted(set(ids))) for gram, ids in postings.items()}
+        self._words = words
+        self._word_ids = word_ids
+
+    def _word_range(self, token: str):
+        """Slice of the word list holding exactly ``token``"""
+        return bisect_left(self._words, token), bisect_right(self._words, token)
+
+    def add(self, product_id: int, barcode: str, name: str):
+        """Index one product, replacing any previous entry for its id"""
+        if product_id in self._docs:
+            self.remove(product_id)
+        name, barcode = name.lower(), barcode.lower()
+        self._docs[product_id] = (name, barcode)
+        for gram in self._grams(name):
+            posting = self._postings.get(gram)
+            if posting is None:
+                self._postings[gram] = array('q', [product_id])
+            elif posting[-1] < product_id:
+                posting.append(product_id)
+            else:
+                posting.insert(bisect_left(posting, product_id), product_id)
+        for token in self._tokens(name, barcode):
+            lo, hi = self._word_range(token)
+            pos = bisect_left(self._word_ids, product_id, lo, hi)
+            self._words.insert(pos, token)
+            self._word_ids.insert(pos, product_id)
+
+    def remove(self, product_id: int):
+        """Drop a product from the index"""
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        name, barcode = doc
+        for gram in self._grams(name):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            pos = bisect_left(posting, product_id)
+            if pos < len(posting) and posting[pos] == product_id:
+                del posting[pos]
+            if not posting:
+                del self._postings[gram]
+        for token in self._tokens(name, barcode):
+            lo, hi = self._word_range(token)
+            pos = bisect_left(self._word_ids, product_id, lo, hi)
+            if pos < hi and self._word_ids[pos] == product_id:
+                del self._words[pos]
+                del self._word_ids[pos]
+                if hi - lo == 1:
+                    # Last product with this word: its trigrams need not stay cached
+                    self._word_grams.pop(token, None)
+
+    def search(self, term: str, limit: Optional[int] = 20) -> List[int]:
+        """Return product ids matching ``term``, best first.
+
+        Ranking: exact barcode, then name words or barcodes starting with
+        ``term`` (in word order), then other name substring matches (in
+        catalog order). ``limit=None`` returns every match.
+        """
+        query = term.strip().lower()
+        if not query:
+            return []
+
+        exact = []
+        prefixed = []
+        seen = set()
+        words, word_ids, docs = self._words, self._word_ids, self._docs
+        pos = bisect_left(words, query)
+        while pos < len(words) and words[pos].startswith(query):
+            product_id = word_ids[pos]
+            pos += 1
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            if docs[product_id][1] == query:
+                exact.append(product_id)
+            else:
+                prefixed.append(product_id)
+                if limit is not None and len(exact) + len(prefixed) >= limit:
+                    break
+
+        results = exact + prefixed
+        if limit is not None and len(results) >= limit:
+            return results[:limit]
+
+        for product_id in self._substring_matches(query):
+            if product_id not in seen:
+                results.append(product_id)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def filter_matching(self, product_ids: Iterable[int], query: str) -> List[int]:
+        """Those of ``product_ids`` whose name contains, or barcode starts with, ``query``"""
+        docs = self._docs
+        matches = []
+        for product_id in product_ids:
+            doc = docs.get(product_id)
+            if doc is not None and (query in doc[0] or doc[1].startswith(query)):
+                matches.append(product_id)
+        return matches
+
+    def _substring_matches(self, query: str):
+        """Yield ids whose name contains ``query``, in id order"""
+        grams = set()
+        for word in query.split():
+            grams.update(word[i:i + GRAM] for i in range(len(word) - GRAM + 1))
+        if not grams:
+            return
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return
+            postings.append(posting)
+        # Verify the text of the rarest trigram's products only
+        docs = self._docs
+        for product_id in min(postings, key=len):
+            if query in docs[product_id][0]:
+                yield product_id
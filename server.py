@@ -0,0 +1,403 @@
+"""
+Headless service mode: a local HTTP/JSON server in front of one POS engine.
+Tills, handheld scanners and back-office screens share the same database,
+catalog and checkout journal through it.
+
+    python server.py [--db pos_system.db] [--host 127.0.0.1] [--port 8765]
+
+Endpoints (JSON in and out; prices, totals and revenue are integer minor
+units, 1/100 DA):
+    GET    /health
+    GET    /products/<barcode>             one product
+    GET    /products?q=term&limit=20       search
+    POST   /carts                          new cart -> {"cart_id": ...}
+    GET    /carts/<id>
+    POST   /carts/<id>/scan                {"term": barcode or name}
+    PUT    /carts/<id>/items/<product_id>  {"quantity": n} (0 removes)
+    DELETE /carts/<id>/items/<product_id>
+    POST   /carts/<id>/checkout            {"customer": name}
+    DELETE /carts/<id>
+    GET    /reports/totals?start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET    /reports/hourly?day=YYYY-MM-DD
+    GET    /reports/daily?start=...&end=...
+    GET    /reports/top?month=YYYY-MM&limit=20
+
+Lookups run on the event loop against the in-memory catalog. SQL reads
+run on a bounded thread pool (one connection per thread), and every
+write, including the stock reservation behind each cart change, goes
+through a single writer thread.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from cart import Till, CartError
+from checkout_journal import CheckoutQueue
+from database import POSDatabase, InsufficientStockError
+from product_catalog import ID, BARCODE, NAME, PRICE, STOCK
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Database connections used for SQL reads (reports); writes use one more
+READ_POOL_SIZE = 4
+# Carts untouched for this many seconds are dropped (their stock
+# reservations lapse sooner, after database.RESERVATION_TTL)
+CART_IDLE_TIMEOUT = 30 * 60
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+MAX_HEADER_LINES = 100
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error"}
+
+class HTTPError(Exception):
+    """Turned into an error response with ``status``"""
+
+    def __init__(self, status: int, message: str, **details):
+        self.status = status
+        self.details = details
+        super().__init__(message)
+
+def product_json(product: Tuple) -> dict:
+    return {"id": product[ID], "barcode": product[BARCODE], "name": product[NAME],
+            "price": product[PRICE], "stock": product[STOCK]}
+
+class CartSession:
+    """One client's cart; the lock keeps its requests in order"""
+
+    def __init__(self, db: POSDatabase, checkout_queue):
+        self.till = Till(db, checkout_queue)
+        self.lock = asyncio.Lock()
+        self.touched = time.monotonic()
+
+    def as_json(self, cart_id: str) -> dict:
+        cart = self.till.cart
+        return {
+            "cart_id": cart_id,
+            "lines": [dict(product_json(line.product), quantity=line.quantity, subtotal=line.subtotal)
+                      for line in cart.lines.values()],
+            "item_count": cart.item_count,
+            "total": cart.total,
+        }
+
+class POSServer:
+    """Serve one POSDatabase (and its checkout queue) over HTTP/JSON"""
+
+    def __init__(self, db: POSDatabase, checkout_queue: Optional[CheckoutQueue] = None,
+                 pool_size: int = READ_POOL_SIZE):
+        self.db = db
+        self.checkout_queue = checkout_queue
+        self.readers = ThreadPoolExecutor(pool_size, thread_name_prefix="db-read")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        self.carts = {}
+        self.requests = 0
+        self.server = None
+        self.routes = [
+            ("GET", re.compile(r"/health"), self.health),
+            ("GET", re.compile(r"/products/(?P<barcode>[^/]+)"), self.get_product),
+            ("GET", re.compile(r"/products"), self.search_products),
+            ("POST", re.compile(r"/carts"), self.create_cart),
+            ("GET", re.compile(r"/carts/(?P<cart_id>\w+)"), self.get_cart),
+            ("DELETE", re.compile(r"/carts/(?P<cart_id>\w+)"), self.delete_cart),
+            ("POST", re.compile(r"/carts/(?P<cart_id>\w+)/scan"), self.scan),
+            ("PUT", re.compile(r"/carts/(?P<cart_id>\w+)/items/(?P<product_id>\d+)"), self.set_quantity),
+            ("DELETE", re.compile(r"/carts/(?P<cart_id>\w+)/items/(?P<product_id>\d+)"), self.remove_item),
+            ("POST", re.compile(r"/carts/(?P<cart_id>\w+)/checkout"), self.checkout),
+            ("GET", re.compile(r"/reports/totals"), self.report_totals),
+            ("GET", re.compile(r"/reports/hourly"), self.report_hourly),
+            ("GET", re.compile(r"/reports/daily"), self.report_daily),
+            ("GET", re.compile(r"/reports/top"), self.report_top),
+        ]
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        # Load the catalog before the first request instead of during it
+        await self.read(self.db.get_catalog)
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    async def read(self, func, *args):
+        """Run a database read on the reader pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.readers, func, *args)
+
+    async def write(self, func, *args):
+        """Run a database write on the single writer thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.writer, func, *args)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Open carts give their units back rather than waiting for the reservations to lapse
+        for session in self.carts.values():
+            self.writer.submit(session.till.clear)
+        self.carts.clear()
+        self.readers.shutdown(wait=True)
+        self.writer.shutdown(wait=True)
+
+    # ---- HTTP ----
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                keep_alive = True
+                # Until the body is consumed the stream position is unknown, so an error
+                # before then ends the connection rather than parsing leftovers as a request
+                request_read = False
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    headers = await self.read_headers(reader)
+                    if headers.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+                        keep_alive = False
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    request_read = True
+                    status, payload = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, dict(e.details, error=str(e))
+                    keep_alive = keep_alive and request_read
+                except ValueError as e:
+                    status, payload, keep_alive = 400, {"error": f"Malformed request: {e}"}, False
+                self.requests += 1
+                data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_headers(self, reader: asyncio.StreamReader) -> dict:
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise HTTPError(400, "Too many headers")
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        data = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            path_matched = True
+            if route_method == method:
+                try:
+                    return await handler(query=query, data=data, **match.groupdict())
+                except HTTPError:
+                    raise
+                except CartError as e:
+                    raise HTTPError(409, str(e), product=product_json(e.product))
+                except InsufficientStockError as e:
+                    raise HTTPError(409, str(e), shortages=[list(s) for s in e.shortages])
+                except Exception as e:
+                    raise HTTPError(500, f"{type(e).__name__}: {e}")
+        if path_matched:
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        raise HTTPError(404, f"No such endpoint: {path}")
+
+    # ---- products ----
+
+    async def health(self, query, data):
+        return 200, {"status": "ok", "carts": len(self.carts), "requests": self.requests,
+                     "checkout_backlog": self.checkout_queue.backlog if self.checkout_queue else 0,
+                     "checkout_failed": self.checkout_queue.failed if self.checkout_queue else 0}
+
+    async def get_product(self, query, data, barcode):
+        product = self.db.get_product_by_barcode(barcode)
+        if product is None:
+            raise HTTPError(404, f"No product with barcode {barcode}")
+        return 200, product_json(product)
+
+    async def search_products(self, query, data):
+        term = query.get("q", "").strip()
+        if not term:
+            raise HTTPError(400, "Missing search term q")
+        limit = self.int_param(query, "limit", 20)
+        products = await self.read(self.db.search_products, term, limit)
+        return 200, {"products": [product_json(product) for product in products]}
+
+    # ---- carts ----
+
+    def session(self, cart_id: str) -> CartSession:
+        session = self.carts.get(cart_id)
+        if session is None:
+            raise HTTPError(404, f"No cart {cart_id}")
+        session.touched = time.monotonic()
+        return session
+
+    async def create_cart(self, query, data):
+        cutoff = time.monotonic() - CART_IDLE_TIMEOUT
+        for cart_id in [cart_id for cart_id, s in self.carts.items() if s.touched < cutoff]:
+            await self.write(self.carts.pop(cart_id).till.clear)
+        await self.write(self.db.expire_reservations)
+        cart_id = uuid.uuid4().hex
+        self.carts[cart_id] = CartSession(self.db, self.checkout_queue)
+        return 201, {"cart_id": cart_id}
+
+    async def get_cart(self, query, data, cart_id):
+        return 200, self.session(cart_id).as_json(cart_id)
+
+    async def delete_cart(self, query, data, cart_id):
+        session = self.session(cart_id)
+        del self.carts[cart_id]
+        await self.write(session.till.clear)
+        return 200, {"cart_id": cart_id, "deleted": True}
+
+    async def scan(self, query, data, cart_id):
+        session = self.session(cart_id)
+        term = str(data.get("term", "")).strip()
+        if not term:
+            raise HTTPError(400, "Missing term")
+        async with session.lock:
+            product = await self.write(session.till.scan, term)
+            if product is None:
+                matches = session.till.find(term, limit=10)
+                raise HTTPError(404 if not matches else 409, f"'{term}' does not identify one product",
+                                matches=[product_json(match) for match in matches])
+            return 200, dict(session.as_json(cart_id), scanned=product_json(product))
+
+    async def set_quantity(self, query, data, cart_id, product_id):
+        session = self.session(cart_id)
+        product_id = int(product_id)
+        try:
+            quantity = int(data["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(400, "quantity must be an integer")
+        async with session.lock:
+            cart = session.till.cart
+            product = cart.product(product_id) or self.db.get_product_by_id(product_id)
+            if product is None:
+                raise HTTPError(404, f"No product {product_id}")
+            if quantity > product[STOCK]:
+                raise CartError(f"Only {product[STOCK]} units available for '{product[NAME]}'", product)
+            await self.write(session.till.set_quantity, product_id, quantity, product)
+            return 200, session.as_json(cart_id)
+
+    async def remove_item(self, query, data, cart_id, product_id):
+        session = self.session(cart_id)
+        async with session.lock:
+            await self.write(session.till.remove, int(product_id))
+            return 200, session.as_json(cart_id)
+
+    async def checkout(self, query, data, cart_id):
+        session = self.session(cart_id)
+        customer = str(data.get("customer") or "Guest")
+        async with session.lock:
+            if not session.till.cart.lines:
+                raise HTTPError(400, "Cart is empty")
+            total = session.till.cart.total
+            result = await self.write(session.till.checkout, customer)
+        key = "ref" if self.checkout_queue is not None else "sale_id"
+        return 200, {"cart_id": cart_id, key: result, "total": total}
+
+    # ---- reports ----
+
+    @staticmethod
+    def int_param(query: dict, name: str, default: int) -> int:
+        try:
+            return int(query.get(name, default))
+        except ValueError:
+            raise HTTPError(400, f"{name} must be an integer")
+
+    @staticmethod
+    def day_param(query: dict, name: str) -> str:
+        value = query.get(name, datetime.date.today().isoformat())
+        try:
+            return datetime.date.fromisoformat(value).isoformat()
+        except ValueError:
+            raise HTTPError(400, f"{name} must look like 2024-01-31")
+
+    async def report_totals(self, query, data):
+        start, end = self.day_param(query, "start"), self.day_param(query, "end")
+        sales, items, revenue = await self.read(self.db.get_sales_totals, start, end)
+        return 200, {"start": start, "end": end, "sales": sales, "items": items, "revenue": revenue}
+
+    async def report_hourly(self, query, data):
+        day = self.day_param(query, "day")
+        rows = await self.read(self.db.get_sales_by_hour, day)
+        return 200, {"day": day, "hours": [{"hour": hour, "sales": sales, "items": items, "revenue": revenue}
+                                           for hour, sales, items, revenue in rows]}
+
+    async def report_daily(self, query, data):
+        start, end = self.day_param(query, "start"), self.day_param(query, "end")
+        rows = await self.read(self.db.get_daily_sales, start, end)
+        return 200, {"days": [{"day": day, "sales": sales, "items": items, "revenue": revenue}
+                              for day, sales, items, revenue in rows]}
+
+    async def report_top(self, query, data):
+        month = query.get("month", datetime.date.today().isoformat()[:7])
+        if not re.fullmatch(r"\d{4}-\d{2}", month):
+            raise HTTPError(400, "month must look like 2024-01")
+        rows = await self.read(self.db.get_top_products, month, self.int_param(query, "limit", 20))
+        return 200, {"month": month, "products": [
+            {"id": product_id, "name": name, "quantity": quantity, "revenue": revenue}
+            for product_id, name, quantity, revenue in rows]}
+
+async def serve(db: POSDatabase, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                pool_size: int = READ_POOL_SIZE, journal: bool = True):
+    """Run the server until cancelled"""
+    queue = CheckoutQueue(db) if journal else None
+    pos_server = POSServer(db, queue, pool_size)
+    server = await pos_server.start(host, port)
+    print(f"POS service listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pos_server.close()
+        if queue is not None:
+            queue.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the POS engine over local HTTP/JSON")
+    parser.add_argument("--db", default="pos_system.db")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pool", type=int, default=READ_POOL_SIZE, help="database connections for reads")
+    parser.add_argument("--direct", action="store_true", help="write sales directly instead of journaling them")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    try:
+        asyncio.run(serve(db, args.host, args.port, args.pool, journal=not args.direct))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import tkinter as tk
+
+from money import format_money
+
+class SuggestionDropdown:
+    """Borderless product suggestion list shown under an entry field"""
+
+    def __init__(self, entry, on_pick, max_rows: int = 8):
+        self.entry = entry
+        self.on_pick = on_pick
+        self.max_rows = max_rows
+        self.window = None
+        self.listbox = None
+        self.products = []
+
+    def is_visible(self) -> bool:
+        return self.window is not None and bool(self.products)
+
+    def show(self, products):
+        """Show ``products`` (rows) under the entry, or hide when empty"""
+        if not products:
+            self.hide()
+            return
+        if self.window is None:
+            self.window = tk.Toplevel(self.entry)
+            self.window.overrideredirect(True)
+            self.listbox = tk.Listbox(self.window, font=("Segoe UI", 9),
+                                      bg='#ffffff', fg='#495057',
+                                      selectbackground='#007bff', selectforeground='white',
+                                      relief='solid', bd=1, activestyle='none')
+            self.listbox.pack(fill="both", expand=True)
+            self.listbox.bind("<ButtonRelease-1>", self.pick)
+
+        self.products = products
+        self.listbox.delete(0, tk.END)
+        for product in products:
+            self.listbox.insert(tk.END, f"{product[2]} - {format_money(product[3])}  ({product[4]} in stock)")
+        self.listbox.configure(height=min(len(products), self.max_rows))
+        self.listbox.selection_clear(0, tk.END)
+
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self.window.geometry(f"+{x}+{y}")
+        self.listbox.configure(width=max(self.entry.winfo_width() // 7, 30))
+        self.window.deiconify()
+        self.window.lift()
+
+    def hide(self, event=None):
+        """Hide the dropdown"""
+        self.products = []
+        if self.window is not None:
+            self.window.withdraw()
+
+    def move(self, step: int):
+        """Move the highlighted row up or down (keyboard navigation)"""
+        if not self.is_visible():
+            return
+        selection = self.listbox.curselection()
+        index = selection[0] + step if selection else (0 if step > 0 else len(self.products) - 1)
+        index = max(0, min(len(self.products) - 1, index))
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+
+    def selected(self):
+        """Highlighted product row, or None"""
+        if not self.is_visible():
+            return None
+        selection = self.listbox.curselection()
+        return self.products[selection[0]] if selection else None
+
+    def pick(self, event=None):
+        """Hand the highlighted product to ``on_pick``"""
+        product = self.selected()
+        if product is not None:
+            self.hide()
+            self.on_pick(product)
+
+    def destroy(self):
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
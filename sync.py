@@ -0,0 +1,230 @@
+"""
+Multi-lane sync against a central store.
+Every lane keeps working on its own pos_system.db and logs its changes
+(change_log table). The sync engine pushes them in batches to the central
+store, which keeps one ordered log of every lane's changes, and pulls the
+other lanes' changes back. Stock moves only by deltas, so all copies
+converge however long a lane was offline.
+
+The central store here is a shared SQLite file (for example on the back
+office PC or a network share). New lanes start from a copy of it:
+
+    python sync.py lane2.db central.db --clone   # create lane2.db from central.db
+    python sync.py lane2.db central.db           # one sync round
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from database import POSDatabase
+
+# Seconds between sync rounds
+SYNC_INTERVAL = 5.0
+# Change log entries moved per push or pull request (an import batch is
+# one entry)
+SYNC_BATCH = 100
+# Environment variable main.py reads for the central store path
+CENTRAL_DB_ENV = "POS_CENTRAL_DB"
+# WAL needs shared memory on one machine, so the central file (often on a
+# network share) uses a rollback journal and waits longer for the lock
+CENTRAL_DB_SETTINGS = {"journal_mode": "DELETE", "synchronous": "FULL", "timeout": 15.0}
+
+class CentralStore:
+    """Central database: the store-wide products, stock and sales, plus the
+    ordered log of every change lanes have pushed"""
+
+    def __init__(self, db_path: str):
+        self.db = POSDatabase(db_path, settings=CENTRAL_DB_SETTINGS)
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS central_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lane TEXT NOT NULL,
+                    lane_seq INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    UNIQUE (lane, lane_seq)
+                )
+            ''')
+
+    def push(self, lane: str, changes: List[Tuple[int, str, dict]]) -> int:
+        """Store and apply a lane's changes; returns how many were new.
+
+        Changes the store already holds (a retried push) are ignored.
+        """
+        with self.db.transaction(immediate=True) as cursor:
+            fresh = []
+            for lane_seq, kind, payload in changes:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO central_log (lane, lane_seq, kind, payload) VALUES (?, ?, ?, ?)",
+                    (lane, lane_seq, kind, json.dumps(payload, separators=(',', ':'))))
+                if cursor.rowcount:
+                    fresh.append((kind, payload))
+            self.db.apply_changes(fresh, keep_sales=True)
+        return len(fresh)
+
+    def pull(self, lane: str, after: int, limit: int = SYNC_BATCH) -> List[Tuple[int, str, dict]]:
+        """Changes after central seq ``after`` that ``lane`` has not applied.
+
+        A lane's own stock and sales are already in its database; its own
+        product edits come back so every lane ends on the central order.
+        """
+        cursor = self.db.get_connection().execute("""
+            SELECT seq, kind, payload FROM central_log
+            WHERE seq > ? AND (lane != ? OR kind IN ('product', 'products', 'delete'))
+            ORDER BY seq LIMIT ?
+        """, (after, lane, limit))
+        return [(seq, kind, json.loads(payload)) for seq, kind, payload in cursor.fetchall()]
+
+    def last_seq(self) -> int:
+        row = self.db.get_connection().execute("SELECT COALESCE(MAX(seq), 0) FROM central_log").fetchone()
+        return row[0]
+
+    def close(self):
+        self.db.close()
+
+class SyncEngine:
+    """Push local changes and pull other lanes' changes in the background.
+
+    Scanning and checkout never wait on sync: everything runs on its own
+    thread against the local database, and while the central store is
+    unreachable changes simply pile up in the change log.
+    """
+
+    def __init__(self, db: POSDatabase, central_path: str, interval: float = SYNC_INTERVAL,
+                 batch: int = SYNC_BATCH):
+        self.db = db
+        self.central_path = central_path
+        self.interval = interval
+        self.batch = batch
+        self.central = None
+        self.online = False
+        self.last_sync = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.lane = db.get_sync_value("lane_id")
+        if self.lane is None:
+            self.lane = uuid.uuid4().hex[:12]
+            db.set_sync_value("lane_id", self.lane)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sync", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._disconnect()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception:
+                pass    # recorded in last_error; retried next round
+            self._stop.wait(self.interval)
+        self.db.release_connection()
+
+    def sync_once(self) -> Tuple[int, int]:
+        """One push-then-pull round; returns (changes pushed, changes pulled)"""
+        with self._lock:
+            try:
+                if self.central is None:
+                    self.central = CentralStore(self.central_path)
+                pushed = self._push()
+                pulled = self._pull()
+            except Exception as e:
+                self.online = False
+                self.last_error = e
+                self._disconnect()
+                raise
+            self.online = True
+            self.last_error = None
+            self.last_sync = time.time()
+            return pushed, pulled
+
+    def _push(self) -> int:
+        pushed = 0
+        last = int(self.db.get_sync_value("pushed_seq", "0"))
+        while not self._stop.is_set():
+            changes = self.db.get_changes(last, self.batch)
+            if not changes:
+                break
+            self.central.push(self.lane, changes)
+            last = changes[-1][0]
+            self.db.set_sync_value("pushed_seq", last)
+            self.db.prune_changes(last)
+            pushed += len(changes)
+        return pushed
+
+    def _pull(self) -> int:
+        pulled = 0
+        last = int(self.db.get_sync_value("pulled_seq", "0"))
+        while not self._stop.is_set():
+            changes = self.central.pull(self.lane, last, self.batch)
+            if not changes:
+                break
+            last = changes[-1][0]
+            self.db.apply_changes([(kind, payload) for _, kind, payload in changes],
+                                  sync_key="pulled_seq", sync_value=last)
+            pulled += len(changes)
+        return pulled
+
+    def _disconnect(self):
+        if self.central is not None:
+            self.central.close()
+            self.central = None
+
+def clone_lane(central_path: str, lane_path: str):
+    """Create a new lane database from a snapshot of the central store"""
+    central = CentralStore(central_path)
+    try:
+        last_seq = central.last_seq()
+        lane = POSDatabase(lane_path)
+        try:
+            central.db.get_connection().backup(lane.get_connection())
+            with lane.transaction() as cursor:
+                cursor.execute("DROP TABLE central_log")
+                cursor.execute("DELETE FROM change_log")
+                cursor.execute("DELETE FROM sync_state")
+                cursor.execute("INSERT INTO sync_state (key, value) VALUES ('pulled_seq', ?)", (str(last_seq),))
+        finally:
+            lane.close()
+    finally:
+        central.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a lane database with the central store")
+    parser.add_argument("lane_db", nargs="?", default="pos_system.db")
+    parser.add_argument("central_db")
+    parser.add_argument("--clone", action="store_true", help="create lane_db as a copy of central_db")
+    args = parser.parse_args()
+
+    if args.clone:
+        clone_lane(args.central_db, args.lane_db)
+        print(f"Created lane database {args.lane_db}")
+        return
+
+    db = POSDatabase(args.lane_db)
+    engine = SyncEngine(db, args.central_db)
+    try:
+        pushed, pulled = engine.sync_once()
+        print(f"Lane {engine.lane}: pushed {pushed} changes, pulled {pulled}")
+    finally:
+        engine.stop()
+        db.close()
+
+if __name__ == "__main__":
+    main()
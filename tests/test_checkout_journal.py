@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+
+from checkout_journal import CheckoutQueue, failed_path_for
+from database import POSDatabase
+
+
+class JournalReplayTest(unittest.TestCase):
+    """Sales left in the journal by a previous run are committed on startup"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(self.path)
+        self.journal_path = os.path.splitext(self.path)[0] + "_checkouts.jsonl"
+        self.db = POSDatabase(self.path)
+        self.db.add_product("A", "Tea", 199, 10)
+        self.db.load_catalog()
+        self.queues = []
+
+    def tearDown(self):
+        for checkout_queue in self.queues:
+            checkout_queue.close()
+        self.db.close()
+        for path in (self.path + "-wal", self.path + "-shm", self.path,
+                     self.journal_path, failed_path_for(self.journal_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def entry(self, ref, quantity=1, **fields):
+        entry = {"ref": ref, "timestamp": "2024-01-31T10:00:00", "total": 199 * quantity,
+                 "customer": "Guest", "items": [[1, quantity, 199 * quantity]]}
+        entry.update(fields)
+        return entry
+
+    def write_journal(self, entries, tail=""):
+        with open(self.journal_path, 'w', encoding='utf-8') as journal:
+            journal.writelines(json.dumps(entry) + "\n" for entry in entries)
+            journal.write(tail)
+
+    def replay(self) -> CheckoutQueue:
+        checkout_queue = CheckoutQueue(self.db, fsync=False)
+        self.queues.append(checkout_queue)
+        return checkout_queue
+
+    def sales(self):
+        return self.db.get_connection().execute("SELECT client_ref, total_amount FROM sales ORDER BY id").fetchall()
+
+    def test_replay_is_idempotent(self):
+        checkout_queue = self.replay()
+        ref = checkout_queue.submit([(1, 2, 398)], 398)
+        sale_id = checkout_queue.wait_for(ref, timeout=5)
+        checkout_queue.close()
+        # Crash after the commit but before the journal was truncated
+        self.write_journal([self.entry(ref, 2)])
+        checkout_queue = self.replay()
+        self.assertEqual(checkout_queue.sale_ids[ref], sale_id)
+        self.assertEqual(self.sales(), [(ref, 398)])
+        self.assertEqual(self.db.get_product_by_id(1)[4], 8)
+        self.assertEqual(self.db.get_catalog().get_by_id(1)[4], 8)
+        self.assertEqual(os.path.getsize(self.journal_path), 0)
+
+    def test_torn_last_line_is_dropped(self):
+        self.write_journal([self.entry("whole")], tail=json.dumps(self.entry("torn"))[:30])
+        checkout_queue = self.replay()
+        self.assertEqual(self.sales(), [("whole", 199)])
+        self.assertEqual(checkout_queue.failed, 0)
+        self.assertFalse(os.path.exists(checkout_queue.failed_path))
+
+    def test_rejected_sales_go_to_failed_file(self):
+        self.write_journal([
+            self.entry("good"),
+            self.entry("no-timestamp", timestamp=None),
+            [1, 2, 3],
+        ])
+        checkout_queue = self.replay()
+        self.assertEqual(self.sales(), [("good", 199)])
+        self.assertEqual(checkout_queue.failed, 2)
+        self.assertIsNone(checkout_queue.sale_ids["no-timestamp"])
+        with open(checkout_queue.failed_path, encoding='utf-8') as failed:
+            entries = [json.loads(line)["entry"] for line in failed]
+        self.assertEqual(sorted(map(json.dumps, entries)),
+                         sorted(map(json.dumps, [[1, 2, 3], self.entry("no-timestamp", timestamp=None)])))
+        self.assertEqual(self.db.get_product_by_id(1)[4], 9)
+        # The journal no longer holds them, so the next start does not try again
+        self.assertEqual(os.path.getsize(self.journal_path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
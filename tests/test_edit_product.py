@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from database import InsufficientStockError, POSDatabase, StaleProductError
+
+
+class EditProductTest(unittest.TestCase):
+    """Inventory edits from two handles on one database (two windows or lanes)"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(self.path)
+        self.db = POSDatabase(self.path)
+        self.other = POSDatabase(self.path)
+        self.db.add_product("A", "Tea", 199, 10)
+        self.product_id = self.db.get_product_by_barcode("A")[0]
+
+    def tearDown(self):
+        self.db.close()
+        self.other.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_stale_edit_is_refused(self):
+        _, _, _, version = self.db.get_product_version(self.product_id)
+        self.other.edit_product(self.product_id, "Green Tea", 249, 0, version)
+        with self.assertRaises(StaleProductError):
+            self.db.edit_product(self.product_id, "Black Tea", 199, 0, version)
+        self.assertEqual(self.db.get_product_version(self.product_id), ("Green Tea", 249, 10, version + 1))
+
+    def test_stock_delta_keeps_sales_made_meanwhile(self):
+        _, _, _, version = self.db.get_product_version(self.product_id)
+        self.other.record_sale([(self.product_id, 2, 398)], 398)
+        new_version = self.db.edit_product(self.product_id, "Tea", 199, 5, version)
+        self.assertEqual(self.db.get_product_version(self.product_id), ("Tea", 199, 13, new_version))
+
+    def test_deleted_product_is_stale(self):
+        _, _, _, version = self.db.get_product_version(self.product_id)
+        self.other.delete_product(self.product_id)
+        with self.assertRaises(StaleProductError):
+            self.db.edit_product(self.product_id, "Tea", 199, 1, version)
+
+    def test_stock_cannot_go_negative(self):
+        _, _, _, version = self.db.get_product_version(self.product_id)
+        with self.assertRaises(InsufficientStockError):
+            self.db.edit_product(self.product_id, "Tea", 199, -11, version)
+        self.assertEqual(self.db.get_product_version(self.product_id), ("Tea", 199, 10, version))
+
+
+if __name__ == "__main__":
+    unittest.main()
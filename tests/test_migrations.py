@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from checkout_journal import CheckoutQueue
+from database import MIGRATIONS, POSDatabase, _migration_base_tables
+
+
+class FloatMoneyDatabaseTest(unittest.TestCase):
+    """A database written before versioning, with REAL prices and totals, upgraded on open"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        _migration_base_tables(conn.cursor())
+        conn.executemany("INSERT INTO products (barcode, name, price, stock) VALUES (?, ?, ?, ?)",
+                         [("A", "Tea", 1.99, 10), ("B", "Cake", 2.5, 3), ("C", "Gone", 0.1, 0)])
+        conn.executemany("INSERT INTO sales (timestamp, total_amount, customer_name) VALUES (?, ?, ?)",
+                         [("2024-01-31T10:15:00", 4.49, "Ann"), ("2024-02-01T09:00:00", 3.98, "Guest"),
+                          ("2024-02-01T09:30:00", 0.1, "Guest")])
+        conn.executemany("INSERT INTO sale_items (sale_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
+                         [(1, 1, 1, 1.99), (1, 2, 1, 2.5), (2, 1, 2, 3.98), (3, 3, 1, 0.1)])
+        # The highest IDs are deleted, so only AUTOINCREMENT keeps them from being reused
+        conn.execute("DELETE FROM sale_items WHERE sale_id = 3")
+        conn.execute("DELETE FROM sales WHERE id = 3")
+        conn.execute("DELETE FROM products WHERE id = 3")
+        conn.commit()
+        conn.close()
+        self.db = None
+
+    def tearDown(self):
+        if self.db is not None:
+            self.db.close()
+        for path in (self.path, self.journal_path):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    @property
+    def journal_path(self):
+        return os.path.splitext(self.path)[0] + "_checkouts.jsonl"
+
+    def test_upgrade(self):
+        self.db = POSDatabase(self.path)
+        conn = self.db.get_connection()
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], len(MIGRATIONS))
+        self.assertEqual(conn.execute("SELECT id, price, typeof(price) FROM products ORDER BY id").fetchall(),
+                         [(1, 199, "integer"), (2, 250, "integer")])
+        self.assertEqual(conn.execute("SELECT id, total_amount FROM sales ORDER BY id").fetchall(),
+                         [(1, 449), (2, 398)])
+        self.assertEqual(conn.execute("SELECT subtotal FROM sale_items ORDER BY id").fetchall(),
+                         [(199,), (250,), (398,)])
+
+        self.assertEqual(self.db.get_daily_sales("2024-01-01", "2024-02-29"),
+                         [("2024-01-31", 1, 2, 449), ("2024-02-01", 1, 2, 398)])
+        self.assertEqual(conn.execute(
+            "SELECT month, product_id, quantity, revenue FROM product_sales_monthly ORDER BY 1, 2").fetchall(),
+            [("2024-01", 1, 1, 199), ("2024-01", 2, 1, 250), ("2024-02", 1, 2, 398)])
+
+        self.db.add_product("D", "Jam", 300, 5)
+        self.assertEqual(self.db.get_product_by_barcode("D")[0], 4)
+        self.assertEqual(self.db.record_sale([(2, 1, 250)], 250), 4)
+
+    def test_upgrade_is_not_repeated(self):
+        POSDatabase(self.path).close()
+        self.db = POSDatabase(self.path)
+        self.assertEqual(self.db.get_product_by_barcode("A")[3], 199)
+
+    def test_replay_float_journal(self):
+        entry = {"ref": "old-sale", "timestamp": "2024-02-02T12:00:00", "total": 3.98,
+                 "customer": "Guest", "items": [[1, 2, 3.98]]}
+        with open(self.journal_path, 'w', encoding='utf-8') as journal:
+            journal.write(json.dumps(entry) + "\n")
+        self.db = POSDatabase(self.path)
+        self.db.load_catalog()
+        checkout_queue = CheckoutQueue(self.db, fsync=False)
+        try:
+            sale_id = checkout_queue.sale_ids["old-sale"]
+            self.assertEqual(self.db.get_connection().execute(
+                "SELECT total_amount FROM sales WHERE id = ?", (sale_id,)).fetchone(), (398,))
+            self.assertEqual(self.db.get_sale_lines(sale_id)[0][-1], 398)
+            self.assertEqual(self.db.get_product_by_barcode("A")[4], 8)
+        finally:
+            checkout_queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import unittest
+
+from cart import Till
+from checkout_journal import CheckoutQueue, failed_path_for
+from database import InsufficientStockError, POSDatabase
+
+
+class ReservationTest(unittest.TestCase):
+    """Stock reservations seen across two connections (two lanes on one database)"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(self.path)
+        self.lane_a = POSDatabase(self.path)
+        self.lane_b = POSDatabase(self.path)
+        self.lane_a.add_product("A", "Tea", 199, 4)
+        self.product_id = self.lane_a.get_product_by_barcode("A")[0]
+        self.queues = []
+
+    def tearDown(self):
+        for checkout_queue in self.queues:
+            checkout_queue.close()
+        self.lane_a.close()
+        self.lane_b.close()
+        paths = [self.path + suffix for suffix in ("", "-wal", "-shm")]
+        for lane in "ab":
+            journal_path = f"{self.path}.{lane}.jsonl"
+            paths += [journal_path, failed_path_for(journal_path)]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_reservation_blocks_other_connection(self):
+        self.lane_a.reserve_stock("cart-a", self.product_id, 3)
+        with self.assertRaises(InsufficientStockError) as raised:
+            self.lane_b.reserve_stock("cart-b", self.product_id, 2)
+        self.assertEqual(raised.exception.shortages, [(self.product_id, 2, 1)])
+        self.lane_b.reserve_stock("cart-b", self.product_id, 1)
+        self.assertEqual(self.lane_b.get_available_stock(self.product_id), 0)
+        with self.assertRaises(InsufficientStockError):
+            self.lane_b.record_sale([(self.product_id, 1, 199)], 199)
+
+        self.lane_a.release_reservations("cart-a")
+        self.lane_b.reserve_stock("cart-b", self.product_id, 4)
+        self.lane_b.record_sale([(self.product_id, 4, 796)], 796, holder="cart-b")
+        self.assertEqual(self.lane_a.get_product_by_id(self.product_id)[4], 0)
+        self.assertEqual(self.lane_a.get_available_stock(self.product_id), 0)
+
+    def test_lapsed_reservation_does_not_block(self):
+        self.lane_a.reserve_stock("cart-a", self.product_id, 4, ttl=-1)
+        self.lane_b.reserve_stock("cart-b", self.product_id, 4)
+        self.assertEqual(self.lane_a.expire_reservations(), 1)
+
+    def test_deferred_till_is_cut_back(self):
+        tills = []
+        for lane, db in (("a", self.lane_a), ("b", self.lane_b)):
+            db.load_catalog()
+            checkout_queue = CheckoutQueue(db, journal_path=f"{self.path}.{lane}.jsonl", fsync=False)
+            self.queues.append(checkout_queue)
+            tills.append(Till(db, checkout_queue, defer_reservations=True))
+        till_a, till_b = tills
+        product = self.lane_a.get_product_by_id(self.product_id)
+        for _ in range(3):
+            till_a.add(product)
+        self.wait_for_reservations(self.lane_a, till_a.holder, 3)
+        for _ in range(2):
+            till_b.add(product)
+
+        deadline = time.monotonic() + 5
+        while till_b.conflicts.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(till_b.take_conflicts(), [(product, 1)])
+        self.assertEqual(till_b.cart.quantity(self.product_id), 1)
+        self.wait_for_reservations(self.lane_b, till_b.holder, 1)
+
+    def wait_for_reservations(self, db, holder, quantity):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            row = db.get_connection().execute(
+                "SELECT quantity FROM stock_reservations WHERE holder = ? AND product_id = ?",
+                (holder, self.product_id)).fetchone()
+            if row is not None and row[0] == quantity:
+                return
+            time.sleep(0.01)
+        self.fail(f"{holder} never held {quantity} units")
+
+
+if __name__ == "__main__":
+    unittest.main()
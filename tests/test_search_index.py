@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from database import POSDatabase
+from search_index import ProductSearchIndex
+
+
+class NameWordEqualsBarcodeTest(unittest.TestCase):
+    """A name word that is also some product's barcode ("Water 500" and barcode 500)"""
+
+    PRODUCTS = [(1, "500", "Still Water"), (2, "9001", "Water 500"), (3, "5001", "Water 500 x6")]
+
+    def test_build_and_search(self):
+        index = ProductSearchIndex()
+        index.build(self.PRODUCTS)
+        self.assertEqual(index.search("500"), [1, 2, 3])
+        self.assertEqual(index.search("water"), [1, 2, 3])
+        self.assertEqual(list(index._words), sorted(index._words))
+
+    def test_incremental_updates_keep_order(self):
+        index = ProductSearchIndex()
+        index.build(self.PRODUCTS)
+        index.add(4, "4000", "Sparkling Water 500")
+        index.remove(2)
+        index.add(2, "500x", "Water 500")
+        self.assertEqual(index.search("500", limit=None), [1, 2, 3, 4])
+        pairs = list(zip(index._words, index._word_ids))
+        self.assertEqual(pairs, sorted(pairs))
+
+    def test_removed_words_leave_gram_cache(self):
+        index = ProductSearchIndex()
+        index.build(self.PRODUCTS)
+        index.add(4, "4000", "Sparkling Water")
+        index.remove(4)
+        self.assertNotIn("sparkling", index._word_grams)
+        self.assertIn("water", index._word_grams)
+        self.assertEqual(index.search("ater", limit=None), [1, 2, 3])
+
+    def test_database_search(self):
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(path)
+        db = POSDatabase(path)
+        try:
+            db.add_product("500", "Still Water", 100, 5)
+            db.add_product("9001", "Water 500", 150, 5)
+            db.load_catalog()
+            self.assertEqual([row[1] for row in db.search_products("500")], ["500", "9001"])
+            self.assertEqual({row[1] for row in db.suggest_products("wat")}, {"500", "9001"})
+        finally:
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    unittest.main()